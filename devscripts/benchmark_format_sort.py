@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import copy
+import itertools
+import json
+import timeit
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import FormatSorter
+
+
+def youtube_like_formats():
+    """A format list resembling that of a YouTube video, for when no info.json is given"""
+    formats = [{
+        'format_id': f'sb{i}', 'ext': 'mhtml', 'protocol': 'mhtml', 'vcodec': 'none', 'acodec': 'none',
+        'url': 'https://i.ytimg.com/sb/', 'preference': -1000,
+    } for i in range(4)]
+    for (acodec, ext, abr), language, drc in itertools.product(
+            (('mp4a.40.5', 'm4a', 48), ('mp4a.40.2', 'm4a', 129), ('opus', 'webm', 50), ('opus', 'webm', 135)),
+            ('en', 'de', 'fr', 'es'), (False, True)):
+        formats.append({
+            'format_id': f'{acodec}-{abr}-{language}{"-drc" if drc else ""}', 'ext': ext, 'vcodec': 'none',
+            'acodec': acodec, 'abr': abr, 'asr': 48000 if ext == 'webm' else 44100, 'audio_channels': 2,
+            'language': language, 'language_preference': 10 if language == 'en' else -1,
+            'source_preference': -1 if drc else 0, 'filesize': abr * 125 * 600, 'protocol': 'https',
+            'url': 'https://rr1---sn.googlevideo.com/videoplayback',
+        })
+    for (height, fps), (vcodec, ext, hdr) in itertools.product(
+            ((144, 30), (240, 30), (360, 30), (480, 30), (720, 30), (720, 60), (1080, 30), (1080, 60),
+             (1440, 60), (2160, 60)),
+            (('avc1.64001F', 'mp4', 'SDR'), ('vp9', 'webm', 'SDR'), ('vp09.02.51.10.01.09.16.09.00', 'webm', 'HDR10'),
+             ('av01.0.08M.08', 'mp4', 'SDR'), ('av01.0.12M.10.0.110.09.16.09.0', 'mp4', 'HDR10'))):
+        tbr = height * fps / 10
+        for protocol in ('https', 'm3u8_native'):
+            formats.append({
+                'format_id': f'{vcodec}-{height}p{fps}-{protocol}', 'ext': ext, 'vcodec': vcodec,
+                'acodec': 'none' if protocol == 'https' else 'mp4a.40.2', 'height': height,
+                'width': height * 16 // 9, 'fps': fps, 'dynamic_range': hdr, 'tbr': tbr,
+                'filesize_approx': int(tbr * 125 * 600), 'protocol': protocol,
+                'url': 'https://rr1---sn.googlevideo.com/videoplayback',
+            })
+    return formats
+
+
+def load_format_lists(filenames):
+    for filename in filenames:
+        with open(filename, encoding='utf-8') as f:
+            info = json.load(f)
+        for entry in info.get('entries') or [info]:
+            if entry and entry.get('formats'):
+                yield entry['formats'], entry.get('_format_sort_fields') or []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sorting formats with FormatSorter')
+    parser.add_argument(
+        'info_json', nargs='*', help='info.json files whose formats are sorted (default: a YouTube-like list)')
+    parser.add_argument('-S', '--format-sort', action='append', default=[], help='Sort order, like yt-dlp -S')
+    parser.add_argument('-n', '--number', type=int, default=200, help='Number of times to sort (default: %(default)s)')
+    args = parser.parse_args()
+
+    format_lists = list(load_format_lists(args.info_json)) or [(youtube_like_formats(), [])]
+    ydl = YoutubeDL({'format_sort': args.format_sort, 'quiet': True})
+
+    def per_field_key(sorter):
+        def key(format_):
+            sorter._fill_sorting_fields(format_)
+            return tuple(sorter._calculate_field_preference(format_, field) for field in sorter._order)
+        return key
+
+    def run(make_key):
+        for formats, sort_fields in format_lists:
+            sorted(copy.copy(formats), key=make_key(FormatSorter(ydl, sort_fields)))
+
+    # The results must be identical
+    for formats, sort_fields in format_lists:
+        assert (sorted(formats, key=FormatSorter(ydl, sort_fields).calculate_preference)
+                == sorted(formats, key=per_field_key(FormatSorter(ydl, sort_fields))))
+
+    count = sum(len(formats) for formats, _ in format_lists)
+    print(f'Sorting {len(format_lists)} format list(s) with {count} formats in total, {args.number} times')
+    results = {}
+    for name, make_key in (
+            ('per field', per_field_key),
+            ('compiled', lambda sorter: sorter.calculate_preference)):
+        results[name] = min(timeit.repeat(lambda: run(make_key), number=args.number, repeat=3)) / args.number
+        print(f'{name:>10}: {results[name] * 1000:.3f} ms per sort')
+    print(f'Speedup: {results["per field"] / results["compiled"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import json
+import timeit
+import unittest.mock
+
+from devscripts.benchmark_format_sort import youtube_like_formats
+from yt_dlp import YoutubeDL
+
+
+def large_info_dict():
+    """An info dict with many formats and comments, for when no info.json is given"""
+    formats = youtube_like_formats()
+    for f in formats:
+        f.update({
+            'url': f'{f["url"]}?expire=1700000000&id={f["format_id"]}&{"sig=0123456789abcdef&" * 40}',
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*', 'Accept-Language': 'en-us,en;q=0.5'},
+            'fragments': [{'url': f'sq/{i}', 'duration': 5.0} for i in range(50)],
+            'downloader_options': {'http_chunk_size': 10485760},
+        })
+    return {
+        'id': 'BaW_jenozKc', 'title': 'youtube-dl test video "\'/\\ä↭𝕐', 'formats': formats,
+        'requested_formats': formats[-2:], 'filepath': 'test.mp4', 'tags': ('a', 'b'),
+        'thumbnails': [{'url': f'https://i.ytimg.com/vi/{i}.jpg', 'id': str(i)} for i in range(40)],
+        'heatmap': [{'start_time': i, 'end_time': i + 1.5, 'value': i / 100} for i in range(100)],
+        'comments': [{
+            'id': f'comment{i}', 'text': 'Thanks for the vidéo! ' * 5, 'author': f'@user{i}', 'like_count': i,
+            'parent': 'root', 'timestamp': 1700000000 + i, 'is_favorited': False, 'author_thumbnail': None,
+        } for i in range(10000)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark encoding info dicts as JSON')
+    parser.add_argument(
+        'info_json', nargs='*', help='info.json files that are encoded (default: a large YouTube-like info dict)')
+    parser.add_argument('-n', '--number', type=int, default=10, help='Number of times to encode (default: %(default)s)')
+    args = parser.parse_args()
+
+    infos = []
+    for filename in args.info_json:
+        with open(filename, encoding='utf-8') as f:
+            infos.append(json.load(f))
+    infos = infos or [large_info_dict()]
+
+    ydl_module = sys.modules[YoutubeDL.__module__]
+    size = sum(len(YoutubeDL.dumps_info(info)) for info in infos)
+    print(f'Encoding {len(infos)} info dict(s) with {size / 1024 / 1024:.1f} MiB of JSON in total, {args.number} times')
+    for desc, remove_private_keys, ensure_ascii in (
+            ('--dump-json', False, True),
+            ('--write-info-json', True, False)):
+        print(desc)
+        results = {}
+        for name, use_orjson in (('sanitize_info', False), ('dumps_info', False), ('dumps_info (orjson)', True)):
+            if use_orjson and not ydl_module.orjson:
+                print(f'{name:>20}: orjson is not installed')
+                continue
+            if name == 'sanitize_info':
+                func = lambda info: json.dumps(
+                    YoutubeDL.sanitize_info(info, remove_private_keys), ensure_ascii=ensure_ascii)
+            else:
+                func = lambda info: YoutubeDL.dumps_info(info, remove_private_keys, ensure_ascii=ensure_ascii)
+            with unittest.mock.patch.object(ydl_module, 'orjson', ydl_module.orjson if use_orjson else None):
+                results[name] = min(timeit.repeat(
+                    lambda: list(map(func, infos)), number=args.number, repeat=3)) / args.number
+            print(f'{name:>20}: {results[name] * 1000:.3f} ms per encoding, '
+                  f'{results["sanitize_info"] / results[name]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@
 from yt_dlp.compat import compat_etree_fromstring
 from yt_dlp.extractor import YoutubeIE, get_info_extractor
 from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.networking import Request
 from yt_dlp.utils import (
     ExtractorError,
     RegexNotFoundError,
@@ -2154,6 +2155,11 @@ def test_extract_m3u8_formats(self):
         self.assertTrue(formats)
         self.assertTrue(subtitles)
 
+    def test_request_webpage_copies_request(self):
+        request = Request(f'http://127.0.0.1:{self.port}/teapot', extensions={'timeout': 10})
+        self.ie._request_webpage(request, None, expected_status=TEAPOT_RESPONSE_STATUS).close()
+        self.assertEqual(request.extensions, {'timeout': 10})
+
     def test_extract_m3u8_formats_warning(self):
         formats, subtitles = self.ie._extract_m3u8_formats_and_subtitles(
             f'http://127.0.0.1:{self.port}/fake.m3u8', None, fatal=False)
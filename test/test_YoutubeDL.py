@@ -21,7 +21,9 @@
 from yt_dlp.postprocessor.common import PostProcessor
 from yt_dlp.utils import (
     ExtractorError,
+    FormatSorter,
     LazyList,
+    MaxDownloadsReached,
     OnDemandPagedList,
     int_or_none,
     match_filter_func,
@@ -236,6 +238,35 @@ def test_format_selection_video(self):
         downloaded = ydl.downloaded_info_dicts[0]
         self.assertEqual(downloaded['format_id'], 'vid-vcodec-dot')
 
+    def test_format_sort_compiled(self):
+        formats = [
+            {'format_id': '137', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'height': 1080,
+             'width': 1920, 'fps': 30, 'tbr': 4400, 'filesize': 104857600, 'protocol': 'https'},
+            {'format_id': '248', 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'none', 'height': 1080,
+             'fps': 30, 'dynamic_range': 'SDR', 'filesize_approx': 90000000},
+            {'format_id': '337', 'ext': 'webm', 'vcodec': 'vp09.02.51.10.01.09.16.09.00', 'acodec': 'none',
+             'height': 2160, 'fps': 60, 'dynamic_range': 'HDR10'},
+            {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 129.5,
+             'asr': 44100, 'audio_channels': 2, 'language': 'en', 'language_preference': 10},
+            {'format_id': '251-drc', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 140,
+             'preference': -10, 'source_preference': -1},
+            {'format_id': 'hls-720', 'ext': 'mp4', 'vcodec': 'avc1.4d401f', 'acodec': 'mp4a.40.2',
+             'height': 720, 'width': 1280, 'protocol': 'm3u8_native', 'quality': 3},
+            {'format_id': 'sb0', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none', 'protocol': 'mhtml',
+             'preference': -1000},
+            {'format_id': 'unknown', 'url': 'http://example.com/video.flv', 'vcodec': 'hevc'},
+        ]
+        for format_sort in ([], ['res:720', 'fps'], ['+size', 'br:1000'], ['vcodec:vp9.2', 'acodec:opus'],
+                            ['res~480', '+br~100', 'lang'], ['hasaud', 'ext:webm:m4a', 'proto:m3u8'], ['id']):
+            for prefer_free_formats in (False, True):
+                with self.subTest(format_sort=format_sort, prefer_free_formats=prefer_free_formats):
+                    sorter = FormatSorter(
+                        YDL({'format_sort': format_sort, 'prefer_free_formats': prefer_free_formats}), [])
+                    for f in copy.deepcopy(formats):
+                        f.setdefault('url', TEST_URL)
+                        self.assertEqual(sorter.calculate_preference(f), tuple(
+                            sorter._calculate_field_preference(f, field) for field in sorter._order))
+
     def test_format_selection_by_vcodec_sort(self):
         formats = [
             {'format_id': 'av1-format', 'ext': 'mp4', 'vcodec': 'av1', 'acodec': 'none', 'url': TEST_URL},
@@ -482,6 +513,37 @@ def test_format_filtering(self):
         downloaded_ids = [info['format_id'] for info in ydl.downloaded_info_dicts]
         self.assertEqual(downloaded_ids, ['E', 'D', 'C', 'B'])
 
+    def test_format_selection_equality_index(self):
+        formats = [
+            {'format_id': 'A', 'ext': 'mp4', 'height': 720, 'language': 'en'},
+            {'format_id': 'B', 'ext': 'webm', 'height': 720},
+            {'format_id': 'C', 'ext': 'mp4', 'height': 1080, 'language': 'de'},
+            {'format_id': 'D', 'ext': 'mp4', 'height': 1080, 'language': 'en'},
+            {'format_id': 'E', 'ext': 'webm', 'height': 1080.0, 'tags': ['unhashable']},
+        ]
+        for f in formats:
+            f['url'] = 'http://_/'
+        info_dict = _make_result(formats, _format_sort_fields=('id', ))
+
+        def test(format_spec, expected_ids):
+            ydl = YDL({'format': format_spec})
+            ydl.process_ie_result(copy.deepcopy(info_dict))
+            self.assertEqual([info['format_id'] for info in ydl.downloaded_info_dicts], expected_ids, format_spec)
+
+        test('all[ext=mp4]', ['D', 'C', 'A'])
+        test('all[height=1080]', ['E', 'D', 'C'])
+        test('all[height=1080][ext=webm]', ['E'])
+        test('all[language=?en]', ['E', 'D', 'B', 'A'])
+        test('all[tags=unhashable]/C', ['C'])
+        test('(all[ext=mp4])[language=en]', ['D', 'A'])
+        test('(mp4/webm)[height=720]', ['A'])
+        test('webm[height=1080]/mp4', ['E'])
+        test('C/B', ['C'])
+
+        ydl = YDL()
+        self.assertIs(ydl.build_format_selector('mp4[height=720]'), ydl.build_format_selector('mp4[height=720]'))
+        self.assertIsNot(ydl.build_format_selector('mp4[height=720]'), ydl.build_format_selector('mp4'))
+
     @patch('yt_dlp.postprocessor.ffmpeg.FFmpegMergerPP.available', False)
     def test_default_format_spec_without_ffmpeg(self):
         ydl = YDL({})
@@ -619,6 +681,29 @@ def test_add_extra_info(self):
         self.assertEqual(test_dict['extractor'], 'Foo')
         self.assertEqual(test_dict['playlist'], 'funny videos')
 
+    def test_dumps_info(self):
+        info = {
+            'id': '1234', 'title': 'áéí 𝐀', 'tags': ('a', 'b'), 'categories': {'c'}, 'description': None,
+            'thumbnails': LazyList([{'url': 'http://_/', 'filepath': 'thumb.jpg', '__private': 1}]),
+            'filepath': 'test.mp4', '__postprocessors': [], 'object': object, 'duration': 1.5,
+            'requested_formats': [{'format_id': '1'}], 'large_number': 2 ** 70,
+        }
+        ydl_module = sys.modules[YoutubeDL.__module__]
+        for use_orjson in (False, True):
+            if use_orjson and not ydl_module.orjson:
+                continue
+            with patch.object(ydl_module, 'orjson', ydl_module.orjson if use_orjson else None):
+                for remove_private_keys in (False, True):
+                    for ensure_ascii in (False, True):
+                        expected = json.dumps(
+                            YDL.sanitize_info(dict(info), remove_private_keys), ensure_ascii=ensure_ascii)
+                        result = YDL.dumps_info(dict(info), remove_private_keys, ensure_ascii=ensure_ascii)
+                        self.assertEqual(json.loads(result), json.loads(expected))
+                        self.assertEqual(result.isascii(), ensure_ascii)
+                        if not use_orjson:
+                            self.assertEqual(result, expected)
+        self.assertEqual(YDL.dumps_info(None), 'null')
+
     outtmpl_info = {
         'id': '1234',
         'ext': 'mp4',
@@ -857,6 +942,16 @@ def gen():
         test('%(title3)s', ('foo/bar\\test', 'foo⧸bar⧹test'))
         test('folder/%(title3)s', ('folder/foo/bar\\test', f'folder{os.path.sep}foo⧸bar⧹test'))
 
+    def test_outtmpl_parse_cache(self):
+        ydl = FakeYDL()
+        tmpl = '%(title,id)s %(height-width+10|NA)d %%(x)s %(formats.0.{id})j'
+        ydl.evaluate_outtmpl(tmpl, self.outtmpl_info)
+        hits = YDL._split_outtmpl.cache_info().hits, YDL._parse_outtmpl_field.cache_info().hits
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'id': 'a', 'height': 100, 'width': 10}), 'a 100 %(x)s {}')
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'title': 'b', 'formats': [{'id': 'c'}]}), 'b NA %(x)s {"id": "c"}')
+        self.assertEqual(YDL._split_outtmpl.cache_info().hits, hits[0] + 2)
+        self.assertGreater(YDL._parse_outtmpl_field.cache_info().hits, hits[1])
+
     def test_format_note(self):
         ydl = YoutubeDL()
         self.assertEqual(ydl._format_note({}), '')
@@ -1212,6 +1307,187 @@ def _real_extract(self, url):
         self.assertEqual(downloaded['extractor'], 'Video')
         self.assertEqual(downloaded['extractor_key'], 'Video')
 
+    def test_playlist_workers(self):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        running = []
+        max_running = 0
+
+        class VideoIE(InfoExtractor):
+            _VALID_URL = r'video:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                nonlocal max_running
+                video_id = self._match_id(url)
+                with lock:
+                    running.append(video_id)
+                    max_running = max(max_running, len(running))
+                # Later entries finish extracting first
+                time.sleep(0.05 * (5 - int(video_id)))
+                self.report_warning(f'extracted {video_id}')
+                with lock:
+                    running.remove(video_id)
+                return {'id': video_id, 'title': f'Video {video_id}', 'url': TEST_URL}
+
+        class PlaylistIE(InfoExtractor):
+            _VALID_URL = r'playlist:'
+
+            def _real_extract(self, url):
+                return self.playlist_result(
+                    self.url_result(f'video:{n}', VideoIE) for n in range(5))
+
+        def test(params, expected_ids):
+            ydl = YDL({'playlist_workers': 3, **params})
+            ydl.add_info_extractor(VideoIE(ydl))
+            ydl.add_info_extractor(PlaylistIE(ydl))
+            messages = []
+            with patch('yt_dlp.YoutubeDL.write_string', lambda msg, **_: messages.append(msg)):
+                ydl.extract_info('playlist:')
+            self.assertEqual([info['id'] for info in ydl.downloaded_info_dicts], expected_ids)
+            self.assertEqual(
+                [msg.split()[-1] for msg in messages if 'extracted' in msg], expected_ids)
+
+        test({}, ['0', '1', '2', '3', '4'])
+        self.assertGreater(max_running, 1)
+        self.assertLessEqual(max_running, 3)
+        test({'playlist_items': '3,5,2'}, ['2', '4', '1'])
+
+        # Messages passed to a logger are also replayed in order
+        class Logger:
+            def __init__(self):
+                self.messages = []
+
+            def debug(self, msg):
+                self.messages.append(msg)
+
+            warning = error = debug
+
+        ydl = YDL({'playlist_workers': 3, 'logger': Logger()})
+        ydl.add_info_extractor(VideoIE(ydl))
+        ydl.add_info_extractor(PlaylistIE(ydl))
+        ydl.extract_info('playlist:')
+        self.assertEqual(
+            [msg.split()[-1] for msg in ydl.params['logger'].messages if 'extracted' in msg], ['0', '1', '2', '3', '4'])
+
+        # Running extractions are waited for when the playlist is stopped early
+        ydl = YDL({'playlist_workers': 3, 'playlist_items': '5,4,1,2'})
+        ydl.add_info_extractor(VideoIE(ydl))
+        ydl.add_info_extractor(PlaylistIE(ydl))
+
+        def process_info(info_dict):
+            # The first entry initializes the extractor in the main thread
+            if info_dict['id'] != '4':
+                raise MaxDownloadsReached
+
+        ydl.process_info = process_info
+        with patch('yt_dlp.YoutubeDL.write_string', lambda *_, **__: None):
+            self.assertRaises(MaxDownloadsReached, ydl.extract_info, 'playlist:')
+        self.assertEqual(running, [])
+        self.assertEqual(ydl._prefetched_extractions, {})
+
+    def test_batch_workers(self):
+        import time
+
+        class VideoIE(InfoExtractor):
+            _VALID_URL = r'video:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                # Later URLs finish extracting first
+                time.sleep(0.1 * (5 - int(video_id)))
+                self.report_warning(f'extracted {video_id}')
+                return {'id': video_id, 'title': f'Video {video_id}', 'url': TEST_URL}
+
+        def test(params, expected_ids):
+            ydl = YDL({'batch_workers': 4, 'outtmpl': '%(id)s', **params})
+            ydl.add_info_extractor(VideoIE(ydl))
+
+            def urls():
+                for n in range(5):
+                    # The URLs are read only as far as the workers need them
+                    self.assertLessEqual(n - len(ydl.downloaded_info_dicts), 6)
+                    yield f'video:{n}'
+
+            messages = []
+            with patch('yt_dlp.YoutubeDL.write_string', lambda msg, **_: messages.append(msg)):
+                YoutubeDL.download(ydl, urls())  # FakeYDL.download does not download
+            self.assertEqual([info['id'] for info in ydl.downloaded_info_dicts], expected_ids)
+            self.assertEqual(
+                [msg.split()[-1] for msg in messages if 'extracted' in msg], expected_ids)
+            self.assertEqual(ydl._prefetched_extractions, {})
+
+        test({}, ['0', '1', '2', '3', '4'])
+        # The first URL initializes the extractor in the main thread
+        test({'batch_unordered': True}, ['0', '4', '3', '2', '1'])
+
+    def test_playlist_memory(self):
+        import tracemalloc
+
+        def video_info(video_id):
+            return {
+                'id': video_id,
+                'title': f'Video {video_id}',
+                'formats': [{
+                    'format_id': str(i), 'url': f'{TEST_URL}?id={video_id}&itag={i}&{"sig=0123456789&" * 20}',
+                    'ext': 'mp4', 'height': i, 'tbr': i * 10,
+                } for i in range(50)],
+                'comments': [{'id': str(i), 'text': f'Comment {i} ' * 10} for i in range(1000)],
+            }
+
+        class VideoIE(InfoExtractor):
+            _VALID_URL = r'video:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                return video_info(self._match_id(url))
+
+        class ChannelIE(InfoExtractor):
+            _VALID_URL = r'channel:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                return self.playlist_result(
+                    self.url_result(f'video:{n}', VideoIE) for n in range(int(self._match_id(url))))
+
+        class SimulatingYDL(YDL):
+            def process_info(self, info_dict):
+                pass
+
+        def peak_memory(count, extract_flat):
+            ydl = SimulatingYDL({'extract_flat': extract_flat, 'format': 'best'})
+            ydl.add_info_extractor(VideoIE(ydl))
+            ydl.add_info_extractor(ChannelIE(ydl))
+            tracemalloc.start()
+            try:
+                info = ydl.extract_info(f'channel:{count}')
+                return tracemalloc.get_traced_memory()[1], info
+            finally:
+                tracemalloc.stop()
+
+        small, info = peak_memory(2, 'discard')
+        large, info = peak_memory(20, 'discard')
+        self.assertEqual(len(info['entries']), 20)
+        self.assertNotIn('formats', info['entries'][0])
+        # The processed entries are released one by one
+        self.assertLess(large, small * 2)
+
+        large, info = peak_memory(20, False)
+        self.assertEqual(len(info['entries'][0]['formats']), 50)
+        self.assertGreater(large, small * 5)
+        # Formats with the same headers share them
+        formats = info['entries'][0]['formats']
+        self.assertIs(formats[0]['http_headers'], formats[1]['http_headers'])
+
+        # The data added by processing is not kept in discarded entries
+        ydl = SimulatingYDL({'extract_flat': 'discard', 'format': 'best'})
+        info = ydl.process_ie_result({
+            '_type': 'playlist', 'id': 'channel', 'extractor': 'Channel', 'extractor_key': 'Channel',
+            'webpage_url': 'channel:1', 'entries': [video_info('0')],
+        })
+        self.assertIn('formats', info['entries'][0])
+        self.assertNotIn('requested_formats', info['entries'][0])
+        self.assertNotIn('format_id', info['entries'][0])
+
     def test_header_cookies(self):
         from http.cookiejar import Cookie
 
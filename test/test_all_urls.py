@@ -10,8 +10,10 @@
 
 import collections
 
-from test.helper import gettestcases
+from test.helper import FakeYDL, gettestcases
 from yt_dlp.extractor import FacebookIE, YoutubeIE, gen_extractors
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.extractor._dispatch import URLDispatchIndex
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -117,6 +119,33 @@ def test_no_duplicated_ie_names(self):
                 len(ie_list), 1,
                 f'Multiple extractors with the same IE_NAME "{ie_name}" ({", ".join(ie_list)})')
 
+    def test_dispatch_index(self):
+        ies = {ie.ie_key(): ie for ie in self.ies}
+        index = URLDispatchIndex(ies)
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            self.assertEqual(
+                [key for key in index.candidates(url) if ies[key].suitable(url)],
+                [key for key, ie in ies.items() if ie.suitable(url)], url)
+        self.assertEqual(index.candidates('https://example.com/\u00e9'), list(ies))
+
+    def test_dispatch_index_replace(self):
+        class OriginalIE(InfoExtractor):
+            _VALID_URL = r'original:(?P<id>\d+)'
+
+            @classmethod
+            def ie_key(cls):
+                return 'Test'
+
+        class ReplacementIE(OriginalIE):
+            _VALID_URL = r'replacement:(?P<id>\d+)'
+
+        ydl = FakeYDL()
+        ydl.add_info_extractor(OriginalIE)
+        self.assertEqual(ydl._get_candidate_ies('replacement:1'), [])
+        ydl.add_info_extractor(ReplacementIE)
+        self.assertEqual(ydl._get_candidate_ies('replacement:1'), ['Test'])
+
 
 if __name__ == '__main__':
     unittest.main()
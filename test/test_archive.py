@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import shutil
+
+from test.helper import FakeYDL
+from yt_dlp.archive import DownloadArchive, SQLiteDownloadArchive, TextDownloadArchive
+from yt_dlp.dependencies import sqlite3
+
+
+class TestDownloadArchive(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.test_dir = os.path.join(TEST_DIR, 'testdata', 'archive_test')
+        self.tearDown()
+        os.makedirs(self.test_dir)
+        self.text_fn = os.path.join(self.test_dir, 'archive.txt')
+        with open(self.text_fn, 'w', encoding='utf-8') as f:
+            f.write('youtube a\nyoutube b\n\nyoutube a\n')
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _test_archive(self, fn, klass):
+        archive = DownloadArchive.from_filename(fn)
+        self.assertIsInstance(archive, klass)
+        self.assertNotIn('youtube a', archive)
+        self.assertEqual(archive.import_file(self.text_fn), 2)
+        self.assertEqual(archive.import_file(self.text_fn), 0)
+        self.assertIn('youtube a', archive)
+        archive.add('youtube c')
+        self.assertIn('youtube c', archive)
+        self.assertNotIn('youtube d', archive)
+        archive.close()
+
+        archive = DownloadArchive.from_filename(fn)
+        self.assertIsInstance(archive, klass)
+        for vid_id in ('youtube a', 'youtube b', 'youtube c'):
+            self.assertIn(vid_id, archive)
+        archive.close()
+
+    def test_text_archive(self):
+        fn = os.path.join(self.test_dir, 'new.txt')
+        self._test_archive(fn, TextDownloadArchive)
+        with open(fn, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\nyoutube c\n')
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_sqlite_archive(self):
+        fn = os.path.join(self.test_dir, 'archive.sqlite')
+        self._test_archive(fn, SQLiteDownloadArchive)
+        # Detected by contents regardless of the extension
+        renamed_fn = os.path.join(self.test_dir, 'archive')
+        shutil.copy(fn, renamed_fn)
+        self.assertIsInstance(DownloadArchive.from_filename(renamed_fn), SQLiteDownloadArchive)
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_sqlite_archive_shared(self):
+        fn = os.path.join(self.test_dir, 'archive.db')
+        first, second = SQLiteDownloadArchive(fn), SQLiteDownloadArchive(fn)
+        first.add('youtube a')
+        first.add('youtube a')
+        self.assertIn('youtube a', second)
+        first.close()
+        second.close()
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_ydl_archive(self):
+        fn = os.path.join(self.test_dir, 'archive.sqlite')
+        with FakeYDL({'download_archive': fn, 'import_download_archive': self.text_fn}) as ydl:
+            self.assertIsInstance(ydl.archive, SQLiteDownloadArchive)
+            self.assertTrue(ydl.in_download_archive({'id': 'a', 'extractor_key': 'Youtube'}))
+            self.assertFalse(ydl.in_download_archive({'id': 'c', 'extractor_key': 'Youtube'}))
+            ydl.record_download_archive({'id': 'c', 'extractor_key': 'Youtube'})
+            self.assertTrue(ydl.in_download_archive({'id': 'c', 'extractor_key': 'Youtube'}))
+        self.assertIn('youtube c', SQLiteDownloadArchive(fn))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import json
+import tempfile
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.fragment import FragmentFD
+from yt_dlp.utils._utils import _YDLLogger as FakeLogger
+
+
+class TestFragmentFD(FragmentFD):
+    FD_NAME = 'test'
+
+    def real_download(self, filename, info_dict):
+        ctx = {'filename': filename, 'total_frags': len(info_dict['fragments'])}
+        self._prepare_and_start_frag_download(ctx, info_dict)
+        self.ctx = ctx
+        for index, content in enumerate(info_dict['fragments'][ctx['fragment_index']:], ctx['fragment_index'] + 1):
+            if content is None:
+                raise KeyboardInterrupt
+            ctx['fragment_index'] = index
+            self._append_fragment(ctx, content)
+        return self._finish_frag_download(ctx, info_dict)
+
+
+class TestYtdlJournal(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, 'test.mp4')
+        self.ytdl_filename = f'{self.filename}.ytdl'
+        self.fd = TestFragmentFD(YoutubeDL({'logger': FakeLogger()}), {'logger': FakeLogger()})
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, filename, data):
+        with open(filename, 'w' if isinstance(data, str) else 'wb') as f:
+            f.write(data)
+
+    def read_journal(self):
+        with open(self.ytdl_filename) as f:
+            return f.read().splitlines()
+
+    def prepare(self, **ctx):
+        ctx = {'filename': self.filename, 'total_frags': 10, **ctx}
+        self.fd._prepare_frag_download(ctx)
+        ctx['dest_stream'].close()
+        return ctx
+
+    def test_journal(self):
+        self.assertRaises(KeyboardInterrupt, self.fd.download, self.filename, {'fragments': [b'a', b'bb', None]})
+        self.assertEqual(self.read_journal(), [
+            json.dumps({'downloader': {'current_fragment': {'index': 0, 'offset': 0}}}),
+            json.dumps({'index': 1, 'offset': 1}),
+            json.dumps({'index': 2, 'offset': 3}),
+        ])
+        # The journal is closed when the download is interrupted
+        self.assertNotIn('ytdl_journal', self.fd.ctx)
+
+        self.assertTrue(self.fd.download(self.filename, {'fragments': [b'a', b'bb', b'ccc']})[0])
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b'abbccc')
+        self.assertFalse(os.path.exists(self.ytdl_filename))
+
+    def test_resume(self):
+        self.write(f'{self.filename}.part', b'abbcc')
+        self.write(self.ytdl_filename, '\n'.join([
+            json.dumps({'downloader': {'current_fragment': {'index': 0, 'offset': 0}, 'extra_state': {'a': 1}}}),
+            json.dumps({'index': 1, 'offset': 1}),
+            json.dumps({'index': 2, 'offset': 3, 'extra_state': {'a': 2}}),
+            # Interrupted while writing the record
+            '{"index": 3, "off',
+        ]))
+        ctx = self.prepare()
+        self.assertEqual(ctx['fragment_index'], 2)
+        self.assertEqual(ctx['extra_state'], {'a': 2})
+        # The partially appended fragment is discarded
+        self.assertEqual(ctx['complete_frags_downloaded_bytes'], 3)
+        self.assertEqual(os.path.getsize(f'{self.filename}.part'), 3)
+
+    def test_resume_single_object(self):
+        # .ytdl files of older versions
+        self.write(f'{self.filename}.part', b'abb')
+        self.write(self.ytdl_filename, json.dumps({'downloader': {'current_fragment': {'index': 2}}}))
+        ctx = self.prepare()
+        self.assertEqual(ctx['fragment_index'], 2)
+        self.assertIsNone(ctx['dest_offset'])
+        self.assertEqual(ctx['complete_frags_downloaded_bytes'], 3)
+
+    def test_resume_inconsistent(self):
+        self.write(f'{self.filename}.part', b'a')
+        self.write(self.ytdl_filename, '\n'.join([
+            json.dumps({'downloader': {'current_fragment': {'index': 0, 'offset': 0}}}),
+            json.dumps({'index': 2, 'offset': 3}),
+        ]))
+        ctx = self.prepare()
+        self.assertEqual(ctx['fragment_index'], 0)
+        self.assertEqual(ctx['complete_frags_downloaded_bytes'], 0)
+        self.assertEqual(len(self.read_journal()), 1)
+
+    def test_compaction(self):
+        self.fd._YTDL_JOURNAL_COMPACT_INTERVAL = 3
+        self.assertRaises(KeyboardInterrupt, self.fd.download, self.filename, {'fragments': [b'a'] * 4 + [None]})
+        journal = self.read_journal()
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(json.loads(journal[0])['downloader']['current_fragment'], {'index': 4, 'offset': 4})
+
+    def test_compaction_nopart(self):
+        self.fd.params['nopart'] = True
+        self.fd._YTDL_JOURNAL_COMPACT_INTERVAL = 1
+        opened = []
+
+        def sanitize_open(filename, open_mode):
+            opened.append((filename, open_mode))
+            return FragmentFD.sanitize_open(self.fd, filename, open_mode)
+
+        self.fd.sanitize_open = sanitize_open
+        self.assertRaises(KeyboardInterrupt, self.fd.download, self.filename, {'fragments': [b'a', b'b', None]})
+        self.assertEqual(len(self.read_journal()), 1)
+        # The journal is only ever replaced, not overwritten in place
+        self.assertNotIn((self.ytdl_filename, 'w'), opened)
+        self.assertFalse(os.path.exists(f'{self.ytdl_filename}.part'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,11 +9,14 @@
 
 
 import http.server
+import io
 import re
 import threading
+import time
 
 from test.helper import http_server_port, try_rm
 from yt_dlp import YoutubeDL
+from yt_dlp.downloader.external import CurlFD
 from yt_dlp.downloader.http import HttpFD
 from yt_dlp.utils._utils import _YDLLogger as FakeLogger
 
@@ -63,6 +66,23 @@ def do_GET(self):
             self.serve(range=False)
         elif self.path == '/no-range-no-content-length':
             self.serve(range=False, content_length=False)
+        elif self.path == '/playlist.m3u8':
+            payload = '\n'.join([
+                '#EXTM3U', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:0',
+                *(f'#EXTINF:1.0,\n/fragment{i}' for i in range(3)), '#EXT-X-ENDLIST']).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif re.fullmatch(r'/fragment\d', self.path):
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.send_header('Content-Length', str(TEST_SIZE))
+            self.end_headers()
+            self.wfile.write(self.path[-1].encode() * TEST_SIZE)
+        elif self.path == '/missing':
+            self.send_error(404)
         else:
             assert False
 
@@ -100,6 +120,93 @@ def test_chunked(self):
             'http_chunk_size': 1000,
         })
 
+    def test_stream(self):
+        for ep in ('regular', 'no-content-length', 'no-range', 'no-range-no-content-length'):
+            for params in ({}, {'http_chunk_size': 1000}):
+                ydl = YoutubeDL({**params, 'logger': FakeLogger()})
+                stream = io.BytesIO()
+                self.assertTrue(ydl.stream({
+                    'url': f'http://127.0.0.1:{self.port}/{ep}',
+                    'format_id': 'test',
+                }, stream), ep)
+                self.assertEqual(stream.getvalue(), b'#' * TEST_SIZE, ep)
+                self.assertFalse(stream.closed, ep)
+
+    def test_stream_fragments(self):
+        for params in ({}, {'overwrites': False}):
+            ydl = YoutubeDL({**params, 'logger': FakeLogger()})
+            stream = io.BytesIO()
+            self.assertTrue(ydl.stream({
+                'url': f'http://127.0.0.1:{self.port}/playlist.m3u8',
+                'format_id': 'test',
+                'protocol': 'm3u8_native',
+                'ext': 'mp4',
+            }, stream))
+            self.assertEqual(stream.getvalue(), b''.join(str(i).encode() * TEST_SIZE for i in range(3)))
+            self.assertFalse(stream.closed)
+
+    def test_live_fragments_latency(self):
+        latencies = []
+        ydl = YoutubeDL({
+            'logger': FakeLogger(),
+            'progress_hooks': [lambda d: d['status'] == 'downloading' and latencies.append(d.get('latency_to_edge'))],
+        })
+        stream = io.BytesIO()
+        self.assertTrue(ydl.stream({
+            'url': f'http://127.0.0.1:{self.port}/playlist.m3u8',
+            'format_id': 'test',
+            'protocol': 'http_dash_segments_generator',
+            'ext': 'mp4',
+            'is_live': True,
+            'fragments': lambda ctx: ({
+                'url': f'http://127.0.0.1:{self.port}/fragment{i}',
+                'latency_to_edge': 4 - 2 * i,
+            } for i in range(3)),
+        }, stream))
+        self.assertEqual(stream.getvalue(), b''.join(str(i).encode() * TEST_SIZE for i in range(3)))
+        self.assertEqual(sorted(set(latencies) - {None}), [0, 2, 4])
+        self.assertEqual(latencies[-1], 0)
+
+    def test_check_formats(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        formats = [{
+            'format_id': ep,
+            'url': f'http://127.0.0.1:{self.port}/{ep}',
+        } for ep in ('missing', 'regular', 'no-range', 'missing', 'no-content-length')]
+        self.assertEqual(
+            [f['format_id'] for f in ydl._check_formats(formats)], ['regular', 'no-range', 'no-content-length'])
+        self.assertEqual([f['__working'] for f in formats], [False, True, True, False, True])
+
+    @unittest.skipUnless(CurlFD.available(), 'curl not found')
+    def test_check_formats_external_downloader(self):
+        ydl = YoutubeDL({'logger': FakeLogger(), 'external_downloader': {'default': 'curl'}})
+        # Formats that would be downloaded with the external downloader are not probed with a range request
+        self.assertIsNone(ydl._probe_format({'url': f'http://127.0.0.1:{self.port}/regular'}))
+        self.assertTrue(YoutubeDL({'logger': FakeLogger()})._probe_format(
+            {'url': f'http://127.0.0.1:{self.port}/regular'}))
+
+    def test_check_formats_stop_early(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        tested = []
+
+        def test_format(f):
+            tested.append(f['format_id'])
+            time.sleep(0.2)
+            # e.g. FragmentFD reporting the failure of a test fragment
+            ydl._download_retcode = 1
+            return True
+
+        ydl._test_format = test_format
+        checked = ydl._check_formats([{'format_id': str(i), 'url': 'http://127.0.0.1/'} for i in range(20)])
+        self.assertEqual(next(checked)['format_id'], '0')
+        checked.close()
+        # The tests that were running have finished, and the return code is not affected by them
+        finished = len(tested)
+        time.sleep(0.3)
+        self.assertEqual(len(tested), finished)
+        self.assertLess(finished, 20)
+        self.assertEqual(ydl._download_retcode, 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -246,7 +246,7 @@ def ctx(request):
 
 
 @pytest.mark.parametrize(
-    'handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+    'handler', ['Urllib', 'Requests', 'HTTPX', 'CurlCFFI'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 @pytest.mark.parametrize('ctx', ['http'], indirect=True)  # pure http proxy can only support http
 class TestHTTPProxy:
@@ -314,6 +314,7 @@ def test_http_with_idn(self, handler, ctx):
 @pytest.mark.parametrize(
     'handler,ctx', [
         ('Requests', 'https'),
+        ('HTTPX', 'https'),
         ('CurlCFFI', 'https'),
     ], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
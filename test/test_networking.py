@@ -7,18 +7,22 @@
 
 import pytest
 
-from yt_dlp.networking.common import Features, DEFAULT_TIMEOUT
+from yt_dlp.networking.common import Features, DEFAULT_TIMEOUT, _PassthroughResponse
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import concurrent.futures
+import contextlib
 import gzip
 import http.client
 import http.cookiejar
 import http.server
 import io
+import json
 import logging
 import pathlib
 import random
+import socket
 import ssl
 import tempfile
 import threading
@@ -36,7 +40,7 @@
     verify_address_availability,
 )
 from yt_dlp.cookies import YoutubeDLCookieJar
-from yt_dlp.dependencies import brotli, curl_cffi, requests, urllib3
+from yt_dlp.dependencies import brotli, curl_cffi, h2, httpx, requests, urllib3, zstd
 from yt_dlp.networking import (
     HEADRequest,
     PATCHRequest,
@@ -46,7 +50,8 @@
     RequestHandler,
     Response,
 )
-from yt_dlp.networking._urllib import UrllibRH
+from yt_dlp.networking._urllib import _DECODERS, UrllibRH, _DecodingReader
+from yt_dlp.networking.cache import ResponseCache, parse_cache_control
 from yt_dlp.networking.exceptions import (
     CertificateVerifyError,
     HTTPError,
@@ -62,6 +67,16 @@
     ImpersonateRequestHandler,
     ImpersonateTarget,
 )
+from yt_dlp.networking.limiter import PRIORITY_BULK, HostLimiter
+from yt_dlp.networking.retry import (
+    CircuitBreaker,
+    CircuitBreakers,
+    RetryBudget,
+    RetryPolicy,
+    circuit_breakers,
+    parse_retry_after,
+)
+from yt_dlp.networking.trace import ChromeTraceExporter, RequestTracer
 from yt_dlp.utils import YoutubeDLError
 from yt_dlp.utils._utils import _YDLLogger as FakeLogger
 from yt_dlp.utils.networking import HTTPHeaderDict, std_headers
@@ -210,6 +225,17 @@ def do_GET(self):
             self.send_header('Content-Length', str(len(compressed)))
             self.end_headers()
             self.wfile.write(compressed)
+        elif self.path == '/gzip_stream':
+            payload = b''.join(b'%08d\n' % i for i in range(100000))
+            compressed = gzip.compress(payload, mtime=0)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(compressed)))
+            self.end_headers()
+            self.wfile.write(compressed[:1024])
+            self.wfile.flush()
+            time.sleep(1)
+            self.wfile.write(compressed[1024:])
         elif self.path == '/302-non-ascii-redirect':
             new_url = f'http://127.0.0.1:{http_server_port(self.server)}/中文.html'
             self.send_response(301)
@@ -222,6 +248,8 @@ def do_GET(self):
             for encoding in filter(None, (e.strip() for e in encodings.split(','))):
                 if encoding == 'br' and brotli:
                     payload = brotli.compress(payload)
+                elif encoding == 'zstd' and zstd:
+                    payload = zstd.compress(payload)
                 elif encoding == 'gzip':
                     payload = gzip.compress(payload, mtime=0)
                 elif encoding == 'deflate':
@@ -311,7 +339,7 @@ def setup_class(cls):
         cls.https_server_thread.start()
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'HTTPX', 'CurlCFFI'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', os.name == 'nt', reason='segfaults')
 class TestHTTPRequestHandler(TestRequestHandlerBase):
 
@@ -695,6 +723,20 @@ def test_read(self, handler):
             # Should auto-close and mark the response adaptor as closed
             assert res.closed
 
+    def test_readinto(self, handler):
+        with handler() as rh:
+            for encoding in ('', 'gzip', 'deflate'):
+                res = validate_and_send(rh, Request(
+                    f'http://127.0.0.1:{self.http_port}/content-encoding',
+                    headers={'ytdl-encoding': encoding}))
+                buf = bytearray(6)
+                assert res.readinto(buf) == 6
+                assert buf == b'<html>'
+                buf = bytearray(512)
+                n = res.readinto(memoryview(buf))
+                assert buf[:n] == b'<video src="/vid.mp4" /></html>'
+                assert res.readinto(buf) == 0
+
     def test_request_disable_proxy(self, handler):
         for proxy_proto in handler._SUPPORTED_PROXY_SCHEMES or ['http']:
             # Given the handler is configured with a proxy
@@ -767,7 +809,7 @@ def test_partial_read_greater_than_response_then_full_read(self, handler):
                 assert res.read() == b''
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'HTTPX', 'CurlCFFI'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 class TestClientCertificate:
     @classmethod
@@ -890,6 +932,11 @@ def _send(self, request: Request):
 
 @pytest.mark.parametrize('handler', ['Urllib'], indirect=True)
 class TestUrllibRequestHandler(TestRequestHandlerBase):
+    def test_resolve(self, handler):
+        with handler(resolve={'yt-dlp.invalid': ['127.0.0.1']}) as rh:
+            res = validate_and_send(rh, Request(f'http://yt-dlp.invalid:{self.http_port}/headers'))
+            assert f'Host: yt-dlp.invalid:{self.http_port}'.encode() in res.read()
+
     def test_file_urls(self, handler):
         # See https://github.com/ytdl-org/youtube-dl/issues/8227
         tf = tempfile.NamedTemporaryFile(delete=False)
@@ -965,6 +1012,68 @@ def get_response():
 
         assert get_response().read() == b'<html></html>'
 
+    @pytest.mark.skipif(not zstd, reason='zstd support is not installed')
+    def test_zstd(self, handler):
+        with handler() as rh:
+            res = validate_and_send(
+                rh, Request(
+                    f'http://127.0.0.1:{self.http_port}/content-encoding',
+                    headers={'ytdl-encoding': 'zstd, gzip'}))
+            assert res.headers.get('Content-Encoding') == 'zstd, gzip'
+            assert res.read() == b'<html><video src="/vid.mp4" /></html>'
+            # Should auto-close and mark the response adaptor as closed
+            assert res.closed
+
+    def test_decoded_response_streaming(self, handler):
+        with handler() as rh:
+            start = time.perf_counter()
+            res = validate_and_send(rh, Request(f'http://127.0.0.1:{self.http_port}/gzip_stream'))
+            # The content is decoded as it arrives instead of once the whole response is received
+            assert res.read(9) == b'00000000\n'
+            assert time.perf_counter() - start < 0.9
+            assert not res.closed
+            assert res.read() == b''.join(b'%08d\n' % i for i in range(1, 100000))
+            assert res.closed
+
+    @pytest.mark.parametrize('encoding,compress', [
+        ('gzip', lambda data: gzip.compress(data, mtime=0)),
+        ('deflate', zlib.compress),
+        ('deflate', lambda data: zlib.compress(data, wbits=-zlib.MAX_WBITS)),
+        pytest.param('br', lambda data: brotli.compress(data), marks=pytest.mark.skipif(
+            not brotli, reason='brotli support is not installed')),
+        # Content of several frames
+        pytest.param(
+            'zstd', lambda data: zstd.compress(data[:5000]) + zstd.compress(data[5000:]),
+            marks=pytest.mark.skipif(not zstd, reason='zstd support is not installed')),
+    ])
+    def test_decoding_reader(self, handler, encoding, compress, monkeypatch):
+        monkeypatch.setattr(_DecodingReader, '_CHUNK_SIZE', 7)
+        data = random.randbytes(10000)
+        reader = _DecodingReader(io.BytesIO(compress(data)), _DECODERS[encoding]())
+        assert reader.read(10) == data[:10]
+        buf = bytearray(5000)
+        assert reader.readinto(buf) == 5000
+        assert buf == data[10:5010]
+        assert reader.read() == data[5010:]
+        assert reader.closed
+        assert reader.read() == b''
+
+        assert _DecodingReader(io.BytesIO(b''), _DECODERS[encoding]()).read() == b''
+
+    def test_decoding_reader_errors(self, handler):
+        compressed = gzip.compress(b'data' * 100, mtime=0)
+        with pytest.raises(zlib.error):
+            _DecodingReader(io.BytesIO(compressed[:-10]), _DECODERS['gzip']()).read()
+        with pytest.raises(zlib.error):
+            _DecodingReader(io.BytesIO(b'not deflate'), _DECODERS['deflate']()).read()
+
+        with handler() as rh:
+            res = validate_and_send(rh, Request(
+                f'http://127.0.0.1:{self.http_port}/content-encoding',
+                headers={'ytdl-encoding': 'unsupported, gzip', 'Accept-Encoding': '*'}))
+            with pytest.raises(TransportError):
+                res.read()
+
     def test_verify_cert_error_text(self, handler):
         # Check the output of the error message
         with handler() as rh:
@@ -1094,6 +1203,112 @@ def test_http_response_auto_close(self, handler):
             assert res.closed
 
 
+class H2TestServer:
+    """In-process HTTP/2 server over TLS, responding to each request with its path and stream id"""
+
+    def __init__(self):
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_context.load_cert_chain(os.path.join(TEST_DIR, 'testcert.pem'), None)
+        self.ssl_context.set_alpn_protocols(['h2'])
+        self.socket = socket.create_server(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        with contextlib.suppress(OSError):
+            while True:
+                sock, _ = self.socket.accept()
+                self.connections += 1
+                threading.Thread(target=self._handle, args=(sock,), daemon=True).start()
+
+    def _handle(self, sock):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        with contextlib.suppress(OSError), self.ssl_context.wrap_socket(sock, server_side=True) as sock:
+            conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+            while data := sock.recv(65535):
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        body = f'{dict(event.headers)[":path"]} {event.stream_id}'.encode()
+                        conn.send_headers(event.stream_id, [(':status', '200'), ('content-length', str(len(body)))])
+                        conn.send_data(event.stream_id, body, end_stream=True)
+                sock.sendall(conn.data_to_send())
+
+    def close(self):
+        self.socket.close()
+
+
+@pytest.mark.parametrize('handler', ['HTTPX'], indirect=True)
+class TestHTTPXRequestHandler(TestRequestHandlerBase):
+    @classmethod
+    def setup_class(cls):
+        super().setup_class()
+        cls.h2_server = H2TestServer()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.h2_server.close()
+
+    def test_http2(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'https://127.0.0.1:{self.h2_server.port}/test'))
+            assert res.extensions['http_version'] == 'HTTP/2'
+            assert res.read() == b'/test 1'
+
+    def test_partial_read(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'https://127.0.0.1:{self.h2_server.port}/test'))
+            assert res.read(2) == b'/t'
+            assert res.read(0) == b''
+            assert res.read(3) == b'est'
+            assert not res.closed
+            assert res.read(100) == b' 1'
+            assert res.closed
+
+    def test_http11_fallback(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'https://127.0.0.1:{self.https_port}/headers'))
+            assert res.extensions['http_version'] == 'HTTP/1.1'
+            res.close()
+
+    def test_multiplexing(self, handler):
+        connections = self.h2_server.connections
+        with handler(verify=False) as rh:
+            def fetch(i):
+                return validate_and_send(rh, Request(f'https://127.0.0.1:{self.h2_server.port}/{i}')).read().decode()
+
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(fetch, range(16)))
+
+        # All concurrent requests should be streams of a single connection
+        assert self.h2_server.connections == connections + 1
+        assert [path for path, _ in map(str.split, results)] == [f'/{i}' for i in range(16)]
+        assert len({stream_id for _, stream_id in map(str.split, results)}) == 16
+
+    def test_http_response_auto_close(self, handler):
+        with handler() as rh:
+            res = validate_and_send(rh, Request(f'http://127.0.0.1:{self.http_port}/gen_200'))
+            assert res.read() == b'<html></html>'
+            assert res.fp.closed
+            assert res.closed
+
+    def test_evicted_client(self, handler, monkeypatch):
+        monkeypatch.setattr(handler, '_MAX_INSTANCES', 1)
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'https://127.0.0.1:{self.h2_server.port}/test'))
+            # Another cookiejar needs another client, which evicts the one of the response
+            validate_and_send(rh, Request(
+                f'https://127.0.0.1:{self.h2_server.port}/other',
+                extensions={'cookiejar': YoutubeDLCookieJar()})).close()
+            assert rh.instance_stats['evicted'] == 1
+            assert res.read() == b'/test 1'
+
+
 @pytest.mark.parametrize('handler', ['CurlCFFI'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', os.name == 'nt', reason='segfaults')
 class TestCurlCFFIRequestHandler(TestRequestHandlerBase):
@@ -1308,6 +1523,11 @@ class HTTPSupportedRH(ValidationRH):
             ('http', False, {}),
             ('https', False, {}),
         ]),
+        ('HTTPX', [
+            ('http', False, {}),
+            ('https', False, {}),
+            ('ftp', UnsupportedRequest, {}),
+        ]),
         ('Websockets', [
             ('ws', False, {}),
             ('wss', False, {}),
@@ -1339,6 +1559,12 @@ class HTTPSupportedRH(ValidationRH):
             ('socks5', False),
             ('socks5h', False),
         ]),
+        ('HTTPX', 'http', [
+            ('http', False),
+            ('https', False),
+            ('socks4', UnsupportedRequest),
+            ('socks5', UnsupportedRequest),
+        ]),
         ('CurlCFFI', 'http', [
             ('http', False),
             ('https', False),
@@ -1371,6 +1597,10 @@ class HTTPSupportedRH(ValidationRH):
             ('all', 'http', False),
             ('unrelated', 'http', False),
         ]),
+        ('HTTPX', 'http', [
+            ('all', 'http', False),
+            ('unrelated', 'http', False),
+        ]),
         ('CurlCFFI', 'http', [
             ('all', 'http', False),
             ('unrelated', 'http', False),
@@ -1410,6 +1640,17 @@ class HTTPSupportedRH(ValidationRH):
             ({'keep_header_casing': True}, False),
             ({'keep_header_casing': 'notabool'}, AssertionError),
         ]),
+        ('HTTPX', 'http', [
+            ({'cookiejar': 'notacookiejar'}, AssertionError),
+            ({'cookiejar': YoutubeDLCookieJar()}, False),
+            ({'timeout': 1}, False),
+            ({'timeout': 'notatimeout'}, AssertionError),
+            ({'unsupported': 'value'}, UnsupportedRequest),
+            ({'legacy_ssl': False}, False),
+            ({'legacy_ssl': True}, False),
+            ({'legacy_ssl': 'notabool'}, AssertionError),
+            ({'keep_header_casing': True}, UnsupportedRequest),
+        ]),
         ('CurlCFFI', 'http', [
             ({'cookiejar': 'notacookiejar'}, AssertionError),
             ({'cookiejar': YoutubeDLCookieJar()}, False),
@@ -1442,6 +1683,7 @@ class HTTPSupportedRH(ValidationRH):
     @pytest.mark.parametrize('handler,fail,scheme', [
         ('Urllib', False, 'http'),
         ('Requests', False, 'http'),
+        ('HTTPX', False, 'http'),
         ('CurlCFFI', False, 'http'),
         ('Websockets', False, 'ws'),
     ], indirect=['handler'])
@@ -1453,6 +1695,7 @@ def test_no_proxy(self, handler, fail, scheme):
         ('Urllib', 'http'),
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
+        ('HTTPX', 'http'),
         ('CurlCFFI', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
@@ -1465,6 +1708,7 @@ def test_empty_proxy(self, handler, scheme):
         ('Urllib', 'http'),
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
+        ('HTTPX', 'http'),
         ('CurlCFFI', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
@@ -1506,6 +1750,20 @@ def test_extension(self, handler, scheme, extensions, fail):
         run_validation(
             handler, fail, Request(f'{scheme}://', extensions=extensions))
 
+    @pytest.mark.parametrize('handler,scheme,fail', [
+        ('Urllib', 'http', False),
+        ('Requests', 'http', UnsupportedRequest),
+        ('HTTPX', 'http', UnsupportedRequest),
+        ('CurlCFFI', 'http', UnsupportedRequest),
+        ('Websockets', 'ws', False),
+        (NoCheckRH, 'http', False),
+    ], indirect=['handler'])
+    def test_resolve(self, handler, scheme, fail):
+        resolve = {'example.com': ['127.0.0.1']}
+        run_validation(handler, fail, Request(f'{scheme}://Example.com/'), resolve=resolve)
+        # Requests to other hosts are not affected
+        run_validation(handler, False, Request(f'{scheme}://example.org/'), resolve=resolve)
+
     def test_invalid_request_type(self):
         rh = self.ValidationRH(logger=FakeLogger())
         for method in (rh.validate, rh.send):
@@ -1652,6 +1910,53 @@ def some_preference(rh, request):
         assert director.send(Request('http://')).read() == b''
         assert director.send(Request('http://', headers={'prefer': '1'})).read() == b'supported'
 
+    def test_memoized_selection(self):
+        director = RequestDirector(logger=FakeLogger())
+        preference_calls, validate_calls = [], []
+
+        class CountingRH(FakeRH):
+            def _validate(self, request):
+                validate_calls.append(request.url)
+                if request.url.startswith('unsupported:'):
+                    raise UnsupportedRequest('unsupported')
+
+        def preference(rh, request):
+            preference_calls.append(request.url)
+            return 0
+
+        director.add_handler(CountingRH(logger=FakeLogger()))
+        director.preferences.add(preference)
+        for path in ('a', 'b'):
+            director.send(Request(f'http://example.com/{path}'))
+        assert preference_calls == validate_calls == ['http://example.com/a']
+
+        # Each part of the request shape, and changes to the handlers or preferences, select again
+        for request in (
+            Request('https://example.com/'), Request('http://example.net/'),
+            Request('http://example.com/', headers={'X-Test': '1'}), Request('http://example.com/', data=b''),
+            Request('http://example.com/', proxies={'all': 'http://127.0.0.1'}),
+            Request('http://example.com/', extensions={'timeout': 1}),
+        ):
+            director.send(request)
+        assert len(preference_calls) == len(validate_calls) == 7
+        director.preferences.add(lambda rh, request: 0)
+        director.send(Request('http://example.com/'))
+        assert len(validate_calls) == 8
+        director.add_handler(CountingRH(logger=FakeLogger()))
+        director.send(Request('http://example.com/'))
+        assert len(validate_calls) == 9
+
+        # Unsupported requests are remembered as well
+        for _ in range(2):
+            with pytest.raises(NoSupportingHandlers, match='unsupported'):
+                director.send(Request('unsupported://'))
+        assert len(validate_calls) == 10
+
+        # Requests with unhashable extensions are not memoized
+        for _ in range(2):
+            director.send(Request('http://example.com/', extensions={'test': []}))
+        assert len(validate_calls) == 12
+
     def test_close(self, monkeypatch):
         director = RequestDirector(logger=FakeLogger())
         director.add_handler(FakeRH(logger=FakeLogger()))
@@ -1666,6 +1971,608 @@ def mock_close(*args, **kwargs):
         assert called
 
 
+class CachingRH(RequestHandler):
+    """Serves `self.responses[url] = (headers, body)`, answering conditional requests on the ETag with 304"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.responses = {}
+        self.requests = []
+
+    def _validate(self, request):
+        self._check_extensions(request.extensions.copy())
+
+    def _send(self, request: Request):
+        self.requests.append(request)
+        headers, body = self.responses[request.url]
+        response = Response(fp=io.BytesIO(body), headers=headers, url=request.url)
+        etag = headers.get('ETag')
+        if etag is not None and request.headers.get('If-None-Match') == etag:
+            raise HTTPError(Response(
+                fp=io.BytesIO(b''), headers={'ETag': etag, 'Cache-Control': 'max-age=60'}, url=request.url, status=304))
+        return response
+
+
+class TestResponseCache:
+
+    @staticmethod
+    def make_director(**kwargs):
+        cache = ResponseCache(cookiejar=YoutubeDLCookieJar(), **kwargs)
+        director = RequestDirector(logger=FakeLogger(), cache=cache)
+        rh = CachingRH(logger=FakeLogger())
+        director.add_handler(rh)
+        return director, rh
+
+    @staticmethod
+    def fetch(director, url, cache=True, extensions=None, **kwargs):
+        with director.send(Request(url, extensions={'cache': cache, **(extensions or {})}, **kwargs)) as response:
+            return response.read()
+
+    def test_parse_cache_control(self):
+        assert parse_cache_control('max-age=60, no-cache="Set-Cookie", Private') == {
+            'max-age': '60', 'no-cache': 'Set-Cookie', 'private': None}
+        assert parse_cache_control(None) == {}
+
+    def test_fresh_response(self):
+        director, rh = self.make_director()
+        rh.responses['http://a/fresh'] = ({'Cache-Control': 'max-age=60'}, b'fresh')
+        rh.responses['http://a/nostore'] = ({'Cache-Control': 'no-store, max-age=60'}, b'nostore')
+        rh.responses['http://a/noinfo'] = ({}, b'noinfo')
+        for url in ('http://a/fresh', 'http://a/nostore', 'http://a/noinfo'):
+            for _ in range(2):
+                assert self.fetch(director, url) == url.rpartition('/')[2].encode()
+        assert [r.url for r in rh.requests] == [
+            'http://a/fresh', 'http://a/nostore', 'http://a/nostore', 'http://a/noinfo', 'http://a/noinfo']
+        # The extension is not passed to the handler
+        assert all('cache' not in r.extensions for r in rh.requests)
+
+        response = director.send(Request('http://a/fresh', extensions={'cache': True}))
+        assert response.extensions['cached'] is True
+        assert response.get_header('Cache-Control') == 'max-age=60'
+        assert response.get_header('Age') == '0'
+
+        # Requests without the extension, or with a request no-cache bypass the cache
+        director.send(Request('http://a/fresh')).read()
+        assert len(rh.requests) == 6
+        self.fetch(director, 'http://a/fresh', headers={'Cache-Control': 'no-cache'})
+        assert len(rh.requests) == 7
+
+    def test_partially_read(self):
+        director, rh = self.make_director(max_entry_size=5)
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        rh.responses['http://b/'] = ({'Cache-Control': 'max-age=60'}, b'abc')
+        director.send(Request('http://a/', extensions={'cache': True})).read(3)
+        self.fetch(director, 'http://a/')
+        with director.send(Request('http://b/', extensions={'cache': True})) as response:
+            assert response.read(2) == b'ab'
+            assert response.read(2) == b'c'
+            assert response.read(2) == b''
+        assert self.fetch(director, 'http://b/') == b'abc'
+        # Not fully read, and then too large
+        assert [r.url for r in rh.requests] == ['http://a/', 'http://a/', 'http://b/']
+
+    def test_revalidation(self):
+        director, rh = self.make_director()
+        rh.responses['http://a/'] = ({'ETag': '"1"', 'Cache-Control': 'no-cache'}, b'content')
+        assert self.fetch(director, 'http://a/') == b'content'
+        assert self.fetch(director, 'http://a/') == b'content'
+        assert [r.headers.get('If-None-Match') for r in rh.requests] == [None, '"1"']
+        # The 304 response made it fresh
+        response = director.send(Request('http://a/', extensions={'cache': True}))
+        assert response.read() == b'content'
+        assert response.get_header('Cache-Control') == 'max-age=60'
+        assert len(rh.requests) == 2
+
+        rh.responses['http://a/'] = ({'ETag': '"2"', 'Cache-Control': 'max-age=60'}, b'changed')
+        assert self.fetch(director, 'http://a/', headers={'Cache-Control': 'no-cache'}) == b'changed'
+        assert self.fetch(director, 'http://a/') == b'changed'
+        assert len(rh.requests) == 3
+
+    def test_ttl(self):
+        director, rh = self.make_director()
+        rh.responses['http://a/'] = ({}, b'content')
+        for _ in range(2):
+            with director.send(Request('http://a/', extensions={'cache': 60})) as response:
+                response.read()
+        assert len(rh.requests) == 1
+        # 0 bypasses the cache
+        director.send(Request('http://a/', extensions={'cache': 0})).read()
+        assert len(rh.requests) == 2
+
+    def test_vary(self):
+        director, rh = self.make_director()
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'}, b'content')
+        for language in ('en', 'en', 'de', 'de'):
+            self.fetch(director, 'http://a/', headers={'Accept-Language': language})
+        assert [r.headers['Accept-Language'] for r in rh.requests] == ['en', 'de']
+
+    def test_authenticated(self):
+        director, rh = self.make_director()
+        rh.responses['http://127.0.0.1/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        rh.responses['http://127.0.0.1/login'] = ({'Cache-Control': 'max-age=60', 'Set-Cookie': 'a=b'}, b'content')
+        for _ in range(2):
+            self.fetch(director, 'http://127.0.0.1/', headers={'Authorization': 'Basic dGVzdDp0ZXN0'})
+            self.fetch(director, 'http://127.0.0.1/login')
+        assert len(rh.requests) == 4
+
+        director.cache.cookiejar.set_cookie(http.cookiejar.Cookie(
+            0, 'test', 'ytdlp', None, False, '127.0.0.1', True,
+            False, '/', True, False, None, False, None, None, {}))
+        for _ in range(2):
+            self.fetch(director, 'http://127.0.0.1/')
+        assert len(rh.requests) == 6
+
+        director.cache.cache_authenticated = True
+        for _ in range(2):
+            self.fetch(director, 'http://127.0.0.1/login')
+        assert len(rh.requests) == 7
+
+    def test_unsafe_methods(self):
+        director, rh = self.make_director()
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        self.fetch(director, 'http://a/')
+        self.fetch(director, 'http://a/', data=b'data')
+        self.fetch(director, 'http://a/')
+        self.fetch(director, 'http://a/', headers={'Range': 'bytes=0-2'})
+        assert [r.method for r in rh.requests] == ['GET', 'POST', 'GET', 'GET']
+
+    def test_disk_cache(self, tmp_path):
+        director, rh = self.make_director(cache_dir=str(tmp_path))
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60', 'X-Test': 'ä'}, b'content')
+        self.fetch(director, 'http://a/')
+        director.cache.clear()
+        response = director.send(Request('http://a/', extensions={'cache': True}))
+        assert response.read() == b'content'
+        assert response.get_header('X-Test') == 'ä'
+        assert len(rh.requests) == 1
+
+    def test_disk_limit(self, tmp_path):
+        director, rh = self.make_director(cache_dir=str(tmp_path))
+        for url in ('http://a/', 'http://b/', 'http://c/'):
+            rh.responses[url] = ({}, b'content')
+        self.fetch(director, 'http://a/', cache=60)
+        # Room for two responses
+        director.cache.max_disk_size = next(tmp_path.iterdir()).stat().st_size * 5 // 2
+        for url in ('http://b/', 'http://a/', 'http://c/'):
+            director.cache.clear()
+            self.fetch(director, url, cache=60)
+            # Some file systems only store the modification time in seconds
+            for i, path in enumerate(sorted(tmp_path.iterdir(), key=lambda p: p.stat().st_mtime)):
+                os.utime(path, (i, i))
+        assert len(rh.requests) == 3
+        # b was used the least recently
+        director.cache.clear()
+        for url in ('http://a/', 'http://c/', 'http://b/'):
+            self.fetch(director, url, cache=60)
+        assert [r.url for r in rh.requests] == ['http://a/', 'http://b/', 'http://c/', 'http://b/']
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_proxy_impersonate(self, tmp_path):
+        director, rh = self.make_director(cache_dir=str(tmp_path), proxies={'all': 'http://proxy.test'})
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        for _ in range(2):
+            self.fetch(director, 'http://a/')
+            self.fetch(director, 'http://a/', proxies={'all': 'http://other-proxy.test'})
+            self.fetch(director, 'http://a/', extensions={'impersonate': ImpersonateTarget('chrome')})
+        assert len(rh.requests) == 3
+        director.cache.clear()
+        self.fetch(director, 'http://a/', proxies={'all': 'http://other-proxy.test'})
+        assert len(rh.requests) == 3
+        assert len(list(tmp_path.iterdir())) == 3
+
+    def test_authenticated_identity(self, tmp_path):
+        director, rh = self.make_director(cache_dir=str(tmp_path), cache_authenticated='disk')
+        rh.responses['http://127.0.0.1/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        cookiejars = []
+        for value in ('a', 'b'):
+            cookiejar = YoutubeDLCookieJar()
+            cookiejar.set_cookie(http.cookiejar.Cookie(
+                0, 'test', value, None, False, '127.0.0.1', True,
+                False, '/', True, False, None, False, None, None, {}))
+            cookiejars.append(cookiejar)
+        for _ in range(2):
+            for cookiejar in cookiejars:
+                self.fetch(director, 'http://127.0.0.1/', extensions={'cookiejar': cookiejar})
+            self.fetch(director, 'http://127.0.0.1/', headers={'Authorization': 'Basic dGVzdDp0ZXN0'})
+            self.fetch(director, 'http://127.0.0.1/', extensions={'cookiejar': YoutubeDLCookieJar()})
+        # Each identity, and no identity, got its own response
+        assert len(rh.requests) == 4
+
+        # Including from the disk cache
+        director.cache.clear()
+        self.fetch(director, 'http://127.0.0.1/', extensions={'cookiejar': cookiejars[1]})
+        assert len(rh.requests) == 4
+        cookiejars[1].clear()
+        self.fetch(director, 'http://127.0.0.1/', extensions={'cookiejar': cookiejars[1]})
+        assert len(rh.requests) == 4
+        cookiejars[0].set_cookie(http.cookiejar.Cookie(
+            0, 'test', 'c', None, False, '127.0.0.1', True,
+            False, '/', True, False, None, False, None, None, {}))
+        self.fetch(director, 'http://127.0.0.1/', extensions={'cookiejar': cookiejars[0]})
+        assert len(rh.requests) == 5
+
+    def test_authenticated_disk(self, tmp_path):
+        director, rh = self.make_director(cache_dir=str(tmp_path), cache_authenticated=True)
+        rh.responses['http://a/'] = ({'Cache-Control': 'max-age=60'}, b'content')
+        rh.responses['http://a/login'] = ({'Cache-Control': 'max-age=60', 'Set-Cookie': 'a=b'}, b'content')
+        self.fetch(director, 'http://a/', headers={'Authorization': 'Basic dGVzdDp0ZXN0'})
+        self.fetch(director, 'http://a/login')
+        self.fetch(director, 'http://a/login')
+        assert len(rh.requests) == 2
+        # Only kept in memory
+        assert not list(tmp_path.iterdir())
+
+        director.cache.cache_authenticated = 'disk'
+        director.cache.clear()
+        self.fetch(director, 'http://a/login')
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_memory_limit(self):
+        director, rh = self.make_director(max_size=15)
+        for url in ('http://a/', 'http://b/'):
+            rh.responses[url] = ({}, b'0123456789')
+            self.fetch(director, url, cache=60)
+        self.fetch(director, 'http://b/', cache=60)
+        assert len(rh.requests) == 2
+        self.fetch(director, 'http://a/', cache=60)
+        assert len(rh.requests) == 3
+
+
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'HTTPX'], indirect=True)
+class TestRequestTracer(TestRequestHandlerBase):
+
+    @staticmethod
+    def make_director(rh):
+        traces = []
+        director = RequestDirector(logger=FakeLogger(), tracer=RequestTracer([traces.append]))
+        director.add_handler(rh)
+        return director, traces
+
+    def test_trace(self, handler):
+        with handler(verify=False) as rh:
+            director, traces = self.make_director(rh)
+            url = f'https://127.0.0.1:{self.https_port}/headers'
+            with director.send(Request(url, extensions={'trace': {'extractor': 'test', 'note': 'Testing'}})) as res:
+                assert not traces
+                data = res.read()
+            assert len(traces) == 1
+            trace = traces[0]
+            assert trace['url'] == url
+            assert trace['method'] == 'GET'
+            assert trace['status'] == 200
+            assert trace['error'] is None
+            assert trace['handler'] == rh.RH_NAME
+            assert trace['extractor'] == 'test'
+            assert trace['note'] == 'Testing'
+            assert trace['bytes_read'] == len(data)
+
+            timings = trace['timings']
+            # httpcore resolves the host as part of connecting
+            phases = ('connect', 'tls') if rh.RH_KEY == 'HTTPX' else ('dns', 'connect', 'tls')
+            assert [span['name'] for span in trace['spans']] == list(phases)
+            assert all(timings[phase] >= 0 for phase in phases)
+            assert 0 <= sum(timings[phase] for phase in phases) <= timings['ttfb'] <= timings['total']
+            assert timings['ttfb'] + timings['transfer'] == pytest.approx(timings['total'])
+
+    def test_trace_error(self, handler):
+        with handler() as rh:
+            director, traces = self.make_director(rh)
+            with pytest.raises(HTTPError):
+                director.send(Request(f'http://127.0.0.1:{self.http_port}/gen_404'))
+            assert len(traces) == 1
+            assert traces[0]['status'] == 404
+            assert traces[0]['error'] == 'HTTP Error 404: Not Found'
+
+            with pytest.raises(TransportError):
+                director.send(Request(f'http://127.0.0.1:{self.http_port}/timeout_5', extensions={'timeout': 0.1}))
+            assert len(traces) == 2
+            assert traces[1]['status'] is None
+            assert traces[1]['error']
+
+
+class TestRequestTracerMisc:
+    def test_no_hooks(self):
+        hooks = []
+        director = RequestDirector(logger=FakeLogger(), tracer=RequestTracer(hooks))
+        director.add_handler(FakeRH(logger=FakeLogger()))
+        request = Request('http://example.com', extensions={'trace': {'note': 'Testing'}})
+        assert isinstance(director.send(request), FakeResponse)
+        # The extension is not passed to the handler
+        assert 'trace' not in director.send(request).request.extensions
+
+        hooks.append(lambda info: None)
+        assert not isinstance(director.send(request), FakeResponse)
+
+    def test_chrome_trace_exporter(self, tmp_path):
+        path = tmp_path / 'trace.json'
+        exporter = ChromeTraceExporter(path)
+        exporter({
+            'url': 'http://example.com', 'method': 'GET', 'status': 200, 'error': None, 'handler': 'urllib',
+            'extractor': 'test', 'note': 'Testing', 'video_id': None, 'timestamp': 10, 'thread_id': 1, 'bytes_read': 5,
+            'timings': {'dns': 0.1, 'connect': 0.2, 'tls': None, 'ttfb': 0.5, 'transfer': 0.5, 'total': 1},
+            'spans': [{'name': 'dns', 'start': 0, 'end': 0.1}, {'name': 'connect', 'start': 0.1, 'end': 0.3}],
+        })
+        exporter.write()
+        events = json.loads(path.read_text())['traceEvents']
+        assert [(event['name'], event['cat']) for event in events] == [
+            ('Testing', 'request,test'), ('dns', 'connection'), ('connect', 'connection'),
+            ('waiting', 'response'), ('transfer', 'response')]
+        assert [event['ts'] for event in events] == pytest.approx(
+            [10_000_000, 10_000_000, 10_100_000, 10_300_000, 10_500_000])
+        assert [event['dur'] for event in events] == pytest.approx([1_000_000, 100_000, 200_000, 200_000, 500_000])
+        assert all(event['ph'] == 'X' and event['tid'] == 1 for event in events)
+        assert events[0]['args'] == {
+            'url': 'http://example.com', 'method': 'GET', 'status': 200, 'handler': 'urllib', 'extractor': 'test',
+            'note': 'Testing', 'timestamp': 10, 'thread_id': 1, 'bytes_read': 5}
+
+class FlakyRH(RequestHandler):
+    """Answers requests with the statuses of `self.statuses` in turn, with 200 once they are exhausted"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statuses = []
+        self.requests = []
+
+    def _validate(self, request):
+        return
+
+    def _send(self, request: Request):
+        self.requests.append((request, time.monotonic()))
+        status, headers = self.statuses.pop(0) if self.statuses else (200, {})
+        if status is None:
+            raise TransportError('connection reset')
+        response = Response(fp=io.BytesIO(b'data'), headers=headers, url=request.url, status=status)
+        if status != 200:
+            raise HTTPError(response)
+        return response
+
+
+class TestRetryPolicy:
+
+    @staticmethod
+    def make_director(budget=None, **kwargs):
+        policy = RetryPolicy(
+            backoff=0, breakers=CircuitBreakers(), budget=budget or RetryBudget(), logger=FakeLogger(), **kwargs)
+        director = RequestDirector(logger=FakeLogger(), retry_policy=policy)
+        rh = FlakyRH(logger=FakeLogger())
+        director.add_handler(rh)
+        return director, rh
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after('100000') == 300
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+        assert parse_retry_after('invalid') is None
+        assert parse_retry_after(None) is None
+
+    def test_retry(self):
+        director, rh = self.make_director(retries=3)
+        rh.statuses = [(503, {}), (None, {})]
+        assert director.send(Request('http://example.com')).read() == b'data'
+        assert len(rh.requests) == 3
+
+        rh.statuses = [(503, {})] * 4
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        assert len(rh.requests) == 7
+
+    def test_no_retry(self):
+        director, rh = self.make_director(retries=3)
+        # Not a transient error
+        rh.statuses = [(404, {})]
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        assert len(rh.requests) == 1
+
+        # Not idempotent
+        rh.statuses = [(503, {})]
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com', data=b'data'))
+        assert len(rh.requests) == 2
+
+        # Not replayable
+        rh.statuses = [(503, {})]
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com', data=io.BytesIO(b'data'), method='PUT'))
+        assert len(rh.requests) == 3
+
+    def test_retry_after(self):
+        director, rh = self.make_director(retries=1)
+        rh.statuses = [(429, {'Retry-After': '1'})]
+        director.send(Request('http://example.com'))
+        assert rh.requests[1][1] - rh.requests[0][1] >= 0.9
+
+    def test_retry_after_hold(self):
+        class Logger:
+            def __init__(self):
+                self.warnings = []
+
+            def debug(self, message, *args, **kwargs):
+                pass
+
+            def warning(self, message, *args, **kwargs):
+                self.warnings.append(message)
+
+        director, rh = self.make_director()
+        director.retry_policy.logger = logger = Logger()
+        rh.statuses = [(503, {'Retry-After': '1'})]
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        # The hold applies to all requests to the host, even if they are not retried
+        assert logger.warnings == ['example.com asked to retry after 1 seconds; holding all requests to it until then']
+        director.send(Request('http://example.com'))
+        assert rh.requests[1][1] - rh.requests[0][1] >= 0.9
+
+    def test_retry_budget(self):
+        director, rh = self.make_director(retries=3, budget=RetryBudget(ratio=0.5, min_tokens=1))
+        rh.statuses = [(503, {})] * 2
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        assert len(rh.requests) == 2
+
+        # Each request deposits half a retry
+        rh.statuses = [(503, {})] * 2
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        assert len(rh.requests) == 4
+
+        director.send(Request('http://example.com'))
+        rh.statuses = [(503, {})]
+        director.send(Request('http://example.com'))
+        assert len(rh.requests) == 7
+
+    def test_circuit_breaker(self, monkeypatch):
+        monkeypatch.setattr(CircuitBreaker, '_COOLDOWN', 0.5)
+        director, rh = self.make_director(breaker_threshold=2)
+        rh.statuses = [(500, {}), (None, {})]
+        for _ in range(2):
+            with pytest.raises(RequestError):
+                director.send(Request('http://example.com'))
+        # Requests to other hosts, or through a proxy, are not held
+        director.send(Request('http://example.org'))
+        director.send(Request('http://example.com', proxies={'all': 'http://proxy.test'}))
+        assert rh.requests[3][1] - rh.requests[1][1] < 0.5
+
+        breaker = director.retry_policy.breakers.get('example.com')
+        assert breaker.is_open
+        assert not director.retry_policy.breakers.get('example.com', 'http://proxy.test').is_open
+        # The probe fails, which opens the breaker again for twice the cooldown
+        rh.statuses = [(502, {})]
+        with pytest.raises(HTTPError):
+            director.send(Request('http://example.com'))
+        assert rh.requests[4][1] - rh.requests[1][1] >= 0.45
+        director.send(Request('http://example.com'))
+        assert rh.requests[5][1] - rh.requests[4][1] >= 0.95
+        assert not breaker.is_open
+
+    def test_circuit_breaker_probe(self, monkeypatch):
+        monkeypatch.setattr(CircuitBreaker, '_COOLDOWN', 0.1)
+        breaker = CircuitBreaker()
+        breaker.release(success=False, threshold=1)
+        assert breaker.is_open
+        breaker.acquire()
+        # Other requests wait for the outcome of the probe
+        probed = threading.Event()
+
+        def request():
+            breaker.acquire()
+            assert probed.is_set()
+            breaker.release(success=True)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.3)
+        probed.set()
+        breaker.release(success=True)
+        thread.join()
+        assert not breaker.is_open
+
+class TestHostLimiter:
+
+    @staticmethod
+    def make_director(max_per_host=1, order='fifo', hooks=None):
+        limiter = HostLimiter(max_per_host, order)
+        director = RequestDirector(
+            logger=FakeLogger(), limiter=limiter, tracer=RequestTracer(hooks) if hooks else None)
+        director.add_handler(FakeRH(logger=FakeLogger()))
+        return director, limiter
+
+    @staticmethod
+    def wait_for_waiting(limiter, count):
+        for _ in range(100):
+            if limiter.stats['waiting'] == count:
+                return
+            time.sleep(0.01)
+        raise AssertionError(f'{count} requests are not waiting')
+
+    def test_limit(self):
+        director, limiter = self.make_director(max_per_host=2)
+        responses = [director.send(Request(f'http://example.com/{i}')) for i in range(2)]
+        # Other hosts have their own limit
+        director.send(Request('http://example.org/')).close()
+
+        sent = []
+        thread = threading.Thread(target=lambda: sent.append(director.send(Request('http://example.com/2'))))
+        thread.start()
+        self.wait_for_waiting(limiter, 1)
+        assert not sent
+        assert limiter.stats['in_flight'] == 2
+        # The slot of a request is released once its response is closed
+        responses[0].read()
+        responses[0].close()
+        thread.join()
+        assert sent[0].url == 'http://example.com/2'
+
+        for response in (responses[1], sent[0]):
+            response.close()
+        stats = limiter.stats
+        assert stats['requests'] == 4
+        assert stats['queued'] == 1
+        assert stats['in_flight'] == stats['waiting'] == 0
+        assert 0 < stats['max_queue_time'] == stats['queue_time']
+
+    def test_unclosed_response(self):
+        director, limiter = self.make_director()
+        assert director.send(Request('http://example.com/')).url == 'http://example.com/'
+        # The slot was released when the response was dropped
+        assert limiter.stats['in_flight'] == 0
+
+        response = director.send(Request('http://example.com/'))
+        start = time.monotonic()
+        # A request that waits for longer than its timeout is sent regardless
+        other_response = director.send(Request('http://example.com/', extensions={'timeout': 0.2}))
+        assert time.monotonic() - start >= 0.2
+        assert limiter.stats['in_flight'] == 2
+        assert limiter.stats['waiting'] == 0
+        response.close()
+        other_response.close()
+        assert limiter.stats['in_flight'] == 0
+
+    def test_error_releases_slot(self):
+        director, limiter = self.make_director()
+        with pytest.raises(SSLError):
+            director.send(Request('ssl://something'))
+        assert limiter.stats['in_flight'] == 0
+
+    @pytest.mark.parametrize('order,expected', [
+        ('fifo', ['low', 'high', 'default']),
+        ('priority', ['high', 'default', 'low']),
+    ])
+    def test_order(self, order, expected):
+        director, limiter = self.make_director(order=order)
+        response = director.send(Request('http://example.com/'))
+        sent = []
+
+        def send(name, priority):
+            extensions = {} if priority is None else {'priority': priority}
+            with director.send(Request(f'http://example.com/{name}', extensions=extensions)) as response:
+                sent.append(response.url.rpartition('/')[2])
+                assert 'priority' not in response.fp.request.extensions
+
+        threads = []
+        for i, (name, priority) in enumerate((('low', PRIORITY_BULK), ('high', 10), ('default', None))):
+            threads.append(threading.Thread(target=send, args=(name, priority)))
+            threads[-1].start()
+            self.wait_for_waiting(limiter, i + 1)
+        response.close()
+        for thread in threads:
+            thread.join()
+        assert sent == expected
+
+    def test_queue_trace(self):
+        traces = []
+        director, limiter = self.make_director(hooks=[traces.append])
+        response = director.send(Request('http://example.com/'))
+        thread = threading.Thread(target=lambda: director.send(Request('http://example.com/')).close())
+        thread.start()
+        self.wait_for_waiting(limiter, 1)
+        time.sleep(0.1)
+        response.close()
+        thread.join()
+        assert traces[0]['timings']['queue'] is None
+        assert traces[1]['timings']['queue'] >= 0.1
+        assert [span['name'] for span in traces[1]['spans']] == ['queue']
+
 # XXX: do we want to move this to test_YoutubeDL.py?
 class TestYoutubeDLNetworking:
 
@@ -1718,6 +2625,17 @@ def test_sanitize_url(self):
             res = ydl.urlopen(Request('httpss://foo.bar'))
             assert res.request.url == 'https://foo.bar'
 
+    @pytest.mark.skipif(not (httpx and h2), reason='httpx request handler is not available')
+    @pytest.mark.parametrize('params,url,preferred', [
+        ({}, 'https://example.com', False),
+        ({'prefer_http2': True}, 'https://example.com', True),
+        ({'prefer_http2': True}, 'http://example.com', False),
+    ])
+    def test_prefer_http2(self, params, url, preferred):
+        with FakeYDL(params) as ydl:
+            handlers = ydl._request_director._get_handlers(Request(url))
+            assert (handlers[0].RH_KEY == 'HTTPX') is preferred
+
     def test_file_urls_error(self):
         # use urllib handler
         with FakeYDL() as ydl:
@@ -1828,6 +2746,40 @@ def _send(self, request: Request):
             assert ydl._impersonate_target_available(ImpersonateTarget())
             assert not ydl._impersonate_target_available(ImpersonateTarget('zxy'))
 
+    def test_http_cache(self, tmp_path):
+        with FakeYDL() as ydl:
+            assert ydl.build_request_director([FakeRH]).cache is None
+
+        with FakeYDL({'http_cache': 'memory', 'cachedir': str(tmp_path)}) as ydl:
+            cache = ydl.build_request_director([FakeRH]).cache
+            assert isinstance(cache, ResponseCache)
+            assert cache.cookiejar is ydl.cookiejar
+            assert cache.cache_dir is None
+            assert not cache.cache_authenticated
+
+        with FakeYDL({'http_cache': 'disk', 'cachedir': str(tmp_path), 'http_cache_authenticated': True}) as ydl:
+            cache = ydl.build_request_director([FakeRH]).cache
+            assert cache.cache_dir == str(tmp_path / 'http')
+            assert cache.cache_authenticated is True
+
+        with FakeYDL({'http_cache': 'disk', 'cachedir': False}) as ydl:
+            assert ydl.build_request_director([FakeRH]).cache.cache_dir is None
+
+        with FakeYDL({'http_cache': 'memory', 'proxy': 'http://proxy.test'}) as ydl:
+            assert ydl.build_request_director([FakeRH]).cache.proxies == {'all': 'http://proxy.test'}
+
+    def test_circuit_breakers(self):
+        with FakeYDL({'proxy': 'http://proxy.test'}) as ydl, FakeYDL() as other_ydl:
+            breakers = ydl.build_request_director([FakeRH]).retry_policy.breakers
+            assert ydl.build_request_director([FakeRH]).retry_policy.breakers is breakers
+            assert ydl.build_request_director([FakeRH]).retry_policy.proxies == {'all': 'http://proxy.test'}
+            # Other instances do not back off from the hosts that fail for this one
+            assert other_ydl.build_request_director([FakeRH]).retry_policy.breakers is not breakers
+            assert breakers is not circuit_breakers
+
+        with FakeYDL({'share_circuit_breakers': True}) as ydl:
+            assert ydl.build_request_director([FakeRH]).retry_policy.breakers is circuit_breakers
+
     @pytest.mark.parametrize('proxy_key,proxy_url,expected', [
         ('http', '__noproxy__', None),
         ('no', '127.0.0.1,foo.bar', '127.0.0.1,foo.bar'),
@@ -1925,6 +2877,41 @@ def test_compat_opt_prefer_urllib(self):
             assert len(director.preferences) == 1
             assert director.preferences.pop()(UrllibRH, None)
 
+    def test_shared_ssl_context(self):
+        with FakeYDL() as ydl1, FakeYDL() as ydl2:
+            rh1, rh2 = self.build_handler(ydl1, UrllibRH), self.build_handler(ydl2, UrllibRH)
+            assert rh1._make_sslcontext() is rh2._make_sslcontext()
+            assert rh1._make_sslcontext() is not rh1._make_sslcontext(legacy_ssl_support=True)
+            assert rh1._make_sslcontext() is not self.build_handler(ydl1)._make_sslcontext()
+
+        with FakeYDL({'nocheckcertificate': True}) as ydl:
+            assert self.build_handler(ydl, UrllibRH)._make_sslcontext() is not rh1._make_sslcontext()
+
+    def test_trace_hooks(self):
+        traces = []
+        with FakeRHYDL({'trace_hooks': [traces.append]}) as ydl:
+            ydl.urlopen(Request('http://example.com', extensions={'trace': {'note': 'Testing'}})).close()
+            assert len(traces) == 1
+            assert traces[0]['note'] == 'Testing'
+            assert traces[0]['handler'] == 'Fake'
+
+    def test_warm_up_connections(self):
+        with FakeRHYDL() as ydl:
+            requests = []
+            urlopen = ydl.urlopen
+
+            def fake_urlopen(request):
+                requests.append(request)
+                if request.url.startswith('https://fail.'):
+                    raise TransportError('fail')
+                return urlopen(request)
+
+            ydl.urlopen = fake_urlopen
+            ydl.warm_up_connections(['example.com', 'fail.example.com', 'http://example.org:8080', 'example.com'])
+            assert all(request.method == 'HEAD' for request in requests)
+            assert sorted(request.url for request in requests) == [
+                'http://example.org:8080', 'https://example.com/', 'https://fail.example.com/']
+
 
 class TestRequest:
 
@@ -2136,6 +3123,15 @@ def read(self, size=-1, /):
         res.read()
         assert res.closed
 
+    def test_readinto(self):
+        res = Response(io.BytesIO(b'test'), url='test://', headers={}, status=200)
+        buf = bytearray(3)
+        assert res.readinto(buf) == 3
+        assert buf == b'tes'
+        assert res.readinto(memoryview(buf)[1:]) == 1
+        assert buf == b'tts'
+        assert res.readinto(buf) == 0
+
     def test_close(self):
         # Should not call close() on the underlying file when already closed
         fp = MagicMock()
@@ -2146,6 +3142,31 @@ def test_close(self):
         res.close()
         assert fp.close.call_count == 1
 
+    def test_passthrough(self):
+        closed = []
+        res = Response(io.BytesIO(b'test'), url='test://', headers={'test': 'test'}, status=200)
+        res = _PassthroughResponse(res, closed.append)
+        assert res.get_header('test') == 'test'
+        assert res.read(3) == b'tes'
+        assert res.readinto(bytearray(3)) == 1
+        res.close()
+        res.close()
+        assert closed == [res]
+        assert res.bytes_read == 4
+        assert res.error is None
+
+        class FailingResponse(Response):
+            def read(self, amt=None):
+                raise TransportError('connection reset')
+
+        closed = []
+        res = _PassthroughResponse(FailingResponse(io.BytesIO(), url='test://', headers={}), closed.append)
+        with pytest.raises(TransportError):
+            res.read()
+        # The response is closed once reading it fails
+        assert closed == [res]
+        assert isinstance(res.error, TransportError)
+
 
 class TestImpersonateTarget:
     @pytest.mark.parametrize('target_str,expected', [
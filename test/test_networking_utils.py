@@ -8,18 +8,29 @@
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import contextlib
 import io
 import random
+import socket
 import ssl
+import threading
+import time
 
 from yt_dlp.cookies import YoutubeDLCookieJar
 from yt_dlp.dependencies import certifi
 from yt_dlp.networking import Response
 from yt_dlp.networking._helper import (
+    DNSCache,
     InstanceStoreMixin,
+    ResumableSSLContext,
+    _interleave_address_families,
+    _race_connections,
     add_accept_encoding_header,
+    current_proxy,
     get_redirect_method,
+    get_shared_ssl_context,
     make_socks_proxy_opts,
+    make_ssl_context,
     ssl_load_certs,
 )
 from yt_dlp.networking.exceptions import (
@@ -166,6 +177,292 @@ def test_mixin(self):
         mixin._clear_instances()
         assert mixin._get_instance(t=1234) != m
 
+    def test_lru_eviction(self):
+        closed = []
+
+        class Mixin(InstanceStoreMixin):
+            _MAX_INSTANCES = 2
+
+            def _create_instance(self, **kwargs):
+                return kwargs['n']
+
+            def _close_instance(self, instance):
+                closed.append(instance)
+
+        mixin = Mixin()
+        assert mixin._get_instance(n=1) == 1
+        assert mixin._get_instance(n=2) == 2
+        assert mixin._get_instance(n=1) == 1
+        # The least recently used instance is evicted and closed
+        assert mixin._get_instance(n=3) == 3
+        assert closed == [2]
+        assert mixin._get_instance(n=1) == 1
+        assert mixin.instance_stats == {'created': 3, 'reused': 2, 'evicted': 1, 'expired': 0, 'size': 2}
+        mixin._clear_instances()
+        assert sorted(closed) == [1, 2, 3]
+        assert mixin.instance_stats['size'] == 0
+
+    def test_idle_timeout(self, monkeypatch):
+        closed = []
+        now = 1000
+
+        class Mixin(InstanceStoreMixin):
+            _INSTANCE_IDLE_TIMEOUT = 60
+
+            def _create_instance(self, **kwargs):
+                return kwargs['n']
+
+            def _close_instance(self, instance):
+                closed.append(instance)
+
+        monkeypatch.setattr('yt_dlp.networking._helper.time.monotonic', lambda: now)
+        mixin = Mixin()
+        mixin._get_instance(n=1)
+        mixin._get_instance(n=2)
+        now += 50
+        mixin._get_instance(n=2)
+        now += 50
+        # Only the instance that has been idle for longer than the timeout is closed
+        mixin._get_instance(n=3)
+        assert closed == [1]
+        assert mixin.instance_stats['expired'] == 1
+
+    def test_held_instance(self):
+        closed = []
+
+        class Mixin(InstanceStoreMixin):
+            _MAX_INSTANCES = 1
+
+            def _create_instance(self, **kwargs):
+                return kwargs['n']
+
+            def _close_instance(self, instance):
+                closed.append(instance)
+
+        mixin = Mixin()
+        instance, release = mixin._get_held_instance(n=1)
+        assert instance == 1
+        _, other_release = mixin._get_held_instance(n=1)
+        # An evicted instance is only closed once it is no longer held
+        mixin._get_instance(n=2)
+        assert mixin.instance_stats['evicted'] == 1
+        release()
+        release()
+        assert not closed
+        other_release()
+        assert closed == [1]
+
+        _, release = mixin._get_held_instance(n=3)
+        release()
+        mixin._get_instance(n=4)
+        assert closed == [1, 2, 3]
+        # Evicted instances that are still held are closed with the others
+        _, release = mixin._get_held_instance(n=5)
+        mixin._get_instance(n=6)
+        mixin._clear_instances()
+        assert closed == [1, 2, 3, 4, 6, 5]
+
+
+def fake_addrinfo(ip, port=80):
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    return (family, socket.SOCK_STREAM, 6, '', (ip, port))
+
+
+class TestDNSCache:
+    def test_cache(self, monkeypatch):
+        lookups = []
+
+        def getaddrinfo(host, port, *args):
+            lookups.append(host)
+            if host == 'invalid.test':
+                raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+            return [fake_addrinfo('192.0.2.1', port)]
+
+        now = 1000
+        monkeypatch.setattr('yt_dlp.networking._helper.socket.getaddrinfo', getaddrinfo)
+        monkeypatch.setattr('yt_dlp.networking._helper.time.monotonic', lambda: now)
+        cache = DNSCache(ttl=60, negative_ttl=10)
+        assert cache.getaddrinfo('example.test', 80) == [fake_addrinfo('192.0.2.1')]
+        assert cache.getaddrinfo('example.test', 80) == [fake_addrinfo('192.0.2.1')]
+        assert lookups == ['example.test']
+
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                cache.getaddrinfo('invalid.test', 80)
+        assert lookups == ['example.test', 'invalid.test']
+
+        # Failed lookups expire first
+        now += 30
+        with pytest.raises(socket.gaierror):
+            cache.getaddrinfo('invalid.test', 80)
+        cache.getaddrinfo('example.test', 80)
+        assert lookups == ['example.test', 'invalid.test', 'invalid.test']
+
+        now += 31
+        cache.getaddrinfo('example.test', 80)
+        assert lookups == ['example.test', 'invalid.test', 'invalid.test', 'example.test']
+        cache.remove('example.test', 80)
+        cache.getaddrinfo('example.test', 80)
+        assert lookups.count('example.test') == 3
+
+    def test_overrides(self):
+        cache = DNSCache()
+        addrs = cache.getaddrinfo('Example.test', 443, {'example.test': ['127.0.0.1', '::1']})
+        assert [(addr[0], addr[4][:2]) for addr in addrs] == [
+            (socket.AF_INET, ('127.0.0.1', 443)), (socket.AF_INET6, ('::1', 443))]
+
+
+class TestHappyEyeballs:
+    def test_interleave_address_families(self):
+        addrs = [fake_addrinfo(ip) for ip in ('::1', '::2', '::3', '192.0.2.1', '192.0.2.2')]
+        assert [addr[4][0] for addr in _interleave_address_families(addrs)] == [
+            '::1', '192.0.2.1', '::2', '192.0.2.2', '::3']
+
+    def test_race(self):
+        closed = []
+
+        class FakeSocket:
+            def __init__(self, ip):
+                self.ip = ip
+
+            def close(self):
+                closed.append(self.ip)
+
+        unblock = threading.Event()
+
+        def create_socket(ip_addr, timeout, source_address):
+            ip = ip_addr[4][0]
+            if ip == '::1':  # Broken IPv6 connectivity
+                unblock.wait()
+                raise TimeoutError('timed out')
+            if ip == '::2':
+                raise ConnectionRefusedError
+            return FakeSocket(ip)
+
+        start = time.monotonic()
+        sock = _race_connections(
+            [fake_addrinfo(ip) for ip in ('::1', '192.0.2.1')], None, None, create_socket, delay=0.05)
+        assert sock.ip == '192.0.2.1'
+        assert time.monotonic() - start < 1
+        unblock.set()
+
+        # A failed attempt starts the next one without waiting for the delay
+        start = time.monotonic()
+        sock = _race_connections(
+            [fake_addrinfo(ip) for ip in ('::2', '192.0.2.2')], None, None, create_socket, delay=10)
+        assert sock.ip == '192.0.2.2'
+        assert time.monotonic() - start < 1
+        assert closed == []
+
+        with pytest.raises(ConnectionRefusedError):
+            _race_connections([fake_addrinfo('::2')] * 2, None, None, create_socket, delay=10)
+
+    def test_race_closes_other_connections(self):
+        closed = []
+        both_connected = threading.Barrier(2)
+
+        class FakeSocket:
+            def __init__(self, ip):
+                self.ip = ip
+
+            def close(self):
+                closed.append(self.ip)
+
+        def create_socket(ip_addr, timeout, source_address):
+            both_connected.wait()
+            return FakeSocket(ip_addr[4][0])
+
+        sock = _race_connections(
+            [fake_addrinfo(ip) for ip in ('::1', '192.0.2.1')], None, None, create_socket, delay=0.01)
+        for _ in range(100):
+            if closed:
+                break
+            time.sleep(0.01)
+        assert closed == [({'::1', '192.0.2.1'} - {sock.ip}).pop()]
+
+
+class TestSSLSessionResumption:
+    @staticmethod
+    def _start_tls_server():
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(os.path.join(TEST_DIR, 'testcert.pem'))
+        server = socket.create_server(('127.0.0.1', 0))
+
+        def serve():
+            while True:
+                try:
+                    sock, _ = server.accept()
+                except OSError:
+                    return
+                with contextlib.suppress(OSError), context.wrap_socket(sock, server_side=True) as tls_sock:
+                    tls_sock.recv(1024)
+                    tls_sock.sendall(b'pong')
+
+        threading.Thread(target=serve, daemon=True).start()
+        return server
+
+    @staticmethod
+    def _connect(context, port):
+        with context.wrap_socket(socket.create_connection(('127.0.0.1', port)), server_hostname='localhost') as sock:
+            sock.sendall(b'ping')
+            assert sock.recv(1024) == b'pong'
+            return sock.session_reused
+
+    def test_resumption(self):
+        server = self._start_tls_server()
+        try:
+            port = server.getsockname()[1]
+            context = make_ssl_context(verify=False)
+            assert self._connect(context, port) is False
+            assert self._connect(context, port) is True
+            # Sessions are not shared between contexts
+            assert self._connect(make_ssl_context(verify=False), port) is False
+        finally:
+            server.close()
+
+    def test_resumption_proxy(self):
+        server = self._start_tls_server()
+        try:
+            port = server.getsockname()[1]
+            context = make_ssl_context(verify=False)
+            token = current_proxy.set('http://proxy-a:8080')
+            try:
+                assert self._connect(context, port) is False
+                assert self._connect(context, port) is True
+            finally:
+                current_proxy.reset(token)
+            # Sessions are not shared between connections through different proxies
+            token = current_proxy.set('http://proxy-b:8080')
+            try:
+                assert self._connect(context, port) is False
+            finally:
+                current_proxy.reset(token)
+            assert self._connect(context, port) is False
+        finally:
+            server.close()
+
+    def test_session_key(self):
+        class FakeSocket:
+            def __init__(self, peer):
+                self.peer = peer
+
+            def getpeername(self):
+                return self.peer
+
+        key = ResumableSSLContext._session_key
+        # The peer of connections through a proxy is the proxy
+        assert key(FakeSocket(('10.0.0.1', 8080)), 'example.com') != key(FakeSocket(('10.0.0.2', 8080)), 'example.com')
+        assert key(FakeSocket(('10.0.0.1', 443)), 'example.com') == key(FakeSocket(('10.0.0.1', 443)), 'example.com')
+        assert key(FakeSocket(('::1', 443, 0, 0)), 'example.com') == key(FakeSocket(('::1', 443, 0, 1)), 'example.com')
+        # Not connected
+        assert key(FakeSocket(None), 'example.com') is None
+
+    def test_shared_context(self):
+        context = get_shared_ssl_context('Test', verify=False)
+        assert get_shared_ssl_context('Test', verify=False) is context
+        assert get_shared_ssl_context('Test', verify=True) is not context
+        assert get_shared_ssl_context('Other', verify=False) is not context
+
 
 class TestNetworkingExceptions:
 
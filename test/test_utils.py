@@ -141,6 +141,7 @@
     normalize_url,
     remove_dot_segments,
 )
+from yt_dlp.utils.progress import RateLimiter
 
 
 class TestUtil(unittest.TestCase):
@@ -783,6 +784,14 @@ def test_read_batch_urls(self):
             ; or after this
             bam''')
         self.assertEqual(read_batch_urls(f), ['foo', 'bar', 'baz', 'bam'])
+        self.assertTrue(f.closed)
+
+        f = io.StringIO('foo\n# bar\nbaz\n')
+        urls = read_batch_urls(f, lazy=True)
+        self.assertEqual(next(urls), 'foo')
+        self.assertEqual(f.readline(), '# bar\n')
+        self.assertEqual(list(urls), ['baz'])
+        self.assertTrue(f.closed)
 
     def test_urlencode_postdata(self):
         data = urlencode_postdata({'username': 'foo@bar.com', 'password': '1234'})
@@ -2243,6 +2252,47 @@ def test(inp):
         test(self._JWT_WITH_REORDERED_HEADERS_AND_RS256_ALG)
         test(self._JWT_WITH_EXTRA_HEADERS_AND_ES256_ALG)
 
+    def test_rate_limiter(self):
+        with unittest.mock.patch('time.monotonic', return_value=100.0) as monotonic, \
+                unittest.mock.patch('time.sleep') as sleep:
+            limiter = RateLimiter(1000)
+            limiter.consume(500)
+            sleep.assert_called_once_with(0.5)
+            # The debt of a consumer accumulates
+            limiter.consume(500)
+            self.assertEqual(sleep.call_args.args, (1.0, ))
+            # The bucket refills up to the burst size
+            monotonic.return_value = 110.0
+            limiter.consume(1000)
+            self.assertEqual(sleep.call_count, 2)
+
+            # A weight does not raise the rate of a lone consumer
+            limiter = RateLimiter(1000)
+            self.assertEqual(limiter.reserve(2000, weight=2, key='a'), 2.0)
+            # Consumers split the rate in proportion to their weights
+            limiter = RateLimiter(1000)
+            limiter.reserve(0, weight=2, key='a')
+            limiter.reserve(0, weight=1, key='b')
+            self.assertAlmostEqual(limiter.reserve(2000, weight=2, key='a'), 3.0)
+            self.assertAlmostEqual(limiter.reserve(1000, weight=1, key='b'), 3.0)
+            # Idle consumers no longer take a share
+            monotonic.return_value = 120.0
+            self.assertAlmostEqual(limiter.reserve(2000, weight=2, key='a'), 1.0)
+
+        limiter = RateLimiter.get(('test', ), 10)
+        self.assertIs(RateLimiter.get(('test', ), 10), limiter)
+        # A different rate does not change the rate of the existing limiter
+        self.assertEqual(RateLimiter.get(('test', ), 20).rate, 20)
+        self.assertEqual(limiter.rate, 10)
+
+        # Limiters without active consumers are dropped
+        with unittest.mock.patch.object(RateLimiter, 'MAX_INSTANCES', 2):
+            limiter.reserve(1000)
+            for rate in range(1, 4):
+                RateLimiter.get(('test', ), rate)
+            self.assertIs(RateLimiter.get(('test', ), 10), limiter)
+            self.assertEqual(len(RateLimiter._instances), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import contextlib
 import copy
 import datetime as dt
@@ -19,18 +20,23 @@
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import tokenize
 import traceback
 import unicodedata
 
+from .archive import DownloadArchive
 from .cache import Cache
 from .compat import urllib  # isort: split
 from .compat import urllib_req_to_req
 from .cookies import CookieLoadError, LenientSimpleCookie, load_cookies
-from .downloader import FFmpegFD, get_suitable_downloader, shorten_protocol_name
+from .dependencies import orjson
+from .downloader import FFmpegFD, HttpFD, get_suitable_downloader, shorten_protocol_name
+from .downloader.external import ExternalFD
 from .downloader.rtmp import rtmpdump_version
 from .extractor import gen_extractor_classes, get_info_extractor, import_extractors
+from .extractor._dispatch import URLDispatchIndex
 from .extractor.common import UnsupportedURLIE
 from .extractor.openload import PhantomJSwrapper
 from .globals import (
@@ -47,6 +53,7 @@
 )
 from .minicurses import format_text
 from .networking import HEADRequest, Request, RequestDirector
+from .networking.cache import ResponseCache
 from .networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES
 from .networking.exceptions import (
     HTTPError,
@@ -56,6 +63,9 @@
     network_exceptions,
 )
 from .networking.impersonate import ImpersonateRequestHandler, ImpersonateTarget
+from .networking.limiter import get_shared_host_limiter
+from .networking.retry import CircuitBreakers, RetryPolicy, circuit_breakers
+from .networking.trace import ChromeTraceExporter, RequestTracer
 from .plugins import directories as plugin_directories, load_all_plugins
 from .postprocessor import (
     EmbedThumbnailPP,
@@ -136,7 +146,6 @@
     iri_to_uri,
     is_path_like,
     join_nonempty,
-    locked_file,
     make_archive_id,
     make_dir,
     number_of_digits,
@@ -182,6 +191,18 @@
     import ctypes
 
 
+class _ReplacementFormatter(string.Formatter):
+    """ Formatter for the replacement of an output template field, where {} (or {0}) is the value """
+
+    def get_field(self, field_name, args, kwargs):
+        if field_name.isdigit():
+            return args[0], -1
+        raise ValueError('Unsupported field')
+
+
+_REPLACEMENT_FORMATTER = _ReplacementFormatter()
+
+
 def _catch_unsafe_extension_error(func):
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
@@ -293,6 +314,12 @@ class YoutubeDL:
     playlist_items:    Specific indices of playlist to download.
     playlistrandom:    Download playlist items in random order.
     lazy_playlist:     Process playlist entries as they are received.
+    playlist_workers:  Number of playlist entries to extract concurrently.
+                       The entries are still processed in order
+    batch_workers:     Number of the URLs passed to download() to extract
+                       concurrently. The URLs are still processed one at a time
+    batch_unordered:   Process the URLs of batch_workers as soon as their
+                       extraction completes, instead of in order
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            A class having a `debug`, `warning` and `error` function where
@@ -340,8 +367,12 @@ class YoutubeDL:
                        downloaded.
                        Videos without view count information are always
                        downloaded. None for no limit.
-    download_archive:  A set, or the name of a file where all downloads are recorded.
-                       Videos already present in the file are not downloaded again.
+    download_archive:  A set, a DownloadArchive, or the name of a file where all downloads
+                       are recorded. Videos already present in the file are not downloaded again.
+                       Files with a .db, .sqlite or .sqlite3 extension are SQLite databases
+                       (see yt_dlp.archive); other files list one ID per line
+    import_download_archive: Name of a text archive file whose IDs are added to
+                       download_archive on startup
     break_on_existing: Stop the download process after attempting to download a
                        file that is in the archive.
     break_per_url:     Whether break_on_reject and break_on_existing
@@ -366,9 +397,31 @@ class YoutubeDL:
     geo_verification_proxy:  URL of the proxy to use for IP address verification
                        on geo-restricted sites.
     socket_timeout:    Time to wait for unresponsive hosts, in seconds
+    http_cache:        Cache the responses to extractor requests as allowed by
+                       their caching headers. One of 'memory' or 'disk'
+                       (also keep them in the cache directory)
+    http_cache_authenticated: Also cache the responses to requests with
+                       credentials or cookies, and those that set cookies.
+                       They are only kept in memory, unless this is 'disk'
+    request_retries:   Number of times to retry HTTP requests that fail with a
+                       transient error. See networking.retry.RetryPolicy
+    circuit_breaker_threshold: Number of consecutive failed requests to a host
+                       after which all requests to it are held for a cooldown.
+                       0 to disable. Default is 5
+    share_circuit_breakers: Share the circuit breakers of hosts with the other
+                       YoutubeDL instances of the process that set this,
+                       instead of only backing off from a host in this one
+    max_requests_per_host: Maximum number of HTTP requests in flight to a host,
+                       shared by all YoutubeDL instances with the same limit
+    request_queue_order: Order in which the requests that wait for
+                       max_requests_per_host are sent. One of 'fifo' or
+                       'priority' (default; requests with a higher `priority`
+                       extension first). See networking.limiter
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
+    request_trace_file: File to write the timings of all HTTP requests to as
+                       Chrome trace events. See networking.trace.ChromeTraceExporter
     default_search:    Prepend this string if an input url is not valid.
                        'auto' for elaborate guessing
     encoding:          Use this encoding instead of the system-specified.
@@ -411,9 +464,22 @@ class YoutubeDL:
                                          downloaded video fragment.
                        * fragment_count: The number of fragments (= individual
                                          files that will be merged)
+                       * latency_to_edge: The estimated number of seconds that
+                                          the currently downloaded fragment of
+                                          a live stream is behind its live edge
 
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
+    trace_hooks:       A list of functions that get called with a dictionary of
+                       the timings of each HTTP request once its response is
+                       closed, or when it fails. The entries include
+                       * url, method, status, handler
+                       * error: Error message, if the request failed
+                       * timings: Dictionary of the durations in seconds of
+                                  "dns", "connect", "tls", "ttfb", "transfer"
+                                  and "total". None if they did not happen
+                       * extractor, note, video_id: For requests of extractors
+                       See networking.trace.RequestTrace.to_dict for all entries
     postprocessor_hooks:  A list of functions that get called on postprocessing
                        progress, with a dictionary with the entries
                        * status: One of "started", "processing", or "finished".
@@ -433,6 +499,11 @@ class YoutubeDL:
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
     source_address:    Client-side IP address to bind to.
+    resolve:           Dictionary of lowercase hostnames to lists of IP addresses
+                       to connect to instead of resolving the hostnames.
+                       Requests to these hosts are only sent with the urllib and
+                       websockets handlers, which support this
+    prefer_http2:      Prefer the httpx request handler, which supports HTTP/2, for https URLs
     impersonate:       Client to impersonate for requests.
                        An ImpersonateTarget (from yt_dlp.networking.impersonate)
     sleep_interval_requests: Number of seconds to sleep between requests
@@ -510,8 +581,8 @@ class YoutubeDL:
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see yt_dlp/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, throttledratelimit, min_filesize,
-    max_filesize, test, noresizebuffer, retries, file_access_retries, fragment_retries,
+    nopart, updatetime, buffersize, ratelimit, global_ratelimit, host_ratelimit, ratelimit_weight,
+    throttledratelimit, min_filesize, max_filesize, test, noresizebuffer, retries, file_access_retries, fragment_retries,
     continuedl, hls_use_mpegts, http_chunk_size, external_downloader_args,
     concurrent_fragment_downloads, progress_delta.
 
@@ -620,6 +691,9 @@ class YoutubeDL:
         'creator': 'creators',
         'genre': 'genres',
     }
+    # Maximum number of formats that are tested at the same time
+    _CHECK_FORMATS_WORKERS = 4
+
     _format_selection_exts = {
         'audio': set(MEDIA_EXTENSIONS.common_audio),
         'video': {*MEDIA_EXTENSIONS.common_video, '3gp'},
@@ -635,14 +709,21 @@ def __init__(self, params=None, auto_init=True):
             params = {}
         self.params = params
         self._ies = {}
+        self._ies_index = None
+        self._format_selectors = {}
         self._ies_instances = {}
         self._pps = {k: [] for k in POSTPROCESS_WHEN}
         self._printed_messages = set()
         self._first_webpage_request = True
+        self._request_sleep_lock = threading.Lock()
+        self._circuit_breakers = circuit_breakers if self.params.get('share_circuit_breakers') else CircuitBreakers()
+        self._thread_local = threading.local()
+        self._prefetched_extractions = {}
         self._post_hooks = []
         self._close_hooks = []
         self._progress_hooks = []
         self._postprocessor_hooks = []
+        self._trace_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
         self._num_videos = 0
@@ -818,11 +899,17 @@ def check_deprecated(param, option, suggestion):
             'post_hooks': self.add_post_hook,
             'progress_hooks': self.add_progress_hook,
             'postprocessor_hooks': self.add_postprocessor_hook,
+            'trace_hooks': self.add_trace_hook,
         }
         for opt, fn in hooks.items():
             for ph in self.params.get(opt, []):
                 fn(ph)
 
+        if self.params.get('request_trace_file'):
+            exporter = ChromeTraceExporter(self.params['request_trace_file'])
+            self.add_trace_hook(exporter)
+            self.add_close_hook(exporter.write)
+
         for pp_def_raw in self.params.get('postprocessors', []):
             pp_def = dict(pp_def_raw)
             when = pp_def.pop('when', 'post_process')
@@ -832,23 +919,21 @@ def check_deprecated(param, option, suggestion):
 
         def preload_download_archive(fn):
             """Preload the archive, if any is specified"""
-            archive = set()
             if fn is None:
-                return archive
+                return set()
             elif not is_path_like(fn):
                 return fn
 
             self.write_debug(f'Loading archive file {fn!r}')
-            try:
-                with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                    for line in archive_file:
-                        archive.add(line.strip())
-            except OSError as ioe:
-                if ioe.errno != errno.ENOENT:
-                    raise
-            return archive
+            return DownloadArchive.from_filename(fn)
 
         self.archive = preload_download_archive(self.params.get('download_archive'))
+        import_fn = self.params.get('import_download_archive')
+        if import_fn is not None:
+            if not isinstance(self.archive, DownloadArchive):
+                raise ValueError('import_download_archive requires download_archive to be a file name')
+            count = self.archive.import_file(import_fn)
+            self.write_debug(f'Imported {count} new IDs from archive file {import_fn!r}')
 
     def _clean_js_runtimes(self, runtimes):
         if not (
@@ -898,11 +983,18 @@ def warn_if_short_id(self, argv):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         ie_key = ie.ie_key()
+        self._ies_index = None
         self._ies[ie_key] = ie
         if not isinstance(ie, type):
             self._ies_instances[ie_key] = ie
             ie.set_downloader(self)
 
+    def _get_candidate_ies(self, url):
+        """Returns the keys of the extractors that may be suitable for url, in order"""
+        if self._ies_index is None:
+            self._ies_index = URLDispatchIndex(self._ies)
+        return self._ies_index.candidates(url)
+
     def get_info_extractor(self, ie_key):
         """
         Get an instance of an IE with name ie_key, it will try to get one from
@@ -959,6 +1051,10 @@ def add_postprocessor_hook(self, ph):
             for pp in pps:
                 pp.add_progress_hook(ph)
 
+    def add_trace_hook(self, th):
+        """Add the HTTP request trace hook"""
+        self._trace_hooks.append(th)
+
     def _bidi_workaround(self, message):
         if not hasattr(self, '_output_channel'):
             return message
@@ -972,7 +1068,21 @@ def _bidi_workaround(self, message):
                       for _ in range(line_count))
         return res[:-len('\n')]
 
+    def _buffer_output(self, func, *args):
+        """Defer output of extractions that run in a prefetching thread until their result is used"""
+        output_buffer = getattr(self._thread_local, 'output_buffer', None)
+        if output_buffer is None:
+            return False
+        output_buffer.append((func, args))
+        return True
+
+    def _log(self, level, message):
+        if not self._buffer_output(self._log, level, message):
+            getattr(self.params['logger'], level)(message)
+
     def _write_string(self, message, out=None, only_once=False):
+        if self._buffer_output(self._write_string, message, out, only_once):
+            return
         if only_once:
             if message in self._printed_messages:
                 return
@@ -992,7 +1102,7 @@ def to_stdout(self, message, skip_eol=False, quiet=None):
     def to_screen(self, message, skip_eol=False, quiet=None, only_once=False):
         """Print message to screen if not in quiet mode"""
         if self.params.get('logger'):
-            self.params['logger'].debug(message)
+            self._log('debug', message)
             return
         if (self.params.get('quiet') if quiet is None else quiet) and not self.params.get('verbose'):
             return
@@ -1004,7 +1114,7 @@ def to_stderr(self, message, only_once=False):
         """Print message to stderr"""
         assert isinstance(message, str)
         if self.params.get('logger'):
-            self.params['logger'].error(message)
+            self._log('error', message)
         else:
             self._write_string(f'{self._bidi_workaround(message)}\n', self._out_files.error, only_once=only_once)
 
@@ -1052,6 +1162,8 @@ def __exit__(self, *args):
 
     def close(self):
         self.save_cookies()
+        if isinstance(self.archive, DownloadArchive):
+            self.archive.close()
         if '_request_director' in self.__dict__:
             self._request_director.close()
             del self._request_director
@@ -1131,7 +1243,7 @@ def report_warning(self, message, only_once=False):
         If stderr is a tty file the 'WARNING:' will be colored
         """
         if self.params.get('logger') is not None:
-            self.params['logger'].warning(message)
+            self._log('warning', message)
         else:
             if self.params.get('no_warnings'):
                 return
@@ -1143,7 +1255,7 @@ def deprecation_warning(self, message, *, stacklevel=0):
 
     def deprecated_feature(self, message):
         if self.params.get('logger') is not None:
-            self.params['logger'].warning(f'Deprecated Feature: {message}')
+            self._log('warning', f'Deprecated Feature: {message}')
         self.to_stderr(f'{self._format_err("Deprecated Feature:", self.Styles.ERROR)} {message}', True)
 
     def report_error(self, message, *args, **kwargs):
@@ -1159,7 +1271,7 @@ def write_debug(self, message, only_once=False):
             return
         message = f'[debug] {message}'
         if self.params.get('logger'):
-            self.params['logger'].debug(message)
+            self._log('debug', message)
         else:
             self.to_stderr(message, only_once)
 
@@ -1254,6 +1366,105 @@ def _copy_infodict(info_dict):
         info_dict.pop('__pending_error', None)
         return info_dict
 
+    _OUTTMPL_MATH_FUNCTIONS = {
+        '+': float.__add__,
+        '-': float.__sub__,
+        '*': float.__mul__,
+    }
+    # Field is of the form key1.key2...
+    # where keys (except first) can be string, int, slice or "{field, ...}"
+    _OUTTMPL_FIELD_INNER_RE = r'(?:\w+|%(num)s|%(num)s?(?::%(num)s?){1,2})' % {'num': r'(?:-?\d+)'}  # noqa: UP031
+    _OUTTMPL_FIELD_RE = r'\w*(?:\.(?:%(inner)s|{%(field)s(?:,%(field)s)*}))*' % {  # noqa: UP031
+        'inner': _OUTTMPL_FIELD_INNER_RE,
+        'field': rf'\w*(?:\.{_OUTTMPL_FIELD_INNER_RE})*',
+    }
+    _OUTTMPL_MATH_FIELD_RE = rf'(?:{_OUTTMPL_FIELD_RE}|-?{NUMBER_RE})'
+    _OUTTMPL_MATH_OPERATORS_RE = r'(?:{})'.format('|'.join(map(re.escape, _OUTTMPL_MATH_FUNCTIONS.keys())))
+    _OUTTMPL_INTERNAL_FORMAT_RE = re.compile(rf'''(?xs)
+        (?P<negate>-)?
+        (?P<fields>{_OUTTMPL_FIELD_RE})
+        (?P<maths>(?:{_OUTTMPL_MATH_OPERATORS_RE}{_OUTTMPL_MATH_FIELD_RE})*)
+        (?:>(?P<strf_format>.+?))?
+        (?P<remaining>
+            (?P<alternate>(?<!\\),[^|&)]+)?
+            (?:&(?P<replacement>.*?))?
+            (?:\|(?P<default>.*?))?
+        )$''')
+    _OUTTMPL_EXTERNAL_FORMAT_RE = re.compile(
+        STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _split_outtmpl(outtmpl):
+        """
+        Split the output template into literal strings and the groupdicts of its fields
+
+        The parsed templates are cached, so that they are not parsed again for every video
+        """
+        parts, pos = [], 0
+        for mobj in YoutubeDL._OUTTMPL_EXTERNAL_FORMAT_RE.finditer(outtmpl):
+            parts.append(outtmpl[pos:mobj.start()])
+            parts.append(mobj.groupdict() if mobj.group('has_key') else mobj.group(0))
+            pos = mobj.end()
+        parts.append(outtmpl[pos:])
+        return tuple(filter(None, parts))
+
+    @staticmethod
+    def _parse_outtmpl_path(fields):
+        """ Convert fields of the form key1.key2... into a path for traverse_obj """
+        def _from_user_input(field):
+            if field == ':':
+                return ...
+            elif ':' in field:
+                return slice(*map(int_or_none, field.split(':')))
+            elif int_or_none(field) is not None:
+                return int(field)
+            return field
+
+        fields = [f for x in re.split(r'\.({.+?})\.?', fields)
+                  for f in ([x] if x.startswith('{') else x.split('.'))]
+        for i in (0, -1):
+            if fields and not fields[i]:
+                fields.pop(i)
+
+        for i, f in enumerate(fields):
+            if not f.startswith('{'):
+                fields[i] = _from_user_input(f)
+                continue
+            assert f.endswith('}'), f'No closing brace for {f} in {fields}'
+            fields[i] = {k: list(map(_from_user_input, k.split('.'))) for k in f[1:-1].split(',')}
+        return fields
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _parse_outtmpl_field(key):
+        """ Parse a field of the output template (the part inside "%(...)") up to its first alternate """
+        mobj = YoutubeDL._OUTTMPL_INTERNAL_FORMAT_RE.match(key)
+        if not mobj:
+            return None
+        mdict = mobj.groupdict()
+        mdict['path'] = YoutubeDL._parse_outtmpl_path(mdict['fields'])
+        if mdict['strf_format']:
+            mdict['strf_format'] = mdict['strf_format'].replace('\\,', ',')
+
+        # List of (operator, multiplier, offset, path); the offset is looked up by path if it is not a number
+        maths, offset_key, operator = [], mdict['maths'], None
+        while offset_key:
+            item = re.match(
+                YoutubeDL._OUTTMPL_MATH_FIELD_RE if operator else YoutubeDL._OUTTMPL_MATH_OPERATORS_RE,
+                offset_key).group(0)
+            offset_key = offset_key[len(item):]
+            if operator is None:
+                operator = YoutubeDL._OUTTMPL_MATH_FUNCTIONS[item]
+                continue
+            item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
+            offset = float_or_none(item)
+            path = YoutubeDL._parse_outtmpl_path(item) if offset is None else None
+            maths.append((operator, multiplier, offset, path))
+            operator = None
+        mdict['maths'] = maths
+        return mdict
+
     def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
         """ Make the outtmpl and info_dict suitable for substitution: ydl.escape_outtmpl(outtmpl) % info_dict
         @param sanitize    Whether to sanitize the output as a filename
@@ -1280,90 +1491,35 @@ def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
         }
 
         TMPL_DICT = {}
-        EXTERNAL_FORMAT_RE = re.compile(STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
-        MATH_FUNCTIONS = {
-            '+': float.__add__,
-            '-': float.__sub__,
-            '*': float.__mul__,
-        }
-        # Field is of the form key1.key2...
-        # where keys (except first) can be string, int, slice or "{field, ...}"
-        FIELD_INNER_RE = r'(?:\w+|%(num)s|%(num)s?(?::%(num)s?){1,2})' % {'num': r'(?:-?\d+)'}  # noqa: UP031
-        FIELD_RE = r'\w*(?:\.(?:%(inner)s|{%(field)s(?:,%(field)s)*}))*' % {  # noqa: UP031
-            'inner': FIELD_INNER_RE,
-            'field': rf'\w*(?:\.{FIELD_INNER_RE})*',
-        }
-        MATH_FIELD_RE = rf'(?:{FIELD_RE}|-?{NUMBER_RE})'
-        MATH_OPERATORS_RE = r'(?:{})'.format('|'.join(map(re.escape, MATH_FUNCTIONS.keys())))
-        INTERNAL_FORMAT_RE = re.compile(rf'''(?xs)
-            (?P<negate>-)?
-            (?P<fields>{FIELD_RE})
-            (?P<maths>(?:{MATH_OPERATORS_RE}{MATH_FIELD_RE})*)
-            (?:>(?P<strf_format>.+?))?
-            (?P<remaining>
-                (?P<alternate>(?<!\\),[^|&)]+)?
-                (?:&(?P<replacement>.*?))?
-                (?:\|(?P<default>.*?))?
-            )$''')
-
-        def _from_user_input(field):
-            if field == ':':
-                return ...
-            elif ':' in field:
-                return slice(*map(int_or_none, field.split(':')))
-            elif int_or_none(field) is not None:
-                return int(field)
-            return field
-
-        def _traverse_infodict(fields):
-            fields = [f for x in re.split(r'\.({.+?})\.?', fields)
-                      for f in ([x] if x.startswith('{') else x.split('.'))]
-            for i in (0, -1):
-                if fields and not fields[i]:
-                    fields.pop(i)
-
-            for i, f in enumerate(fields):
-                if not f.startswith('{'):
-                    fields[i] = _from_user_input(f)
-                    continue
-                assert f.endswith('}'), f'No closing brace for {f} in {fields}'
-                fields[i] = {k: list(map(_from_user_input, k.split('.'))) for k in f[1:-1].split(',')}
 
-            return traverse_obj(info_dict, fields, traverse_string=True)
+        def _traverse_infodict(path):
+            if len(path) == 1 and isinstance(path[0], str):
+                # Fast path for top-level fields; traverse_obj also treats {} as missing
+                value = info_dict.get(path[0])
+                return None if value in (None, {}) else value
+            return traverse_obj(info_dict, path, traverse_string=True)
 
         def get_value(mdict):
             # Object traversal
-            value = _traverse_infodict(mdict['fields'])
+            value = _traverse_infodict(mdict['path'])
             # Negative
             if mdict['negate']:
                 value = float_or_none(value)
                 if value is not None:
                     value *= -1
             # Do maths
-            offset_key = mdict['maths']
-            if offset_key:
+            if mdict['maths']:
                 value = float_or_none(value)
-                operator = None
-                while offset_key:
-                    item = re.match(
-                        MATH_FIELD_RE if operator else MATH_OPERATORS_RE,
-                        offset_key).group(0)
-                    offset_key = offset_key[len(item):]
-                    if operator is None:
-                        operator = MATH_FUNCTIONS[item]
-                        continue
-                    item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
-                    offset = float_or_none(item)
-                    if offset is None:
-                        offset = float_or_none(_traverse_infodict(item))
+                for operator, multiplier, offset, path in mdict['maths']:
+                    if path is not None:
+                        offset = float_or_none(_traverse_infodict(path))
                     try:
                         value = operator(value, multiplier * offset)
                     except (TypeError, ZeroDivisionError):
                         return None
-                    operator = None
             # Datetime formatting
             if mdict['strf_format']:
-                value = strftime_or_none(value, mdict['strf_format'].replace('\\,', ','))
+                value = strftime_or_none(value, mdict['strf_format'])
 
             # XXX: Workaround for https://github.com/yt-dlp/yt-dlp/issues/4485
             if sanitize and value == '':
@@ -1395,41 +1551,30 @@ def _dumpjson_default(obj):
                 return list(obj)
             return repr(obj)
 
-        class _ReplacementFormatter(string.Formatter):
-            def get_field(self, field_name, args, kwargs):
-                if field_name.isdigit():
-                    return args[0], -1
-                raise ValueError('Unsupported field')
-
-        replacement_formatter = _ReplacementFormatter()
-
         def create_key(outer_mobj):
-            if not outer_mobj.group('has_key'):
-                return outer_mobj.group(0)
-            key = outer_mobj.group('key')
-            mobj = re.match(INTERNAL_FORMAT_RE, key)
+            key = outer_mobj['key']
+            mobj = self._parse_outtmpl_field(key)
             value, replacement, default, last_field = None, None, na, ''
             while mobj:
-                mobj = mobj.groupdict()
                 default = mobj['default'] if mobj['default'] is not None else default
                 value = get_value(mobj)
                 last_field, replacement = mobj['fields'], mobj['replacement']
                 if value is None and mobj['alternate']:
-                    mobj = re.match(INTERNAL_FORMAT_RE, mobj['remaining'][1:])
+                    mobj = self._parse_outtmpl_field(mobj['remaining'][1:])
                 else:
                     break
 
             if None not in (value, replacement):
                 try:
-                    value = replacement_formatter.format(replacement, value)
+                    value = _REPLACEMENT_FORMATTER.format(replacement, value)
                 except ValueError:
                     value, default = None, na
 
-            fmt = outer_mobj.group('format')
+            fmt = outer_mobj['format']
             if fmt == 's' and last_field in field_size_compat_map and isinstance(value, int):
                 fmt = f'0{field_size_compat_map[last_field]:d}d'
 
-            flags = outer_mobj.group('conversion') or ''
+            flags = outer_mobj['conversion'] or ''
             str_fmt = f'{fmt[:-1]}s'
             if value is None:
                 value, fmt = default, 's'
@@ -1479,11 +1624,13 @@ def create_key(outer_mobj):
                 if fmt[-1] in 'csra':
                     value = sanitize(last_field, value)
 
-            key = '{}\0{}'.format(key.replace('%', '%\0'), outer_mobj.group('format'))
+            key = '{}\0{}'.format(key.replace('%', '%\0'), outer_mobj['format'])
             TMPL_DICT[key] = value
-            return '{prefix}%({key}){fmt}'.format(key=key, fmt=fmt, prefix=outer_mobj.group('prefix'))
+            return '{prefix}%({key}){fmt}'.format(key=key, fmt=fmt, prefix=outer_mobj['prefix'])
 
-        return EXTERNAL_FORMAT_RE.sub(create_key, outtmpl), TMPL_DICT
+        return ''.join(
+            part if isinstance(part, str) else create_key(part)
+            for part in self._split_outtmpl(outtmpl)), TMPL_DICT
 
     def evaluate_outtmpl(self, outtmpl, info_dict, *args, **kwargs):
         outtmpl, info_dict = self.prepare_outtmpl(outtmpl, info_dict, *args, **kwargs)
@@ -1665,11 +1812,12 @@ def extract_info(self, url, download=True, ie_key=None, extra_info=None,
             ie_key = 'Generic'
 
         if ie_key:
-            ies = {ie_key: self._ies[ie_key]} if ie_key in self._ies else {}
+            ie_keys = [ie_key] if ie_key in self._ies else []
         else:
-            ies = self._ies
+            ie_keys = self._get_candidate_ies(url)
 
-        for key, ie in ies.items():
+        for key in ie_keys:
+            ie = self._ies[key]
             if not ie.suitable(url):
                 continue
 
@@ -1830,7 +1978,7 @@ def __extract_info(self, url, ie, download, extra_info, process):
         self._apply_header_cookies(url)
 
         try:
-            ie_result = ie.extract(url)
+            ie_result = self._extract_prefetched(ie, url)
         except UserNotLive as e:
             if process:
                 if self.params.get('wait_for_video'):
@@ -2102,44 +2250,48 @@ def __process_playlist(self, ie_result, download):
 
         failures = 0
         max_failures = self.params.get('skip_playlist_after_errors') or float('inf')
-        for i, (playlist_index, entry) in enumerate(entries):
-            if lazy:
-                resolved_entries.append((playlist_index, entry))
-            if not entry:
-                continue
+        with self._prefetch_playlist_entries(entries, extra) as entries:
+            for i, (playlist_index, entry) in enumerate(entries):
+                if lazy:
+                    resolved_entries.append((playlist_index, entry))
+                if not entry:
+                    continue
 
-            entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
-            if not lazy and 'playlist-index' in self.params['compat_opts']:
-                playlist_index = ie_result['requested_entries'][i]
+                entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
+                if not lazy and 'playlist-index' in self.params['compat_opts']:
+                    playlist_index = ie_result['requested_entries'][i]
 
-            entry_copy = collections.ChainMap(entry, {
-                **common_info,
-                'n_entries': int_or_none(n_entries),
-                'playlist_index': playlist_index,
-                'playlist_autonumber': i + 1,
-            })
+                entry_copy = collections.ChainMap(entry, {
+                    **common_info,
+                    'n_entries': int_or_none(n_entries),
+                    'playlist_index': playlist_index,
+                    'playlist_autonumber': i + 1,
+                })
 
-            if self._match_entry(entry_copy, incomplete=True) is not None:
-                # For compatabilty with youtube-dl. See https://github.com/yt-dlp/yt-dlp/issues/4369
-                resolved_entries[i] = (playlist_index, NO_DEFAULT)
-                continue
+                if self._match_entry(entry_copy, incomplete=True) is not None:
+                    # For compatabilty with youtube-dl. See https://github.com/yt-dlp/yt-dlp/issues/4369
+                    resolved_entries[i] = (playlist_index, NO_DEFAULT)
+                    continue
 
-            self.to_screen(
-                f'[download] Downloading item {self._format_screen(i + 1, self.Styles.ID)} '
-                f'of {self._format_screen(n_entries, self.Styles.EMPHASIS)}')
-
-            entry_result = self.__process_iterable_entry(entry, download, collections.ChainMap({
-                'playlist_index': playlist_index,
-                'playlist_autonumber': i + 1,
-            }, extra))
-            if not entry_result:
-                failures += 1
-            if failures >= max_failures:
-                self.report_error(
-                    f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
-                break
-            if keep_resolved_entries:
-                resolved_entries[i] = (playlist_index, entry_result)
+                self.to_screen(
+                    f'[download] Downloading item {self._format_screen(i + 1, self.Styles.ID)} '
+                    f'of {self._format_screen(n_entries, self.Styles.EMPHASIS)}')
+
+                # When the results are discarded, process a copy so that the data added by
+                # processing (selected formats, downloads etc) is not kept alive by the playlist
+                entry_result = self.__process_iterable_entry(
+                    entry if keep_resolved_entries else dict(entry), download, collections.ChainMap({
+                        'playlist_index': playlist_index,
+                        'playlist_autonumber': i + 1,
+                    }, extra))
+                if not entry_result:
+                    failures += 1
+                if failures >= max_failures:
+                    self.report_error(
+                        f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
+                    break
+                if keep_resolved_entries:
+                    resolved_entries[i] = (playlist_index, entry_result)
 
         # Update with processed data
         ie_result['entries'] = [e for _, e in resolved_entries if e is not NO_DEFAULT]
@@ -2163,6 +2315,126 @@ def __process_iterable_entry(self, entry, download, extra_info):
         return self.process_ie_result(
             entry, download=download, extra_info=extra_info)
 
+    @contextlib.contextmanager
+    def _prefetch_playlist_entries(self, entries, extra_info):
+        """
+        Extract upcoming playlist entries in a thread pool while the current one is processed
+
+        Yields an iterator over the entries in order. Only the extraction itself
+        is done concurrently; extract_info picks up the prefetched result, so the
+        entries are still processed (filtered, recorded in the archive, downloaded)
+        one at a time. Output of the extraction is replayed when the result is used
+        """
+        workers = self.params.get('playlist_workers') or 1
+        extract_flat = self.params.get('extract_flat', False)
+        if workers <= 1 or extract_flat is True or (extract_flat == 'in_playlist' and 'playlist' in extra_info):
+            yield iter(entries)
+            return
+
+        def get_url(item):
+            entry = item[1]
+            if not isinstance(entry, dict) or entry.get('_type') not in ('url', 'url_transparent'):
+                return None, None
+            url = sanitize_url(entry['url'], scheme='http' if self.params.get('prefer_insecure') else 'https')
+            return url, entry.get('ie_key')
+
+        with self._prefetch_extractions(entries, get_url, workers, thread_name_prefix='playlist-worker') as entries:
+            yield entries
+
+    @contextlib.contextmanager
+    def _prefetch_extractions(self, items, get_url, workers, ordered=True, thread_name_prefix=''):
+        """
+        Extract the URLs of upcoming items in a thread pool; see _prefetch_playlist_entries
+
+        @param get_url      Function that returns the (url, ie_key) that extract_info will
+                            be called with for an item, or (None, None) if it has no URL
+        @param ordered      Whether to yield the items in order, instead of as their extraction completes
+
+        At most workers + 1 items are read ahead, so that items can be read from a stream
+        """
+        def extract(ie, url):
+            self._thread_local.output_buffer = output = []
+            try:
+                self._apply_header_cookies(url)
+                return output, ie.extract(url), None
+            except BaseException as e:
+                return output, None, e
+            finally:
+                self._thread_local.output_buffer = None
+
+        # Slots of the window are [item, key, future, retry]
+        window = []
+
+        def submit(slot):
+            slot[3] = False
+            url, ie_key = get_url(slot[0])
+            if not url:
+                return
+            ie_keys = [ie_key] if ie_key else self._get_candidate_ies(url)
+            ie_key = next((key for key in ie_keys if key in self._ies and self._ies[key].suitable(url)), None)
+            if not ie_key or (ie_key, url) in self._prefetched_extractions:
+                return
+            ie = self.get_info_extractor(ie_key)
+            # Extractors that are not initialized yet (may need to log in) are left to the main thread,
+            # and the item is submitted if the extractor is ready by the time an earlier item is processed
+            if not ie._ready:
+                slot[3] = True
+                return
+            temp_id = ie.get_temp_id(url)
+            if temp_id is not None and self.in_download_archive({'id': temp_id, 'ie_key': ie_key}):
+                return
+            # A copy, since extraction stores per-video state in the extractor
+            slot[1] = (ie_key, url)
+            slot[2] = self._prefetched_extractions[slot[1]] = pool.submit(extract, copy.copy(ie), url)
+
+        def prefetching_iterator():
+            items_iter = iter(items)
+            while True:
+                for slot in window:
+                    if slot[3]:
+                        submit(slot)
+                while len(window) <= workers:
+                    item = next(items_iter, NO_DEFAULT)
+                    if item is NO_DEFAULT:
+                        break
+                    window.append([item, None, None, False])
+                    submit(window[-1])
+                if not window:
+                    return
+                index = 0
+                if not ordered:
+                    pending = [future for _, _, future, _ in window if future and not future.done()]
+                    if len(pending) == len(window):
+                        concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    index = next(i for i, (_, _, future, _) in enumerate(window) if not future or future.done())
+                item, key, _, _ = window.pop(index)
+                yield item
+                # Discard the result if extract_info did not use it, e.g. if the item was skipped
+                if key:
+                    self._prefetched_extractions.pop(key, None)
+
+        pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix=thread_name_prefix)
+        try:
+            yield prefetching_iterator()
+        finally:
+            # Wait for the extractions that are already running, so that they do not
+            # use the network (or recreate the request director) after the YoutubeDL is closed
+            pool.shutdown(wait=True, cancel_futures=True)
+            for _, key, _, _ in window:
+                if key:
+                    self._prefetched_extractions.pop(key, None)
+
+    def _extract_prefetched(self, ie, url):
+        future = self._prefetched_extractions.pop((ie.ie_key(), url), None)
+        if future is None:
+            return ie.extract(url)
+        output, ie_result, error = future.result()
+        for func, args in output:
+            func(*args)
+        if error is not None:
+            raise error
+        return ie_result
+
     def _build_format_filter(self, filter_spec):
         " Returns a function to filter the formats according to the filter_spec "
 
@@ -2223,55 +2495,130 @@ def _build_format_filter(self, filter_spec):
         if not m:
             raise SyntaxError(f'Invalid filter specification {filter_spec!r}')
 
+        key, none_inclusive = m.group('key'), m.group('none_inclusive')
+
         def _filter(f):
-            actual_value = f.get(m.group('key'))
+            actual_value = f.get(key)
             if actual_value is None:
-                return m.group('none_inclusive')
+                return none_inclusive
             return op(actual_value, comparison_value)
+
+        if op is operator.eq:
+            # Allows the format selector to look the matching formats up in an index
+            _filter.equality = (key, comparison_value, bool(none_inclusive))
         return _filter
 
-    def _check_formats(self, formats, warning=True):
-        for f in formats:
-            working = f.get('__working')
-            if working is not None:
+    def _probe_format(self, f):
+        """
+        Check whether a format is available with a single byte request
+        Returns None if the format cannot be checked this way
+        """
+        if (f.get('impersonate') or f.get('request_data')
+                or get_suitable_downloader(f, {**self.params, 'test': True}) is not HttpFD
+                or f['protocol'] not in ('http', 'https')):
+            return None
+        request = Request(f['url'], headers={
+            **(f.get('http_headers') or {}),
+            'Accept-Encoding': 'identity',
+            'Range': 'bytes=0-0',
+        })
+        try:
+            with self.urlopen(request) as response:
+                response.read(1)
+        except HTTPError as err:
+            # The server understood the range request; the file is just empty
+            return err.status == 416
+        except network_exceptions:
+            return False
+        return True
+
+    def _test_format(self, f):
+        """Returns whether the format can be downloaded"""
+        self.to_screen('[info] Testing format {}'.format(f['format_id']))
+        success = self._probe_format(f)
+        if success is not None:
+            return success
+        path = self.get_output_path('temp')
+        if not self._ensure_dir_exists(f'{path}/'):
+            return None
+        temp_file = tempfile.NamedTemporaryFile(suffix='.tmp', delete=False, dir=path or None)
+        temp_file.close()
+        try:
+            success, _ = self.dl(temp_file.name, f, test=True)
+        except (DownloadError, OSError, ValueError, *network_exceptions):
+            success = False
+        finally:
+            if os.path.exists(temp_file.name):
+                try:
+                    os.remove(temp_file.name)
+                except OSError:
+                    self.report_warning(f'Unable to delete temporary file "{temp_file.name}"')
+        return success
+
+    def _check_formats(self, formats, warning=True, needs_testing=None):
+        """
+        Yield the formats that are downloadable, in order
+
+        Upcoming formats are tested concurrently, at most _CHECK_FORMATS_WORKERS at a time,
+        so that the consumer can stop early without all the formats having been tested.
+        Formats for which needs_testing returns False are yielded without testing
+        """
+        # If FragmentFD fails when testing a fragment, it will wrongly set a non-zero return code.
+        # Save the actual return code for later. See https://github.com/yt-dlp/yt-dlp/issues/13750
+        original_retcode = self._download_retcode
+        pool, window, formats = None, collections.deque(), iter(formats)
+
+        def next_format():
+            nonlocal pool
+            f = next(formats, None)
+            if f is None:
+                return False
+            if needs_testing is not None and not needs_testing(f):
+                window.append((f, True))
+            elif f.get('__working') is not None:
+                window.append((f, f['__working']))
+            else:
+                pool = pool or concurrent.futures.ThreadPoolExecutor(
+                    self._CHECK_FORMATS_WORKERS, thread_name_prefix='check-formats')
+                window.append((f, pool.submit(self._test_format, f)))
+            return True
+
+        try:
+            while window or next_format():
+                if isinstance(window[0][1], concurrent.futures.Future):
+                    # Test the upcoming formats while waiting for this one
+                    while len(window) < self._CHECK_FORMATS_WORKERS and next_format():
+                        pass
+                f, working = window.popleft()
+                if isinstance(working, concurrent.futures.Future):
+                    working = working.result()
+                    # Restore the actual return code
+                    self._download_retcode = original_retcode
+                    if working is None:  # The temporary file could not be created
+                        continue
+                    f['__working'] = working
+                    if working:
+                        f.pop('__needs_testing', None)
+                    else:
+                        msg = f'Unable to download format {f["format_id"]}. Skipping...'
+                        if warning:
+                            self.report_warning(msg)
+                        else:
+                            self.to_screen(f'[info] {msg}')
                 if working:
                     yield f
-                continue
-            self.to_screen('[info] Testing format {}'.format(f['format_id']))
-            path = self.get_output_path('temp')
-            if not self._ensure_dir_exists(f'{path}/'):
-                continue
-            temp_file = tempfile.NamedTemporaryFile(suffix='.tmp', delete=False, dir=path or None)
-            temp_file.close()
-            # If FragmentFD fails when testing a fragment, it will wrongly set a non-zero return code.
-            # Save the actual return code for later. See https://github.com/yt-dlp/yt-dlp/issues/13750
-            original_retcode = self._download_retcode
-            try:
-                success, _ = self.dl(temp_file.name, f, test=True)
-            except (DownloadError, OSError, ValueError, *network_exceptions):
-                success = False
-            finally:
-                if os.path.exists(temp_file.name):
-                    try:
-                        os.remove(temp_file.name)
-                    except OSError:
-                        self.report_warning(f'Unable to delete temporary file "{temp_file.name}"')
-            # Restore the actual return code
-            self._download_retcode = original_retcode
-            f['__working'] = success
-            if success:
-                f.pop('__needs_testing', None)
-                yield f
-            else:
-                msg = f'Unable to download format {f["format_id"]}. Skipping...'
-                if warning:
-                    self.report_warning(msg)
-                else:
-                    self.to_screen(f'[info] {msg}')
+        finally:
+            if pool:
+                # Wait for the tests that are already running, so that they do not
+                # set the return code or use the network during the actual download
+                pool.shutdown(wait=True, cancel_futures=True)
+                self._download_retcode = original_retcode
 
     def _select_formats(self, formats, selector):
         return list(selector({
             'formats': formats,
+            # Index of the formats by field value, filled lazily by build_format_selector
+            '_format_index': {},
             'has_merged_format': any('none' not in (f.get('acodec'), f.get('vcodec')) for f in formats),
             'incomplete_formats': (all(f.get('vcodec') == 'none' for f in formats)  # No formats with video
                                    or all(f.get('acodec') == 'none' for f in formats)),  # OR, No formats with audio
@@ -2302,6 +2649,14 @@ def can_merge():
                 else 'bestvideo*+bestaudio/best')
 
     def build_format_selector(self, format_spec):
+        key = (format_spec, self.params.get('allow_multiple_audio_streams', False),
+               self.params.get('allow_multiple_video_streams', False))
+        selector = self._format_selectors.get(key)
+        if selector is None:
+            selector = self._format_selectors[key] = self._build_format_selector(format_spec)
+        return selector
+
+    def _build_format_selector(self, format_spec):
         def syntax_error(note, start):
             message = (
                 'Invalid format specification: '
@@ -2497,11 +2852,8 @@ def _check_formats(formats):
                 yield from formats
                 return
 
-            for f in formats:
-                if f.get('has_drm') or f.get('__needs_testing'):
-                    yield from self._check_formats([f])
-                else:
-                    yield f
+            yield from self._check_formats(
+                formats, needs_testing=lambda f: f.get('has_drm') or f.get('__needs_testing'))
 
         def _build_selector_function(selector):
             if isinstance(selector, list):  # ,
@@ -2552,6 +2904,7 @@ def selector_function(ctx):
 
                 else:
                     format_fallback, seperate_fallback, format_reverse, format_idx = False, None, True, 1
+                    index_key = None
                     mobj = re.match(
                         r'(?P<bw>best|worst|b|w)(?P<type>video|audio|v|a)?(?P<mod>\*)?(?:\.(?P<n>[1-9]\d*))?$',
                         format_spec)
@@ -2574,6 +2927,7 @@ def selector_function(ctx):
                         filter_f = lambda f: _filter_f(f) and (
                             f.get('vcodec') != 'none' or f.get('acodec') != 'none')
                     else:
+                        index_key = 'ext'
                         if format_spec in self._format_selection_exts['audio']:
                             filter_f = lambda f: f.get('ext') == format_spec and f.get('acodec') != 'none'
                         elif format_spec in self._format_selection_exts['video']:
@@ -2582,11 +2936,13 @@ def selector_function(ctx):
                         elif format_spec in self._format_selection_exts['storyboards']:
                             filter_f = lambda f: f.get('ext') == format_spec and f.get('acodec') == 'none' and f.get('vcodec') == 'none'
                         else:
+                            index_key = 'format_id'
                             filter_f = lambda f: f.get('format_id') == format_spec  # id
 
                     def selector_function(ctx):
                         formats = list(ctx['formats'])
-                        matches = list(filter(filter_f, formats)) if filter_f is not None else formats
+                        candidates = index_key and _lookup_formats(ctx, index_key, format_spec, False)
+                        matches = list(filter(filter_f, formats if candidates is None else candidates))
                         if not matches:
                             if format_fallback and ctx['incomplete_formats']:
                                 # for extractors with incomplete formats (audio only (soundcloud)
@@ -2607,10 +2963,35 @@ def selector_function(ctx):
             def final_selector(ctx):
                 ctx_copy = dict(ctx)
                 for _filter in filters:
-                    ctx_copy['formats'] = list(filter(_filter, ctx_copy['formats']))
+                    formats = None
+                    if hasattr(_filter, 'equality'):
+                        formats = _lookup_formats(ctx_copy, *_filter.equality)
+                    if formats is None:
+                        formats = list(filter(_filter, ctx_copy['formats']))
+                    ctx_copy['formats'], ctx_copy['_format_index'] = formats, {}
                 return selector_function(ctx_copy)
             return final_selector
 
+        def _lookup_formats(ctx, key, value, none_inclusive):
+            """Returns the formats in ctx whose key equals value using the index, or None if it cannot be used"""
+            index = ctx.get('_format_index')
+            if index is None:
+                return None
+            if key not in index:
+                index[key] = collections.defaultdict(list)
+                try:
+                    for i, f in enumerate(ctx['formats']):
+                        index[key][f.get(key)].append(i)
+                except TypeError:  # Unhashable values
+                    index[key] = None
+            positions = index[key]
+            if positions is None:
+                return None
+            matches = positions.get(value, [])
+            if none_inclusive:
+                matches = sorted(matches + positions.get(None, []))
+            return [ctx['formats'][i] for i in matches]
+
         # HACK: Python 3.12 changed the underlying parser, rendering '7_a' invalid
         #       Prefix numbers with random letters to avoid it being classified as a number
         #       See: https://github.com/yt-dlp/yt-dlp/pulls/8797
@@ -2925,6 +3306,9 @@ def is_wellformed(f):
         if not formats:
             self.raise_no_formats(info_dict)
 
+        # Most formats of a video have the same headers. Share a single dict between them
+        # instead of keeping a copy for every format
+        unique_headers = {}
         for fmt in formats:
             sanitize_string_field(fmt, 'format_id')
             sanitize_numeric_fields(fmt)
@@ -2943,7 +3327,8 @@ def is_wellformed(f):
             if (('manifest-filesize-approx' in self.params['compat_opts'] or not fmt.get('manifest_url'))
                     and not fmt.get('filesize') and not fmt.get('filesize_approx')):
                 fmt['filesize_approx'] = filesize_from_tbr(fmt.get('tbr'), info_dict.get('duration'))
-            fmt['http_headers'] = self._calc_headers(collections.ChainMap(fmt, info_dict), load_cookies=True)
+            headers = self._calc_headers(collections.ChainMap(fmt, info_dict), load_cookies=True)
+            fmt['http_headers'] = unique_headers.setdefault(tuple(headers.items()), headers)
 
         # Safeguard against old/insecure infojson when using --load-info-json
         if info_dict.get('http_headers'):
@@ -3188,6 +3573,9 @@ def _forceprint(self, key, info_dict):
             info_copy['urls'] = '\n'.join(f['url'] + f.get('play_path', '') for f in info_dict['requested_formats'])
         elif info_dict.get('url'):
             info_copy['urls'] = info_dict['url'] + info_dict.get('play_path', '')
+        if not self.params['forceprint'].get(key) and not self.params['print_to_file'].get(key):
+            # The tables are only needed by the templates, and can be large for videos with many formats
+            return info_copy
         info_copy['formats_table'] = self.render_formats_table(info_dict)
         info_copy['thumbnails_table'] = self.render_thumbnails_table(info_dict)
         info_copy['subtitles_table'] = self.render_subtitles_table(info_dict.get('id'), info_dict.get('subtitles'))
@@ -3245,7 +3633,7 @@ def print_field(field, actual_field=None, optional=False):
         print_field('format')
 
         if self.params.get('forcejson'):
-            self.to_stdout(json.dumps(self.sanitize_info(info_dict)))
+            self.to_stdout(self.dumps_info(info_dict))
 
     def dl(self, name, info, subtitle=False, test=False):
         if not info.get('url'):
@@ -3268,7 +3656,7 @@ def dl(self, name, info, subtitle=False, test=False):
         else:
             params = self.params
 
-        fd = get_suitable_downloader(info, params, to_stdout=(name == '-'))(self, params)
+        fd = get_suitable_downloader(info, params, to_stdout=(name == '-' or hasattr(name, 'write')))(self, params)
         if not test:
             for ph in self._progress_hooks:
                 fd.add_progress_hook(ph)
@@ -3284,6 +3672,27 @@ def dl(self, name, info, subtitle=False, test=False):
             new_info['http_headers'] = self._calc_headers(new_info)
         return fd.download(name, new_info, subtitle)
 
+    def stream(self, info_dict, writer):
+        """
+        Download a resolved info_dict into the writable binary stream `writer`
+        without writing anything to disk. Writes to `writer` may block, which throttles the download.
+
+        Only formats handled by the native downloaders can be streamed;
+        formats that need to be merged or handed to an external program are rejected.
+        Returns True on success and False otherwise
+        """
+        if len(info_dict.get('requested_formats') or []) > 1:
+            self.report_error('Formats that need to be merged cannot be streamed')
+            return False
+        if not info_dict.get('url'):
+            self.raise_no_formats(info_dict, True)
+        fd = get_suitable_downloader(info_dict, self.params, to_stdout=True)
+        if fd is None or issubclass(fd, ExternalFD):
+            self.report_error(f'Format {info_dict.get("format_id")} cannot be streamed by the native downloaders')
+            return False
+        success, _ = self.dl(writer, info_dict)
+        return success
+
     def existing_file(self, filepaths, *, default_overwrite=True):
         existing_files = list(filter(os.path.exists, orderedSet(filepaths)))
         if existing_files and not self.params.get('overwrites', default_overwrite):
@@ -3653,25 +4062,48 @@ def wrapper(*args, **kwargs):
             else:
                 if self.params.get('dump_single_json', False):
                     self.post_extract(res)
-                    self.to_stdout(json.dumps(self.sanitize_info(res)))
+                    self.to_stdout(self.dumps_info(res))
         return wrapper
 
     def download(self, url_list):
-        """Download a given list of URLs."""
+        """Download a given list (or iterable) of URLs."""
         url_list = variadic(url_list)  # Passing a single URL is a common mistake
+        if not isinstance(url_list, collections.abc.Sized):
+            url_iter = iter(url_list)
+            first_urls = list(itertools.islice(url_iter, 2))
+            url_list, url_count = itertools.chain(first_urls, url_iter), len(first_urls)
+        else:
+            url_count = len(url_list)
         outtmpl = self.params['outtmpl']['default']
-        if (len(url_list) > 1
+        if (url_count > 1
                 and outtmpl != '-'
                 and '%' not in outtmpl
                 and self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
-            self.__download_wrapper(self.extract_info)(
-                url, force_generic_extractor=self.params.get('force_generic_extractor', False))
+        force_generic_extractor = self.params.get('force_generic_extractor', False)
+        with self._prefetch_batch_urls(url_list, force_generic_extractor) as url_list:
+            for url in url_list:
+                self.__download_wrapper(self.extract_info)(url, force_generic_extractor=force_generic_extractor)
 
         return self._download_retcode
 
+    @contextlib.contextmanager
+    def _prefetch_batch_urls(self, url_list, force_generic_extractor):
+        """ Extract the upcoming input URLs in a thread pool; see _prefetch_playlist_entries """
+        workers = self.params.get('batch_workers') or 1
+        if workers <= 1:
+            yield iter(url_list)
+            return
+
+        def get_url(url):
+            return url, 'Generic' if force_generic_extractor else None
+
+        with self._prefetch_extractions(
+                url_list, get_url, workers, ordered=not self.params.get('batch_unordered'),
+                thread_name_prefix='batch-worker') as url_list:
+            yield url_list
+
     def download_with_info_file(self, info_filename):
         with contextlib.closing(fileinput.FileInput(
                 [info_filename], mode='r',
@@ -3694,11 +4126,15 @@ def download_with_info_file(self, info_filename):
                 self.report_error(e)
         return self._download_retcode
 
+    _PRIVATE_INFO_KEYS = frozenset((
+        'requested_downloads', 'requested_formats', 'requested_subtitles', 'requested_entries',
+        'entries', 'filepath', '_filename', 'filename', 'infojson_filename', 'original_url',
+        'playlist_autonumber',
+    ))
+    _JSON_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
     @staticmethod
-    def sanitize_info(info_dict, remove_private_keys=False):
-        """ Sanitize the infodict for converting to json """
-        if info_dict is None:
-            return info_dict
+    def _add_info_json_defaults(info_dict):
         info_dict.setdefault('epoch', int(time.time()))
         info_dict.setdefault('_type', 'video')
         info_dict.setdefault('_version', {
@@ -3708,20 +4144,26 @@ def sanitize_info(info_dict, remove_private_keys=False):
             'repository': ORIGIN,
         })
 
+    @staticmethod
+    def sanitize_info(info_dict, remove_private_keys=False):
+        """ Sanitize the infodict for converting to json """
+        if info_dict is None:
+            return info_dict
+        YoutubeDL._add_info_json_defaults(info_dict)
+
         if remove_private_keys:
-            reject = lambda k, v: v is None or k.startswith('__') or k in {
-                'requested_downloads', 'requested_formats', 'requested_subtitles', 'requested_entries',
-                'entries', 'filepath', '_filename', 'filename', 'infojson_filename', 'original_url',
-                'playlist_autonumber',
-            }
+            private_keys = YoutubeDL._PRIVATE_INFO_KEYS
+            reject = lambda k, v: v is None or k.startswith('__') or k in private_keys
         else:
             reject = lambda k, v: False
+        scalar_types = YoutubeDL._JSON_SCALAR_TYPES
 
         def filter_fn(obj):
             if isinstance(obj, dict):
-                return {k: filter_fn(v) for k, v in obj.items() if not reject(k, v)}
+                return {k: v if type(v) in scalar_types else filter_fn(v)
+                        for k, v in obj.items() if not reject(k, v)}
             elif isinstance(obj, (list, tuple, set, LazyList)):
-                return list(map(filter_fn, obj))
+                return [v if type(v) in scalar_types else filter_fn(v) for v in obj]
             elif isinstance(obj, ImpersonateTarget):
                 return str(obj)
             elif obj is None or isinstance(obj, (str, int, float, bool)):
@@ -3731,6 +4173,53 @@ def filter_fn(obj):
 
         return filter_fn(info_dict)
 
+    @staticmethod
+    def _json_default(obj):
+        """ Encodes the values that sanitize_info converts, as the default of a JSON encoder """
+        if isinstance(obj, (set, LazyList)):
+            return list(obj)
+        elif isinstance(obj, ImpersonateTarget):
+            return str(obj)
+        return repr(obj)
+
+    @staticmethod
+    def _remove_private_keys(obj):
+        """ Copy the dicts in obj without the private keys and None values; other values are left to the encoder """
+        private_keys, scalar_types = YoutubeDL._PRIVATE_INFO_KEYS, YoutubeDL._JSON_SCALAR_TYPES
+        container_types = (dict, list, tuple, set, LazyList)
+
+        def filter_fn(obj):
+            if isinstance(obj, dict):
+                return {
+                    k: v if type(v) in scalar_types else filter_fn(v) if isinstance(v, container_types) else v
+                    for k, v in obj.items()
+                    if v is not None and k not in private_keys and not k.startswith('__')}
+            return [v if type(v) in scalar_types else filter_fn(v) if isinstance(v, container_types) else v
+                    for v in obj]
+
+        return filter_fn(obj)
+
+    @staticmethod
+    def dumps_info(info_dict, remove_private_keys=False, *, ensure_ascii=True):
+        """
+        Encode the infodict as JSON; equivalent to json.dumps(sanitize_info(...))
+
+        Values are converted by the JSON encoder as it encounters them, instead of
+        copying the whole infodict first. orjson is used when it is available and
+        non-ASCII characters need not be escaped (orjson does not support it)
+        """
+        if info_dict is not None:
+            YoutubeDL._add_info_json_defaults(info_dict)
+            if remove_private_keys:
+                info_dict = YoutubeDL._remove_private_keys(info_dict)
+        if orjson and not ensure_ascii:
+            # Integers larger than 64 bits etc are not supported by orjson
+            with contextlib.suppress(TypeError):
+                return orjson.dumps(info_dict, default=YoutubeDL._json_default, option=(
+                    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+                    | orjson.OPT_PASSTHROUGH_DATETIME)).decode()
+        return json.dumps(info_dict, ensure_ascii=ensure_ascii, default=YoutubeDL._json_default)
+
     @staticmethod
     def filter_requested_info(info_dict, actually_filter=True):
         """ Alias of sanitize_info for backward compatibility """
@@ -3822,8 +4311,8 @@ def _make_archive_id(self, info_dict):
             if not url:
                 return
             # Try to find matching extractor for the URL and take its ie_key
-            for ie_key, ie in self._ies.items():
-                if ie.suitable(url):
+            for ie_key in self._get_candidate_ies(url):
+                if self._ies[ie_key].suitable(url):
                     extractor = ie_key
                     break
             else:
@@ -3846,9 +4335,6 @@ def record_download_archive(self, info_dict):
         assert vid_id
 
         self.write_debug(f'Adding to archive: {vid_id}')
-        if is_path_like(fn):
-            with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-                archive_file.write(vid_id + '\n')
         self.archive.add(vid_id)
 
     @staticmethod
@@ -4270,10 +4756,11 @@ def urlopen(self, req):
                 if (
                     'unsupported proxy type: "https"' in ue.msg.lower()
                     and 'requests' not in self._request_director.handlers
+                    and 'httpx' not in self._request_director.handlers
                     and 'curl_cffi' not in self._request_director.handlers
                 ):
                     raise RequestError(
-                        'To use an HTTPS proxy for this request, one of the following dependencies needs to be installed: requests, curl_cffi')
+                        'To use an HTTPS proxy for this request, one of the following dependencies needs to be installed: requests, httpx, curl_cffi')
 
                 elif (
                     re.match(r'unsupported url scheme: "wss?"', ue.msg.lower())
@@ -4300,6 +4787,32 @@ def urlopen(self, req):
                     'Try using --legacy-server-connect', cause=e) from e
             raise
 
+    def warm_up_connections(self, hosts, max_workers=8):
+        """
+        Open connections to the given hosts ahead of the first requests to them
+
+        This resolves the hosts, establishes TLS sessions that later connections resume,
+        and fills the connection pools of the request handlers that keep them.
+        Errors are ignored, since the hosts are only contacted to speed up later requests.
+
+        @param hosts: Hostnames, optionally with a port, or URLs whose origins to connect to.
+        @param max_workers: Maximum number of hosts to connect to concurrently.
+        """
+        urls = orderedSet(host if '://' in host else f'https://{host}/' for host in variadic(hosts))
+
+        def warm_up(url):
+            try:
+                self.urlopen(HEADRequest(url)).close()
+            except RequestError as e:
+                if isinstance(e, HTTPError):
+                    e.close()
+                self.write_debug(f'Unable to warm up connection to {url}: {e}')
+
+        if not urls:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            list(executor.map(warm_up, urls))
+
     def build_request_director(self, handlers, preferences=None):
         logger = _YDLLogger(self)
         headers = self.params['http_headers'].copy()
@@ -4307,7 +4820,25 @@ def build_request_director(self, handlers, preferences=None):
         clean_headers(headers)
         clean_proxies(proxies, headers)
 
-        director = RequestDirector(logger=logger, verbose=self.params.get('debug_printtraffic'))
+        cache = None
+        if self.params.get('http_cache'):
+            cache = ResponseCache(
+                cookiejar=self.cookiejar, proxies=proxies, impersonate=self.params.get('impersonate'),
+                logger=logger, verbose=self.params.get('debug_printtraffic'),
+                cache_authenticated=self.params.get('http_cache_authenticated'),
+                cache_dir=(os.path.join(self.cache._get_root_dir(), 'http')
+                           if self.params['http_cache'] == 'disk' and self.cache.enabled else None))
+        retry_policy = RetryPolicy(
+            retries=self.params.get('request_retries') or 0,
+            breaker_threshold=self.params.get('circuit_breaker_threshold', 5),
+            breakers=self._circuit_breakers, proxies=proxies, logger=logger)
+        limiter = None
+        if self.params.get('max_requests_per_host'):
+            limiter = get_shared_host_limiter(
+                self.params['max_requests_per_host'], self.params.get('request_queue_order') or 'priority')
+        director = RequestDirector(
+            logger=logger, verbose=self.params.get('debug_printtraffic'), cache=cache,
+            tracer=RequestTracer(self._trace_hooks), retry_policy=retry_policy, limiter=limiter)
         for handler in handlers:
             director.add_handler(handler(
                 logger=logger,
@@ -4319,6 +4850,7 @@ def build_request_director(self, handlers, preferences=None):
                 **traverse_obj(self.params, {
                     'verbose': 'debug_printtraffic',
                     'source_address': 'source_address',
+                    'resolve': 'resolve',
                     'timeout': 'socket_timeout',
                     'legacy_ssl_support': 'legacyserverconnect',
                     'enable_file_urls': 'enable_file_urls',
@@ -4333,6 +4865,9 @@ def build_request_director(self, handlers, preferences=None):
         director.preferences.update(preferences or [])
         if 'prefer-legacy-http-handler' in self.params['compat_opts']:
             director.preferences.add(lambda rh, _: 500 if rh.RH_KEY == 'Urllib' else 0)
+        elif self.params.get('prefer_http2'):
+            director.preferences.add(
+                lambda rh, request: 300 if rh.RH_KEY == 'HTTPX' and request.url.lower().startswith('https:') else 0)
         return director
 
     @functools.cached_property
@@ -4372,7 +4907,8 @@ def _write_info_json(self, label, ie_result, infofn, overwrite=None):
 
         self.to_screen(f'[info] Writing {label} metadata as JSON to: {infofn}')
         try:
-            write_json_file(self.sanitize_info(ie_result, self.params.get('clean_infojson', True)), infofn)
+            write_json_file(ie_result, infofn, encode=functools.partial(
+                self.dumps_info, remove_private_keys=self.params.get('clean_infojson', True), ensure_ascii=False))
             return True
         except OSError:
             self.report_error(f'Cannot write {label} metadata to JSON file {infofn}')
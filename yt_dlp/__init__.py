@@ -79,24 +79,30 @@ def _exit(status=0, *args):
     raise SystemExit(status)
 
 
-def get_urls(urls, batchfile, verbose):
+def get_urls(urls, batchfile, verbose, lazy=False):
     """
     @param verbose      -1: quiet, 0: normal, 1: verbose
+    @param lazy         Return an iterator that reads the batch file as the URLs are used
     """
     batch_urls = []
     if batchfile is not None:
         try:
             batch_urls = read_batch_urls(
                 read_stdin(None if verbose == -1 else 'URLs') if batchfile == '-'
-                else open(expand_path(batchfile), encoding='utf-8', errors='ignore'))
-            if verbose == 1:
+                else open(expand_path(batchfile), encoding='utf-8', errors='ignore'), lazy=lazy)
+            if verbose == 1 and not lazy:
                 write_string('[debug] Batch file urls: ' + repr(batch_urls) + '\n')
         except OSError:
             _exit(f'ERROR: batch file {batchfile} could not be read')
     _enc = preferredencoding()
-    return [
+    urls = (
         url.strip().decode(_enc, 'ignore') if isinstance(url, bytes) else url.strip()
-        for url in batch_urls + urls]
+        for url in itertools.chain(batch_urls, urls))
+    if not lazy:
+        return list(urls)
+    # Read the first URL, so that an empty batch is still detected
+    first_url = next(urls, None)
+    return [] if first_url is None else itertools.chain([first_url], urls)
 
 
 def print_extractor_information(opts, urls):
@@ -213,10 +219,16 @@ def validate_minmax(min_val, max_val, min_name, max_name=None):
     validate_in('TV Provider', opts.ap_mso, MSO_INFO,
                 'Unsupported {name} "{value}", use --ap-list-mso to get a list of supported TV Providers')
 
+    # Download archive
+    validate(opts.import_download_archive is None or opts.download_archive is not None,
+             '--download-archive', msg='{name} is required for --import-download-archive')
+
     # Numbers
     validate_positive('autonumber start', opts.autonumber_start)
     validate_positive('autonumber size', opts.autonumber_size, True)
     validate_positive('concurrent fragments', opts.concurrent_fragment_downloads, True)
+    validate_positive('playlist workers', opts.playlist_workers, True)
+    validate_positive('batch workers', opts.batch_workers, True)
     validate_positive('playlist start', opts.playliststart, True)
     if opts.playlistend != -1:
         validate_minmax(opts.playliststart, opts.playlistend, 'playlist start', 'playlist end')
@@ -281,6 +293,9 @@ def parse_retries(name, value):
     opts.fragment_retries = parse_retries('fragment', opts.fragment_retries)
     opts.extractor_retries = parse_retries('extractor', opts.extractor_retries)
     opts.file_access_retries = parse_retries('file access', opts.file_access_retries)
+    opts.request_retries = parse_retries('request', opts.request_retries)
+    validate_positive('circuit breaker threshold', opts.circuit_breaker_threshold)
+    validate_positive('max requests per host', opts.max_requests_per_host, strict=True)
 
     # Retry sleep function
     def parse_sleep_func(expr):
@@ -315,6 +330,8 @@ def validate_bytes(name, value, strict_positive=False):
         return numeric_limit
 
     opts.ratelimit = validate_bytes('rate limit', opts.ratelimit, True)
+    opts.global_ratelimit = validate_bytes('global rate limit', opts.global_ratelimit, True)
+    opts.host_ratelimit = validate_bytes('host rate limit', opts.host_ratelimit, True)
     opts.throttledratelimit = validate_bytes('throttled rate limit', opts.throttledratelimit)
     opts.min_filesize = validate_bytes('min filesize', opts.min_filesize)
     opts.max_filesize = validate_bytes('max filesize', opts.max_filesize)
@@ -469,6 +486,8 @@ def metadataparser_actions(f):
 
     if opts.download_archive is not None:
         opts.download_archive = expand_path(opts.download_archive)
+    if opts.import_download_archive is not None:
+        opts.import_download_archive = expand_path(opts.import_download_archive)
 
     if opts.ffmpeg_location is not None:
         opts.ffmpeg_location = expand_path(opts.ffmpeg_location)
@@ -741,7 +760,9 @@ def get_postprocessors(opts):
 def parse_options(argv=None):
     """@returns ParsedOptions(parser, opts, urls, ydl_opts)"""
     parser, opts, urls = parseOpts(argv)
-    urls = get_urls(urls, opts.batchfile, -1 if opts.quiet and not opts.verbose else opts.verbose)
+    urls = get_urls(
+        urls, opts.batchfile, -1 if opts.quiet and not opts.verbose else opts.verbose,
+        lazy=opts.batch_workers > 1)
 
     set_compat_opts(opts)
     try:
@@ -836,6 +857,8 @@ def parse_options(argv=None):
         'force_generic_extractor': opts.force_generic_extractor,
         'allowed_extractors': opts.allowed_extractors or ['default'],
         'ratelimit': opts.ratelimit,
+        'global_ratelimit': opts.global_ratelimit,
+        'host_ratelimit': opts.host_ratelimit,
         'throttledratelimit': opts.throttledratelimit,
         'overwrites': opts.overwrites,
         'retries': opts.retries,
@@ -859,6 +882,9 @@ def parse_options(argv=None):
         'playlistreverse': opts.playlist_reverse,
         'playlistrandom': opts.playlist_random,
         'lazy_playlist': opts.lazy_playlist,
+        'playlist_workers': opts.playlist_workers,
+        'batch_workers': opts.batch_workers,
+        'batch_unordered': opts.batch_unordered,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl.get('default') == '-',
         'consoletitle': opts.consoletitle,
@@ -900,6 +926,7 @@ def parse_options(argv=None):
         'cachedir': opts.cachedir,
         'age_limit': opts.age_limit,
         'download_archive': opts.download_archive,
+        'import_download_archive': opts.import_download_archive,
         'break_on_existing': opts.break_on_existing,
         'break_on_reject': opts.break_on_reject,
         'break_per_url': opts.break_per_url,
@@ -915,6 +942,7 @@ def parse_options(argv=None):
         'socket_timeout': opts.socket_timeout,
         'bidi_workaround': opts.bidi_workaround,
         'debug_printtraffic': opts.debug_printtraffic,
+        'request_trace_file': opts.request_trace_file,
         'default_search': opts.default_search,
         'dynamic_mpd': opts.dynamic_mpd,
         'extractor_args': opts.extractor_args,
@@ -928,6 +956,14 @@ def parse_options(argv=None):
         'postprocessors': postprocessors,
         'fixup': opts.fixup,
         'source_address': opts.source_address,
+        'resolve': opts.resolve,
+        'prefer_http2': opts.prefer_http2,
+        'http_cache': opts.http_cache,
+        'http_cache_authenticated': opts.http_cache_authenticated,
+        'request_retries': opts.request_retries,
+        'circuit_breaker_threshold': opts.circuit_breaker_threshold,
+        'max_requests_per_host': opts.max_requests_per_host,
+        'request_queue_order': opts.request_queue_order,
         'impersonate': opts.impersonate,
         'sleep_interval_requests': opts.sleep_interval_requests,
         'sleep_interval': opts.sleep_interval,
@@ -0,0 +1,147 @@
+import contextlib
+import errno
+import os
+import threading
+
+from .dependencies import sqlite3
+from .utils import YoutubeDLError, locked_file
+
+# Header of an SQLite database file
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+_SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+def read_archive_file(filename):
+    """Yields the ids listed in a text download archive"""
+    try:
+        with locked_file(filename, 'r', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                vid_id = line.strip()
+                if vid_id:
+                    yield vid_id
+    except OSError as ioe:
+        if ioe.errno != errno.ENOENT:
+            raise
+
+
+class DownloadArchive:
+    """
+    Base class for download archive backends
+
+    A download archive holds the archive ids (see make_archive_id) of the videos
+    that have been downloaded. A subclass must implement __contains__ and add
+    """
+
+    def __contains__(self, vid_id):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def add(self, vid_id):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def import_file(self, filename):
+        """Add the ids listed in a text download archive. Returns the number of new ids"""
+        count = 0
+        for vid_id in read_archive_file(filename):
+            if vid_id not in self:
+                self.add(vid_id)
+                count += 1
+        return count
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def from_filename(filename):
+        """Open the archive at filename with the backend that matches its extension or contents"""
+        is_sqlite = False
+        with contextlib.suppress(FileNotFoundError), open(filename, 'rb') as f:
+            is_sqlite = f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+        if is_sqlite or os.path.splitext(filename)[1].lower() in _SQLITE_EXTENSIONS:
+            return SQLiteDownloadArchive(filename)
+        return TextDownloadArchive(filename)
+
+
+class TextDownloadArchive(DownloadArchive):
+    """
+    Archive in a text file with one id per line
+
+    The whole file is loaded into memory, so ids added by
+    other processes are not seen until the archive is reopened
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._ids = set(read_archive_file(filename))
+
+    def __contains__(self, vid_id):
+        return vid_id in self._ids
+
+    def add(self, vid_id):
+        with locked_file(self.filename, 'a', encoding='utf-8') as archive_file:
+            archive_file.write(vid_id + '\n')
+        self._ids.add(vid_id)
+
+    def import_file(self, filename):
+        new_ids = [vid_id for vid_id in dict.fromkeys(read_archive_file(filename)) if vid_id not in self._ids]
+        if new_ids:
+            with locked_file(self.filename, 'a', encoding='utf-8') as archive_file:
+                archive_file.writelines(f'{vid_id}\n' for vid_id in new_ids)
+            self._ids.update(new_ids)
+        return len(new_ids)
+
+
+class SQLiteDownloadArchive(DownloadArchive):
+    """
+    Archive in an SQLite database
+
+    Lookups are done on the indexed table instead of loading the archive into
+    memory, and ids added by other processes are seen immediately
+    """
+
+    def __init__(self, filename):
+        if not sqlite3:
+            raise YoutubeDLError(
+                'Cannot use an SQLite download archive without sqlite3 support. '
+                'Please use a Python interpreter compiled with sqlite3 support')
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._conn = None
+        self._execute('CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def _connect(self):
+        if self._conn is None:
+            # Autocommit, so that every added id is immediately visible to other processes
+            self._conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        return self._conn
+
+    def _execute(self, *args):
+        with self._lock:
+            return self._connect().execute(*args).fetchone()
+
+    def __contains__(self, vid_id):
+        return self._execute('SELECT 1 FROM archive WHERE id = ?', (vid_id,)) is not None
+
+    def add(self, vid_id):
+        self._execute('INSERT OR IGNORE INTO archive (id) VALUES (?)', (vid_id,))
+
+    def import_file(self, filename):
+        with self._lock:
+            conn = self._connect()
+            changes = conn.total_changes
+            conn.execute('BEGIN')
+            try:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO archive (id) VALUES (?)',
+                    ((vid_id,) for vid_id in read_archive_file(filename)))
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return conn.total_changes - changes
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
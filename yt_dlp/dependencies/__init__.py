@@ -11,6 +11,15 @@
         brotli = None
 
 
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
 try:
     import certifi
 except ImportError:
@@ -41,6 +50,12 @@
     _SECRETSTORAGE_UNAVAILABLE_REASON = f'as the `secretstorage` module could not be initialized. {_err}'
 
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 try:
     import sqlite3
     # We need to get the underlying `sqlite` version, see https://github.com/yt-dlp/yt-dlp/issues/8152
@@ -66,6 +81,16 @@
 except ImportError:
     requests = None
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
 try:
     import xattr  # xattr or pyxattr
 except ImportError:
@@ -6,6 +6,7 @@
 import re
 import threading
 import time
+import urllib.parse
 
 from ..minicurses import (
     BreaklineStatusPrinter,
@@ -32,6 +33,7 @@
     try_call,
 )
 from ..utils._utils import _ProgressState
+from ..utils.progress import RateLimiter
 
 
 class FileDownloader:
@@ -49,6 +51,13 @@ class FileDownloader:
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
     ratelimit:          Download speed limit, in bytes/sec.
+    global_ratelimit:   Download speed limit shared by all concurrent downloads
+                        in the process, in bytes/sec.
+    host_ratelimit:     Download speed limit shared by all concurrent downloads
+                        from the same host, in bytes/sec.
+    ratelimit_weight:   Relative share of global_ratelimit and host_ratelimit
+                        that downloads of this instance get when they are
+                        shared with other downloads (default: 1)
     throttledratelimit: Assume the download is being throttled below this speed (bytes/sec)
     retries:            Number of times to retry for expected network errors.
                         Default is 0 for API, but 10 for CLI
@@ -85,6 +94,7 @@ def __init__(self, ydl, params):
         """Create a FileDownloader object with the given options."""
         self._set_ydl(ydl)
         self._progress_hooks = []
+        self._output_stream = None
         self.params = params
         self._prepare_multiline_status()
         self.add_progress_hook(self.report_progress)
@@ -214,6 +224,28 @@ def slow_down(self, start_time, now, byte_counter):
             if sleep_time > 0:
                 time.sleep(sleep_time)
 
+    def shared_rate_limit(self, url, sleep=True):
+        """Returns a function (size) -> None that throttles a download of url
+        according to the process-wide global_ratelimit and host_ratelimit.
+        With sleep=False, the function returns the number of seconds to wait instead of sleeping"""
+        limiters = []
+        if self.params.get('global_ratelimit'):
+            limiters.append(RateLimiter.get(('global', ), self.params['global_ratelimit']))
+        if self.params.get('host_ratelimit'):
+            host = urllib.parse.urlparse(url).hostname
+            limiters.append(RateLimiter.get(('host', host), self.params['host_ratelimit']))
+        weight = self.params.get('ratelimit_weight') or 1
+
+        def consume(size):
+            # Downloads are the consumers of the thread they run in, so that consecutive
+            # fragment downloads do not leave idle consumers behind that take a share of the rate
+            delay = max((limiter.reserve(size, weight) for limiter in limiters), default=0)
+            if not sleep:
+                return delay
+            if delay:
+                time.sleep(delay)
+        return consume
+
     def temp_name(self, filename):
         """Returns a temporary filename for the given filename."""
         if self.params.get('nopart', False) or filename == '-' or \
@@ -251,6 +283,8 @@ def wrapper(self, func, *args, **kwargs):
 
     @wrap_file_access('open', fatal=True)
     def sanitize_open(self, filename, open_mode):
+        if filename == '-' and self._output_stream is not None:
+            return self._output_stream, filename
         f, filename = sanitize_open(filename, open_mode)
         if not getattr(f, 'locked', None):
             self.write_debug(f'{LockingUnsupportedError.msg}. Proceeding without locking', only_once=True)
@@ -429,14 +463,15 @@ def supports_manifest(manifest):
 
     def download(self, filename, info_dict, subtitle=False):
         """Download to a filename using the info from info_dict
+        filename may also be a writable binary stream, which is then used in place of stdout
         Return True on success and False otherwise
         """
-        nooverwrites_and_exists = (
-            not self.params.get('overwrites', True)
-            and os.path.exists(filename)
-        )
-
         if not hasattr(filename, 'write'):
+            nooverwrites_and_exists = (
+                not self.params.get('overwrites', True)
+                and os.path.exists(filename)
+            )
+
             continuedl_and_exists = (
                 self.params.get('continuedl', True)
                 and os.path.isfile(filename)
@@ -477,6 +512,8 @@ def download(self, filename, info_dict, subtitle=False):
             self.to_screen(f'[download] Sleeping {sleep_interval:.2f} seconds {sleep_note}...')
             time.sleep(sleep_interval)
 
+        if hasattr(filename, 'write'):
+            self._output_stream, filename = filename, '-'
         ret = self.real_download(filename, info_dict)
         self._finish_multiline_status()
         return ret, True
@@ -90,6 +90,7 @@ def _get_fragments(self, fmt, ctx, extra_query):
             yield {
                 'frag_index': frag_index,
                 'fragment_count': fragment.get('fragment_count'),
+                'latency_to_edge': fragment.get('latency_to_edge'),
                 'index': i,
                 'url': fragment_url,
             }
@@ -1,5 +1,7 @@
 import concurrent.futures
 import contextlib
+import copy
+import io
 import json
 import math
 import os
@@ -42,8 +44,8 @@ class FragmentFD(FileDownloader):
     bookkeeping file with download state and metadata (in future such files will
     be used for any incomplete download handled by yt-dlp). This file is
     used to properly handle resuming, check download file consistency and detect
-    potential errors. The file has a .ytdl extension and represents a standard
-    JSON file of the following format:
+    potential errors. The file has a .ytdl extension and its first line is
+    a JSON object of the following format:
 
     extractor:
         Dictionary of extractor related data. TBD.
@@ -53,12 +55,35 @@ class FragmentFD(FileDownloader):
             current_fragment:
                 Dictionary with current (being downloaded) fragment data:
                 index:  0-based index of current fragment among all fragments
+                offset: Size of the output file when the fragment was appended
             fragment_count:
                 Total count of fragments
+            extra_state:
+                Downloader specific state
+
+    Every appended fragment then adds a line with a JSON object containing its
+    index and offset (and extra_state, if it changed), which supersedes the
+    state before it. The journal is compacted into the first line every
+    _YTDL_JOURNAL_COMPACT_INTERVAL fragments.
 
     This feature is experimental and file format may change in future.
     """
 
+    _YTDL_JOURNAL_COMPACT_INTERVAL = 1000
+
+    def __init__(self, ydl, params):
+        super().__init__(ydl, params)
+        # Contexts whose .ytdl journal may be open
+        self._ytdl_journal_ctxs = []
+
+    def download(self, filename, info_dict, subtitle=False):
+        try:
+            return super().download(filename, info_dict, subtitle)
+        finally:
+            # The journals are otherwise only closed when the download finishes
+            while self._ytdl_journal_ctxs:
+                self._close_ytdl_journal(self._ytdl_journal_ctxs.pop())
+
     def report_retry_fragment(self, err, frag_index, count, retries):
         self.deprecation_warning('yt_dlp.downloader.FragmentFD.report_retry_fragment is deprecated. '
                                  'Use yt_dlp.downloader.FileDownloader.report_retry instead')
@@ -83,30 +108,76 @@ def _read_ytdl_file(self, ctx):
         assert 'ytdl_corrupt' not in ctx
         stream, _ = self.sanitize_open(self.ytdl_filename(ctx['filename']), 'r')
         try:
-            ytdl_data = json.loads(stream.read())
+            header, *records = stream.read().splitlines()
+            ytdl_data = json.loads(header)
             ctx['fragment_index'] = ytdl_data['downloader']['current_fragment']['index']
+            ctx['dest_offset'] = ytdl_data['downloader']['current_fragment'].get('offset')
             if 'extra_state' in ytdl_data['downloader']:
                 ctx['extra_state'] = ytdl_data['downloader']['extra_state']
+            for record in records:
+                try:
+                    record = json.loads(record)
+                except json.JSONDecodeError:
+                    # The last record is incomplete if the download was interrupted while writing it
+                    break
+                ctx['fragment_index'], ctx['dest_offset'] = record['index'], record['offset']
+                if 'extra_state' in record:
+                    ctx['extra_state'] = record['extra_state']
+            ctx['ytdl_journal_records'] = len(records)
+            ctx['ytdl_journal_extra_state'] = json.dumps(ctx.get('extra_state'))
         except Exception:
             ctx['ytdl_corrupt'] = True
         finally:
             stream.close()
 
     def _write_ytdl_file(self, ctx):
-        frag_index_stream, _ = self.sanitize_open(self.ytdl_filename(ctx['filename']), 'w')
+        self._close_ytdl_journal(ctx)
+        ytdl_filename = self.ytdl_filename(ctx['filename'])
+        # Write to a temporary file first, so that the state is never lost to a partial write.
+        # Not temp_name(), which is the file itself with --no-part
+        frag_index_stream, tmp_filename = self.sanitize_open(f'{ytdl_filename}.part', 'w')
         try:
             downloader = {
                 'current_fragment': {
                     'index': ctx['fragment_index'],
                 },
             }
+            if ctx.get('dest_offset') is not None:
+                downloader['current_fragment']['offset'] = ctx['dest_offset']
             if 'extra_state' in ctx:
                 downloader['extra_state'] = ctx['extra_state']
             if ctx.get('fragment_count') is not None:
                 downloader['fragment_count'] = ctx['fragment_count']
-            frag_index_stream.write(json.dumps({'downloader': downloader}))
+            frag_index_stream.write(json.dumps({'downloader': downloader}) + '\n')
         finally:
             frag_index_stream.close()
+        self.try_rename(tmp_filename, ytdl_filename)
+        ctx['ytdl_journal_records'] = 0
+        ctx['ytdl_journal_extra_state'] = json.dumps(ctx.get('extra_state'))
+
+    def _append_ytdl_journal(self, ctx):
+        if ctx.get('ytdl_journal_records', 0) >= self._YTDL_JOURNAL_COMPACT_INTERVAL:
+            return self._write_ytdl_file(ctx)
+
+        record = {
+            'index': ctx['fragment_index'],
+            'offset': ctx['dest_offset'],
+        }
+        extra_state = json.dumps(ctx.get('extra_state'))
+        if extra_state != ctx.get('ytdl_journal_extra_state'):
+            record['extra_state'] = ctx['extra_state']
+            ctx['ytdl_journal_extra_state'] = extra_state
+
+        if not ctx.get('ytdl_journal'):
+            ctx['ytdl_journal'], _ = self.sanitize_open(self.ytdl_filename(ctx['filename']), 'a')
+            self._ytdl_journal_ctxs.append(ctx)
+        ctx['ytdl_journal'].write(json.dumps(record) + '\n')
+        ctx['ytdl_journal'].flush()
+        ctx['ytdl_journal_records'] = ctx.get('ytdl_journal_records', 0) + 1
+
+    def _close_ytdl_journal(self, ctx):
+        if ctx.get('ytdl_journal'):
+            ctx.pop('ytdl_journal').close()
 
     def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
         fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
@@ -116,6 +187,17 @@ def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_dat
             'request_data': request_data,
             'ctx_id': ctx.get('ctx_id'),
         }
+        if ctx['tmpfilename'] == '-':
+            # Keep fragments in memory when downloading to stdout or a stream, so that nothing touches the disk
+            fragment_info_dict['frag_resume_len'] = ctx['frag_resume_len'] = 0
+            frag_stream = io.BytesIO()
+            success, _ = copy.copy(ctx['dl']).download(frag_stream, fragment_info_dict)
+            if not success:
+                return False
+            # There is no fragment_filetime: it is only used to set the modification time of the output file
+            ctx['fragment_content'] = frag_stream.getvalue()
+            return True
+
         frag_resume_len = 0
         if ctx['dl'].params.get('continuedl', True):
             frag_resume_len = self.filesize_or_none(self.temp_name(fragment_filename))
@@ -130,6 +212,9 @@ def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_dat
         return True
 
     def _read_fragment(self, ctx):
+        frag_content = ctx.pop('fragment_content', None)
+        if frag_content is not None:
+            return frag_content
         if not ctx.get('fragment_filename_sanitized'):
             return None
         try:
@@ -147,12 +232,13 @@ def _append_fragment(self, ctx, frag_content):
         try:
             ctx['dest_stream'].write(frag_content)
             ctx['dest_stream'].flush()
-        finally:
             if self.__do_ytdl_file(ctx):
-                self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                self.try_remove(ctx['fragment_filename_sanitized'])
-            del ctx['fragment_filename_sanitized']
+                ctx['dest_offset'] = ctx['dest_stream'].tell()
+                self._append_ytdl_journal(ctx)
+        finally:
+            frag_filename = ctx.pop('fragment_filename_sanitized', None)
+            if frag_filename and not self.params.get('keep_fragments', False):
+                self.try_remove(frag_filename)
 
     def _prepare_frag_download(self, ctx):
         if not ctx.setdefault('live', False):
@@ -173,17 +259,15 @@ def _prepare_frag_download(self, ctx):
             'sleep_interval_subtitles': 0,
         })
         tmpfilename = self.temp_name(ctx['filename'])
-        open_mode = 'wb'
 
         # Establish possible resume length
         resume_len = self.filesize_or_none(tmpfilename)
-        if resume_len > 0:
-            open_mode = 'ab'
 
         # Should be initialized before ytdl file check
         ctx.update({
             'tmpfilename': tmpfilename,
             'fragment_index': 0,
+            'dest_offset': 0,
         })
 
         if self.__do_ytdl_file(ctx):
@@ -193,13 +277,21 @@ def _prepare_frag_download(self, ctx):
                 self._read_ytdl_file(ctx)
                 is_corrupt = ctx.get('ytdl_corrupt') is True
                 is_inconsistent = ctx['fragment_index'] > 0 and resume_len == 0
+                dest_offset = ctx.get('dest_offset')
+                if not is_corrupt and dest_offset is not None:
+                    if resume_len < dest_offset:
+                        is_inconsistent = True
+                    elif resume_len > dest_offset:
+                        # Discard the partially appended fragment of an interrupted download
+                        os.truncate(tmpfilename, dest_offset)
+                        resume_len = dest_offset
                 if is_corrupt or is_inconsistent:
                     message = (
                         '.ytdl file is corrupt' if is_corrupt else
                         'Inconsistent state of incomplete fragment download')
                     self.report_warning(
                         f'{message}. Restarting from the beginning ...')
-                    ctx['fragment_index'] = resume_len = 0
+                    ctx['fragment_index'] = ctx['dest_offset'] = resume_len = 0
                     if 'ytdl_corrupt' in ctx:
                         del ctx['ytdl_corrupt']
                     self._write_ytdl_file(ctx)
@@ -208,11 +300,11 @@ def _prepare_frag_download(self, ctx):
                 if not continuedl:
                     if ytdl_file_exists:
                         self._read_ytdl_file(ctx)
-                    ctx['fragment_index'] = resume_len = 0
+                    ctx['fragment_index'] = ctx['dest_offset'] = resume_len = 0
                 self._write_ytdl_file(ctx)
                 assert ctx['fragment_index'] == 0
 
-        dest_stream, tmpfilename = self.sanitize_open(tmpfilename, open_mode)
+        dest_stream, tmpfilename = self.sanitize_open(tmpfilename, 'ab' if resume_len > 0 else 'wb')
 
         ctx.update({
             'dl': dl,
@@ -245,6 +337,8 @@ def frag_progress_hook(s):
 
             if not total_frags and ctx.get('fragment_count'):
                 state['fragment_count'] = ctx['fragment_count']
+            if ctx.get('latency_to_edge') is not None:
+                state['latency_to_edge'] = ctx['latency_to_edge']
 
             if ctx_id is not None and s.get('ctx_id') != ctx_id:
                 return
@@ -283,7 +377,9 @@ def frag_progress_hook(s):
         return ctx['started']
 
     def _finish_frag_download(self, ctx, info_dict):
-        ctx['dest_stream'].close()
+        if ctx['dest_stream'] is not self._output_stream:
+            ctx['dest_stream'].close()
+        self._close_ytdl_journal(ctx)
         if self.__do_ytdl_file(ctx):
             self.try_remove(self.ytdl_filename(ctx['filename']))
         elapsed = time.time() - ctx['started']
@@ -459,6 +555,7 @@ def error_callback(err, count, retries):
             for retry in RetryManager(self.params.get('fragment_retries'), error_callback):
                 try:
                     ctx['fragment_count'] = fragment.get('fragment_count')
+                    ctx['latency_to_edge'] = fragment.get('latency_to_edge')
                     if not self._download_fragment(
                             ctx, fragment['url'], info_dict, headers, info_dict.get('request_data')):
                         return
@@ -488,13 +585,15 @@ def append_fragment(frag_content, frag_index, ctx):
             def _download_fragment(fragment):
                 ctx_copy = ctx.copy()
                 download_fragment(fragment, ctx_copy)
-                return fragment, fragment['frag_index'], ctx_copy.get('fragment_filename_sanitized')
+                return (fragment, fragment['frag_index'],
+                        ctx_copy.get('fragment_filename_sanitized'), ctx_copy.get('fragment_content'))
 
             with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
                 try:
-                    for fragment, frag_index, frag_filename in pool.map(_download_fragment, fragments):
+                    for fragment, frag_index, frag_filename, frag_content in pool.map(_download_fragment, fragments):
                         ctx.update({
                             'fragment_filename_sanitized': frag_filename,
+                            'fragment_content': frag_content,
                             'fragment_index': frag_index,
                         })
                         if not append_fragment(decrypt_fragment(fragment, self._read_fragment(ctx)), frag_index, ctx):
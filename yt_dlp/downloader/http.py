@@ -9,6 +9,7 @@
     HTTPError,
     TransportError,
 )
+from ..networking.limiter import PRIORITY_BULK
 from ..utils import (
     ContentTooShortError,
     RetryManager,
@@ -24,7 +25,7 @@ class HttpFD(FileDownloader):
     def real_download(self, filename, info_dict):
         url = info_dict['url']
         request_data = info_dict.get('request_data', None)
-        request_extensions = {}
+        request_extensions = {'priority': PRIORITY_BULK}
         impersonate_target = self._get_impersonate_target(info_dict)
         if impersonate_target is not None:
             request_extensions['impersonate'] = impersonate_target
@@ -228,6 +229,10 @@ def download():
 
             byte_counter = 0 + ctx.resume_len
             block_size = ctx.block_size
+            shared_rate_limit = self.shared_rate_limit(url)
+            # Blocks are read into a reusable buffer instead of allocating a new bytes object per read.
+            # It is only ever grown, so that best_block_size() oscillating does not cause reallocations
+            buffer = memoryview(bytearray(block_size))
             start = time.time()
 
             # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
@@ -246,16 +251,19 @@ def retry(e):
                 raise RetryDownload(e)
 
             while True:
+                read_size = block_size if not is_test else min(block_size, data_len - byte_counter)
+                if read_size > len(buffer):
+                    buffer = memoryview(bytearray(read_size))
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+                    block_len = ctx.data.readinto(buffer[:read_size])
                 except TransportError as err:
                     retry(err)
 
-                byte_counter += len(data_block)
+                byte_counter += block_len
 
                 # exit loop when download is finished
-                if len(data_block) == 0:
+                if block_len == 0:
                     break
 
                 # Open destination file just in time
@@ -271,7 +279,7 @@ def retry(e):
                         return False
 
                 try:
-                    ctx.stream.write(data_block)
+                    ctx.stream.write(buffer[:block_len])
                 except OSError as err:
                     self.to_stderr('\n')
                     self.report_error(f'unable to write data: {err}')
@@ -279,6 +287,7 @@ def retry(e):
 
                 # Apply rate limit
                 self.slow_down(start, now, byte_counter - ctx.resume_len)
+                shared_rate_limit(block_len)
 
                 # end measuring of one loop run
                 now = time.time()
@@ -286,7 +295,7 @@ def retry(e):
 
                 # Adjust block size
                 if not self.params.get('noresizebuffer', False):
-                    block_size = self.best_block_size(after - before, len(data_block))
+                    block_size = self.best_block_size(after - before, block_len)
 
                 before = after
 
@@ -45,9 +45,13 @@ async def real_connection(self, sink, info_dict):
 
 class WebSocketFragmentFD(FFmpegSinkFD):
     async def real_connection(self, sink, info_dict):
+        shared_rate_limit = self.shared_rate_limit(info_dict['url'], sleep=False)
         async with websockets.connect(info_dict['url'], extra_headers=info_dict.get('http_headers', {})) as ws:
             while True:
                 recv = await ws.recv()
                 if isinstance(recv, str):
                     recv = recv.encode('utf8')
                 sink.write(recv)
+                delay = shared_rate_limit(len(recv))
+                if delay:
+                    await asyncio.sleep(delay)
@@ -0,0 +1,114 @@
+import collections
+import functools
+import re
+
+try:
+    sre_parse = re._parser
+except AttributeError:  # Python < 3.11
+    import sre_parse
+
+from .common import InfoExtractor
+from ..utils import variadic
+
+# Length of the substrings that extractors are indexed by
+_GRAM_LENGTH = 4
+
+
+@functools.cache
+def _required_literals(pattern):
+    """Returns lowercased ASCII strings that every match of the regex pattern must contain"""
+    literals = []
+
+    def flush(run):
+        if run:
+            literals.append(''.join(run).lower())
+
+    def walk(subpattern, run):
+        for op, av in subpattern:
+            if op is sre_parse.LITERAL and av < 128:
+                run.append(chr(av))
+            elif op is sre_parse.AT:
+                # Zero-width, so the literals around it are still adjacent
+                continue
+            elif op is sre_parse.SUBPATTERN:
+                run = walk(av[-1], run)
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                flush(run)
+                flush(walk(av[-1], []))
+                run = []
+            else:
+                flush(run)
+                run = []
+        return run
+
+    try:
+        flush(walk(sre_parse.parse(pattern), []))
+    except Exception:
+        return ()
+    return tuple(literals)
+
+
+def _url_grams(ie):
+    """Returns a list with the set of substrings that a URL must contain for each _VALID_URL,
+    or None if the extractor cannot be indexed"""
+    klass = ie if isinstance(ie, type) else type(ie)
+    for name in ('suitable', '_match_valid_url'):
+        owner = next(c for c in klass.__mro__ if name in c.__dict__)
+        # Lazy extractors only define these methods if the real extractor overrides them
+        if owner is not InfoExtractor and owner.__name__ != 'LazyLoadExtractor':
+            return None
+
+    if ie._VALID_URL is False:
+        return []
+    grams = []
+    for pattern in variadic(ie._VALID_URL):
+        pattern_grams = {
+            literal[i:i + _GRAM_LENGTH]
+            for literal in _required_literals(pattern)
+            for i in range(len(literal) - _GRAM_LENGTH + 1)}
+        if not pattern_grams:
+            return None
+        grams.append(pattern_grams)
+    return grams
+
+
+class URLDispatchIndex:
+    """
+    Index of extractors by substrings that their _VALID_URL requires a URL to contain
+
+    candidates() narrows down the extractors that can be suitable for a URL,
+    preserving their order; so trying the candidates in order finds the same
+    first suitable extractor as trying every extractor
+    """
+
+    def __init__(self, ies):
+        """@param ies   Ordered mapping of ie_key to extractor class or instance"""
+        self._keys = list(ies)
+        self._unindexed = []
+        self._index = collections.defaultdict(set)
+
+        grams_by_position = {}
+        for position, ie in enumerate(ies.values()):
+            grams = _url_grams(ie)
+            if grams is None:
+                self._unindexed.append(position)
+            else:
+                grams_by_position[position] = grams
+
+        # Index each pattern by its rarest substring, to keep the buckets small
+        gram_counts = collections.Counter(
+            gram for grams in grams_by_position.values() for pattern_grams in grams for gram in pattern_grams)
+        for position, grams in grams_by_position.items():
+            for pattern_grams in grams:
+                self._index[min(sorted(pattern_grams), key=gram_counts.__getitem__)].add(position)
+
+    def candidates(self, url):
+        """Returns the keys of the extractors that may be suitable for url, in order"""
+        # Non-ASCII characters may match case-insensitively without being equal when lowercased
+        if not url.isascii():
+            return list(self._keys)
+        url = url.lower()
+        positions = set(self._unindexed)
+        for i in range(len(url) - _GRAM_LENGTH + 1):
+            positions.update(self._index.get(url[i:i + _GRAM_LENGTH], ()))
+        return [self._keys[position] for position in sorted(positions)]
@@ -577,6 +577,11 @@ class InfoExtractor:
 
     The _WORKING attribute should be set to False for broken IEs
     in order to warn the users and skip the tests.
+
+    The _HTTP_CACHE_TTL attribute may be set to the number of seconds for which
+    the responses to the requests of this extractor are cached when the HTTP cache
+    is enabled, regardless of their caching headers. 0 disables the cache.
+    A request can override it with its `cache` extension (see RequestDirector)
     """
 
     _ready = False
@@ -588,6 +593,7 @@ class InfoExtractor:
     _WORKING = True
     _ENABLED = True
     _NETRC_MACHINE = None
+    _HTTP_CACHE_TTL = None
     IE_DESC = None
     SEARCH_KEY = None
     _VALID_URL = None
@@ -870,8 +876,10 @@ def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fa
         if not self._downloader._first_webpage_request:
             sleep_interval = self.get_param('sleep_interval_requests') or 0
             if sleep_interval > 0:
-                self.to_screen(f'Sleeping {sleep_interval} seconds ...')
-                time.sleep(sleep_interval)
+                # Shared, so that concurrent extractions do not multiply the request rate
+                with self._downloader._request_sleep_lock:
+                    self.to_screen(f'Sleeping {sleep_interval} seconds ...')
+                    time.sleep(sleep_interval)
         else:
             self._downloader._first_webpage_request = False
 
@@ -906,8 +914,18 @@ def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fa
             self.report_warning(
                 self._downloader._unavailable_targets_message(requested_targets, note=msg), only_once=True)
 
+        if isinstance(url_or_request, Request):
+            # The request of the caller may be reused, e.g. by another extractor
+            url_or_request = url_or_request.copy()
+        request = self._create_request(url_or_request, data, headers, query, extensions)
+        request.extensions.setdefault('cache', True if self._HTTP_CACHE_TTL is None else self._HTTP_CACHE_TTL)
+        request.extensions.setdefault('trace', {
+            'extractor': self.IE_NAME,
+            'note': 'Downloading webpage' if note is None else str(note) if note else None,
+            'video_id': video_id,
+        })
         try:
-            return self._downloader.urlopen(self._create_request(url_or_request, data, headers, query, extensions))
+            return self._downloader.urlopen(request)
         except network_exceptions as err:
             if isinstance(err, HTTPError):
                 if self.__can_accept_status_code(err, expected_status):
@@ -1970,6 +1970,7 @@ def mpd_feed(format_id, delay):
 
     def _live_dash_fragments(self, video_id, format_id, live_start_time, mpd_feed, manifestless_orig_fmt, ctx):
         FETCH_SPAN, MAX_DURATION = 5, 432000
+        low_latency = self._configuration_arg('live_low_latency', ['false'], casesense=False)[0] == 'true'
 
         mpd_url, stream_number, is_live = None, None, True
 
@@ -2060,9 +2061,13 @@ def _extract_sequence_from_mpd(refresh_sequence, immediate):
                         known_idx = idx - 1
                         raise ExtractorError('breaking out of outer loop')
                     last_segment_url = urljoin(fragment_base_url, f'sq/{idx}')
+                    segment_duration = float_or_none(traverse_obj(fragments, (-1, 'duration')))
                     yield {
                         'url': last_segment_url,
                         'fragment_count': last_seq,
+                        # The edge was at the end of the segment before last_seq at fetch_time
+                        'latency_to_edge': segment_duration and (
+                            (last_seq - 1 - idx) * segment_duration + time.time() - fetch_time),
                     }
                 if known_idx == last_seq:
                     no_fragment_score += 5
@@ -2077,7 +2082,13 @@ def _extract_sequence_from_mpd(refresh_sequence, immediate):
                 # fragment count no longer increase since it starts
                 break
 
-            time.sleep(max(0, FETCH_SPAN + fetch_time - time.time()))
+            fetch_span = FETCH_SPAN
+            if low_latency:
+                # Poll the head sequence once per segment instead of at a fixed interval,
+                # so that new segments are picked up as soon as they are published
+                segment_duration = float_or_none(traverse_obj(fragments, (-1, 'duration')))
+                fetch_span = min(max(segment_duration or FETCH_SPAN, 0.5), FETCH_SPAN)
+            time.sleep(max(0, fetch_span + fetch_time - time.time()))
 
     def _get_player_js_version(self):
         player_js_version = self._configuration_arg('player_js_version', [''])[0] or self._DEFAULT_PLAYER_JS_VERSION
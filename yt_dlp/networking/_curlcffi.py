@@ -87,12 +87,18 @@ def close(self):
 class CurlCFFIResponseAdapter(Response):
     fp: CurlCFFIResponseReader
 
-    def __init__(self, response: curl_cffi.requests.Response):
+    def __init__(self, response: curl_cffi.requests.Response, release_session=None):
         super().__init__(
             fp=CurlCFFIResponseReader(response),
             headers=response.headers,
             url=response.url,
             status=response.status_code)
+        self._release_session = release_session
+
+    def close(self):
+        super().close()
+        if self._release_session:
+            self._release_session()
 
     def read(self, amt=None):
         try:
@@ -226,9 +232,24 @@ def send(self, request: Request) -> Response:
         return response
 
     def _send(self, request: Request):
-        max_redirects_exceeded = False
-        session: curl_cffi.requests.Session = self._get_instance(
+        # Closing a session also closes the connection of a response that is still being read
+        session, release_session = self._get_held_instance(
             cookiejar=self._get_cookiejar(request) if 'cookie' not in request.headers else None)
+        try:
+            curl_response, max_redirects_exceeded = self._send_with_session(session, request)
+        except BaseException:
+            release_session()
+            raise
+
+        response = CurlCFFIResponseAdapter(curl_response, release_session)
+
+        if not 200 <= response.status < 300:
+            raise HTTPError(response, redirect_loop=max_redirects_exceeded)
+
+        return response
+
+    def _send_with_session(self, session: curl_cffi.requests.Session, request: Request):
+        max_redirects_exceeded = False
 
         if self.verbose:
             session.curl.setopt(CurlOpt.VERBOSE, 1)
@@ -311,12 +332,7 @@ def _send(self, request: Request):
             else:
                 raise TransportError(cause=e) from e
 
-        response = CurlCFFIResponseAdapter(curl_response)
-
-        if not 200 <= response.status < 300:
-            raise HTTPError(response, redirect_loop=max_redirects_exceeded)
-
-        return response
+        return curl_response, max_redirects_exceeded
 
 
 @register_preference(CurlCFFIRH)
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import collections
 import contextlib
+import contextvars
 import functools
+import itertools
 import os
+import queue
 import socket
 import ssl
 import sys
+import threading
+import time
 import typing
 import urllib.parse
 import urllib.request
@@ -97,6 +103,79 @@ def get_redirect_method(method, status):
     return method
 
 
+# RequestTrace (see networking.trace) of the request that is being sent in the current context, if any
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+# Proxy (if any) that the request being sent in the current context is routed through
+current_proxy = contextvars.ContextVar('current_proxy', default=None)
+
+
+@contextlib.contextmanager
+def trace_phase(name):
+    """Record the time spent in a phase of a request, e.g. "dns", in the trace of the current request"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter())
+
+
+class _ResumableSSLSocket(ssl.SSLSocket):
+    def close(self):
+        self.context._save_session(self)
+        super().close()
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """
+    SSLContext that resumes the TLS sessions of earlier connections to the same server
+
+    The session of a connection is saved when the connection is closed,
+    which is after the session tickets of TLS 1.3 servers have been received.
+    Sessions are keyed by the server name, the address of the peer and the proxy
+    of the current request, so that connections through different proxies
+    (whose peer is the proxy rather than the server) never share a session.
+    """
+    sslsocket_class = _ResumableSSLSocket
+    _MAX_SESSIONS = 256
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._sessions = collections.OrderedDict()
+        self._sessions_lock = threading.Lock()
+
+    @staticmethod
+    def _session_key(sock, server_hostname):
+        try:
+            return server_hostname, tuple(sock.getpeername()[:2]), current_proxy.get()
+        except (OSError, TypeError):
+            return None
+
+    def _save_session(self, sock):
+        key = self._session_key(sock, sock.server_hostname)
+        with contextlib.suppress(ssl.SSLError, ValueError, OSError):
+            session = sock.session
+            if key is None or session is None or not (session.has_ticket or session.id):
+                return
+            with self._sessions_lock:
+                self._sessions.pop(key, None)
+                self._sessions[key] = session
+                while len(self._sessions) > self._MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname:
+            key = self._session_key(sock, server_hostname)
+            with self._sessions_lock:
+                session = self._sessions.get(key)
+        with trace_phase('tls'):
+            return super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+
+
 def make_ssl_context(
     verify=True,
     client_certificate=None,
@@ -104,8 +183,9 @@ def make_ssl_context(
     client_certificate_password=None,
     legacy_support=False,
     use_certifi=True,
+    alpn_protocols=('http/1.1',),
 ):
-    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
     context.check_hostname = verify
     context.verify_mode = ssl.CERT_REQUIRED if verify else ssl.CERT_NONE
     # OpenSSL 1.1.1+ Python 3.8+ keylog file
@@ -116,7 +196,7 @@ def make_ssl_context(
     # https://github.com/python/cpython/issues/85140
     # https://github.com/yt-dlp/yt-dlp/issues/3878
     with contextlib.suppress(NotImplementedError):
-        context.set_alpn_protocols(['http/1.1'])
+        context.set_alpn_protocols(list(alpn_protocols))
     if verify:
         ssl_load_certs(context, use_certifi)
 
@@ -154,32 +234,146 @@ def make_ssl_context(
     return context
 
 
+@functools.lru_cache(maxsize=32)
+def get_shared_ssl_context(scope, **kwargs):
+    """
+    Get an SSLContext from make_ssl_context() that is shared within the process,
+    so that connections resume the TLS sessions of earlier connections made with other instances.
+
+    @param scope: Contexts are only shared within a scope, e.g. a type of request handler,
+                  since the libraries that handlers use may modify the contexts that they are given.
+    """
+    return make_ssl_context(**kwargs)
+
+
+def _freeze(value):
+    """Hashable equivalent of a value made of dicts, lists, tuples and sets"""
+    if isinstance(value, dict):
+        return frozenset((key, _freeze(val)) for key, val in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_freeze, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(_freeze, value))
+    return value
+
+
 class InstanceStoreMixin:
+    """
+    Store of instances, e.g. sessions with their connection pools, created per set of keyword arguments
+
+    Instances are kept in least recently used order. When a new instance is created, the least recently used
+    ones beyond _MAX_INSTANCES and those unused for _INSTANCE_IDLE_TIMEOUT seconds are evicted and closed.
+    Instances obtained with _get_held_instance() are only closed once they are released,
+    e.g. when closing a session would also close the connection of a response that is still being read.
+    Keyword argument values must be hashable, or dicts, lists, tuples and sets of hashable values.
+    """
+    _MAX_INSTANCES = 16
+    # Seconds; None to keep idle instances until they are the least recently used
+    _INSTANCE_IDLE_TIMEOUT = 300
+
     def __init__(self, **kwargs):
-        self.__instances = []
+        self.__instances = collections.OrderedDict()  # key -> [instance, time of last use]
+        # id(instance) -> number of holds, of the instances that are held
+        self.__holds = collections.Counter()
+        # id(instance) -> instance, of the evicted instances that are closed once they are no longer held
+        self.__evicted = {}
+        # Requests from concurrent threads (e.g. of fragment downloads) must share the same instance
+        self.__lock = threading.Lock()
+        self.__stats = collections.Counter(dict.fromkeys(('created', 'reused', 'evicted', 'expired'), 0))
         super().__init__(**kwargs)  # So that both MRO works
 
     @staticmethod
     def _create_instance(**kwargs):
         raise NotImplementedError
 
+    @property
+    def instance_stats(self):
+        """Counts of instances 'created', 'reused', 'evicted' and 'expired', and the current number of instances"""
+        with self.__lock:
+            return {**self.__stats, 'size': len(self.__instances)}
+
+    def __pop_stale_instances(self, now):
+        if self._INSTANCE_IDLE_TIMEOUT is not None:
+            while self.__instances:
+                key, (instance, last_used) = next(iter(self.__instances.items()))
+                if now - last_used <= self._INSTANCE_IDLE_TIMEOUT:
+                    break
+                del self.__instances[key]
+                self.__stats['expired'] += 1
+                yield instance
+        while len(self.__instances) > self._MAX_INSTANCES:
+            _, (instance, _) = self.__instances.popitem(last=False)
+            self.__stats['evicted'] += 1
+            yield instance
+
+    def __get_instance(self, kwargs, hold):
+        key = _freeze(kwargs)
+        now = time.monotonic()
+        stale = []
+        with self.__lock:
+            entry = self.__instances.get(key)
+            if entry is not None:
+                entry[1] = now
+                self.__instances.move_to_end(key)
+                self.__stats['reused'] += 1
+                instance = entry[0]
+            else:
+                instance = self._create_instance(**kwargs)
+                self.__stats['created'] += 1
+                self.__instances[key] = [instance, now]
+                for stale_instance in self.__pop_stale_instances(now):
+                    if self.__holds[id(stale_instance)]:
+                        self.__evicted[id(stale_instance)] = stale_instance
+                    else:
+                        stale.append(stale_instance)
+            if hold:
+                self.__holds[id(instance)] += 1
+
+        for stale_instance in stale:
+            self._close_instance(stale_instance)
+        return instance
+
     def _get_instance(self, **kwargs):
-        for key, instance in self.__instances:
-            if key == kwargs:
-                return instance
+        return self.__get_instance(kwargs, hold=False)
+
+    def _get_held_instance(self, **kwargs):
+        """
+        Get an instance that is not closed when evicted until it is released
+
+        @returns (instance, release), where release() must be called once the instance is no longer used,
+                 e.g. when its response is closed. Further calls to it do nothing.
+        """
+        instance = self.__get_instance(kwargs, hold=True)
+        released = False
+
+        def release():
+            nonlocal released
+            with self.__lock:
+                if released:
+                    return
+                released = True
+                self.__holds[id(instance)] -= 1
+                if self.__holds[id(instance)]:
+                    return
+                del self.__holds[id(instance)]
+                if self.__evicted.pop(id(instance), None) is None:
+                    return
+            self._close_instance(instance)
 
-        instance = self._create_instance(**kwargs)
-        self.__instances.append((kwargs, instance))
-        return instance
+        return instance, release
 
     def _close_instance(self, instance):
         if callable(getattr(instance, 'close', None)):
             instance.close()
 
     def _clear_instances(self):
-        for _, instance in self.__instances:
+        with self.__lock:
+            instances = [instance for instance, _ in self.__instances.values()]
+            instances.extend(self.__evicted.values())
+            self.__instances.clear()
+            self.__evicted.clear()
+        for instance in instances:
             self._close_instance(instance)
-        self.__instances.clear()
 
 
 def add_accept_encoding_header(headers: HTTPHeaderDict, supported_encodings: Iterable[str]):
@@ -232,18 +426,149 @@ def create_socks_proxy_socket(dest_addr, proxy_args, proxy_ip_addr, timeout, sou
         raise
 
 
+class DNSCache:
+    """
+    Cache of getaddrinfo() results, shared by the connections of all request handlers in the process
+
+    getaddrinfo() does not expose the TTL of the DNS records, so successful lookups are kept for `ttl`
+    seconds and failed lookups for `negative_ttl` seconds.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=10, max_entries=1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # (host, port) -> (expiry time, addresses or the socket.gaierror of the lookup)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def getaddrinfo(self, host, port, overrides=None):
+        """
+        Resolve a host to a list of SOCK_STREAM addresses, as returned by socket.getaddrinfo()
+
+        @param overrides: Dict of lowercase hosts to lists of IP addresses to use instead of resolving the host.
+        """
+        if overrides and host.lower() in overrides:
+            return [addr for ip in overrides[host.lower()] for addr in socket.getaddrinfo(
+                ip, port, 0, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST)]
+
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            expiry, result = self._entries.get(key, (0, None))
+            if expiry <= now:
+                result = None
+        if result is None:
+            try:
+                result = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+                ttl = self.ttl
+            except socket.gaierror as e:
+                result, ttl = e, self.negative_ttl
+            with self._lock:
+                self._entries.pop(key, None)
+                self._entries[key] = (now + ttl, result)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if isinstance(result, socket.gaierror):
+            raise socket.gaierror(*result.args)
+        return list(result)
+
+    def remove(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dns_cache = DNSCache()
+
+# See https://www.rfc-editor.org/rfc/rfc8305#section-5
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+
+def _interleave_address_families(ip_addrs):
+    """Alternate between the address families, starting with the first one. See RFC 8305 Section 4"""
+    families = collections.OrderedDict()
+    for ip_addr in ip_addrs:
+        families.setdefault(ip_addr[0], []).append(ip_addr)
+    return [ip_addr for ip_addrs in itertools.zip_longest(*families.values()) for ip_addr in ip_addrs if ip_addr]
+
+
+def _race_connections(ip_addrs, timeout, source_address, create_socket_func, delay=CONNECTION_ATTEMPT_DELAY):
+    """
+    Connect to the addresses in parallel, starting a new attempt every `delay` seconds
+    or as soon as an attempt fails, and return the first established connection. See RFC 8305
+    """
+    results = queue.Queue()
+    lock = threading.Lock()
+    done = False
+
+    def attempt(ip_addr):
+        try:
+            sock = create_socket_func(ip_addr, timeout, source_address)
+        except OSError as e:
+            results.put((None, e))
+            return
+        with lock:
+            if done:
+                sock.close()
+                return
+            results.put((sock, None))
+
+    ip_addrs = iter(ip_addrs)
+    pending = 0
+    err = None
+    while True:
+        ip_addr = next(ip_addrs, None)
+        if ip_addr is not None:
+            threading.Thread(target=attempt, args=(ip_addr,), daemon=True).start()
+            pending += 1
+        elif not pending:
+            break
+        try:
+            sock, err = results.get(timeout=delay if ip_addr is not None else None)
+        except queue.Empty:
+            continue
+        pending -= 1
+        if sock is not None:
+            with lock:
+                done = True
+            # Close the connections that were established at the same time
+            while not results.empty():
+                other_sock, _ = results.get()
+                if other_sock is not None:
+                    other_sock.close()
+            return sock
+
+    try:
+        raise err
+    finally:
+        # Explicitly break __traceback__ reference cycle
+        # https://bugs.python.org/issue36820
+        err = None
+
+
 def create_connection(
     address,
     timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
     source_address=None,
     *,
+    resolve=None,
     _create_socket_func=_socket_connect,
 ):
+    """
+    Connect to an address, racing the connections to its IP addresses (see RFC 8305)
+
+    @param resolve: Dict of lowercase hosts to lists of IP addresses to use instead of resolving the host.
+    """
     # Work around socket.create_connection() which tries all addresses from getaddrinfo() including IPv6.
     # This filters the addresses based on the given source_address.
     # Based on: https://github.com/python/cpython/blob/main/Lib/socket.py#L810
     host, port = address
-    ip_addrs = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    with trace_phase('dns'):
+        ip_addrs = dns_cache.getaddrinfo(host, port, resolve)
     if not ip_addrs:
         raise OSError('getaddrinfo returns an empty list')
     if source_address is not None:
@@ -254,20 +579,13 @@ def create_connection(
                 f'No remote IPv{4 if af == socket.AF_INET else 6} addresses available for connect. '
                 f'Can\'t use "{source_address[0]}" as source address')
 
-    err = None
-    for ip_addr in ip_addrs:
-        try:
-            sock = _create_socket_func(ip_addr, timeout, source_address)
-            # Explicitly break __traceback__ reference cycle
-            # https://bugs.python.org/issue36820
-            err = None
-            return sock
-        except OSError as e:
-            err = e
-
     try:
-        raise err
-    finally:
-        # Explicitly break __traceback__ reference cycle
-        # https://bugs.python.org/issue36820
-        err = None
+        with trace_phase('connect'):
+            if len(ip_addrs) == 1:
+                return _create_socket_func(ip_addrs[0], timeout, source_address)
+            return _race_connections(
+                _interleave_address_families(ip_addrs), timeout, source_address, _create_socket_func)
+    except OSError:
+        # The cached addresses may be outdated
+        dns_cache.remove(host, port)
+        raise
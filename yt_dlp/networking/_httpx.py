@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import io
+import re
+import time
+import urllib.parse
+
+from ..dependencies import brotli, httpx, h2
+from ..utils import int_or_none
+
+if httpx is None:
+    raise ImportError('httpx module is not installed')
+
+if h2 is None:
+    raise ImportError('h2 module is not installed')
+
+httpx_version = tuple(map(int, re.split(r'[^\d]+', httpx.__version__)[:2]))
+
+if httpx_version < (0, 28):
+    httpx._yt_dlp__version = f'{httpx.__version__} (unsupported)'
+    raise ImportError('Only httpx >= 0.28 is supported')
+
+import httpcore
+
+from ._helper import InstanceStoreMixin, add_accept_encoding_header, current_trace, get_redirect_method
+from .common import (
+    Features,
+    RequestHandler,
+    Response,
+    register_preference,
+    register_rh,
+)
+from .exceptions import (
+    CertificateVerifyError,
+    HTTPError,
+    IncompleteRead,
+    ProxyError,
+    RequestError,
+    SSLError,
+    TransportError,
+)
+from ..utils.networking import normalize_url, select_proxy
+
+SUPPORTED_ENCODINGS = [
+    'gzip', 'deflate',
+]
+
+if brotli is not None:
+    SUPPORTED_ENCODINGS.append('br')
+
+# Same as the default of requests
+MAX_REDIRECTS = 30
+
+
+def _map_httpx_error(e):
+    if isinstance(e, httpx.ProxyError):
+        return ProxyError(cause=e)
+    if isinstance(e, httpx.ConnectError) and 'CERTIFICATE_VERIFY_FAILED' in str(e):
+        return CertificateVerifyError(cause=e)
+    if isinstance(e, httpx.ConnectError) and 'SSL' in str(e):
+        return SSLError(cause=e)
+    if isinstance(e, httpx.TransportError):
+        return TransportError(cause=e)
+    return RequestError(cause=e)
+
+
+def _make_trace_extension(trace):
+    """
+    Make a function for the trace extension of httpcore that records the connection phases in a RequestTrace.
+    The TLS handshake is recorded by the SSL context
+    """
+    started = {}
+
+    def trace_extension(event_name, info):
+        # httpcore resolves the host and connects in one step
+        if event_name == 'connection.connect_tcp.started':
+            started['connect'] = time.perf_counter()
+        elif event_name in ('connection.connect_tcp.complete', 'connection.connect_tcp.failed'):
+            trace.add_span('connect', started.pop('connect', time.perf_counter()), time.perf_counter())
+
+    return trace_extension
+
+
+class SourceAddressBackend(httpcore.SyncBackend):
+    """Network backend that binds all connections to the given local address"""
+
+    def __init__(self, source_address):
+        self._source_address = source_address
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        return super().connect_tcp(host, port, timeout, local_address or self._source_address, socket_options)
+
+
+class HTTPXTransport(httpx.HTTPTransport):
+    """
+    HTTP/2 enabled transport, optionally through an http or https proxy.
+
+    httpx and httpcore do not bind connections to a proxy to the local address,
+    so the proxy pool is created here with a network backend that does.
+    The base class is not initialized, since it would create a pool without the proxy.
+    """
+
+    def __init__(self, ssl_context, proxy=None, proxy_ssl_context=None, local_address=None):
+        limits = {'max_connections': 100, 'max_keepalive_connections': 20, 'keepalive_expiry': 5.0}
+        if proxy is None:
+            self._pool = httpcore.ConnectionPool(
+                ssl_context=ssl_context, http2=True, local_address=local_address, **limits)
+            return
+        proxy = httpx.Proxy(proxy)
+        self._pool = httpcore.HTTPProxy(
+            proxy_url=httpcore.URL(
+                scheme=proxy.url.raw_scheme, host=proxy.url.raw_host,
+                port=proxy.url.port, target=proxy.url.raw_path),
+            proxy_auth=proxy.raw_auth,
+            proxy_headers=proxy.headers.raw,
+            ssl_context=ssl_context,
+            proxy_ssl_context=proxy_ssl_context,
+            http2=True,
+            network_backend=local_address and SourceAddressBackend(local_address),
+            **limits)
+
+
+class HTTPXResponseReader(io.IOBase):
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self._iterator = response.iter_bytes()
+        self._buffer = bytearray()
+
+    def readable(self):
+        return True
+
+    def read(self, size=None):
+        while self._iterator and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = next(self._iterator, None)
+            if chunk is None:
+                self._iterator = None
+                break
+            self._buffer += chunk
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        if not self._iterator and not self._buffer:
+            self.close()
+        return data
+
+    def close(self):
+        if not self.closed:
+            self._response.close()
+            self._buffer.clear()
+        super().close()
+
+
+class HTTPXResponseAdapter(Response):
+    fp: HTTPXResponseReader
+
+    def __init__(self, response: httpx.Response, release_client=None):
+        super().__init__(
+            fp=HTTPXResponseReader(response), headers={}, url=str(response.url),
+            status=response.status_code, reason=response.reason_phrase,
+            extensions={'http_version': response.http_version})
+        for name, value in response.headers.multi_items():
+            self.headers.add_header(name, value)
+        self._httpx_response = response
+        self._release_client = release_client
+
+    def close(self):
+        super().close()
+        if self._release_client:
+            self._release_client()
+
+    def read(self, amt=None):
+        try:
+            data = self.fp.read(amt)
+            if self.fp.closed:
+                self.close()
+            return data
+        except httpx.RemoteProtocolError as e:
+            self.fp.close()
+            content_length = int_or_none(self._httpx_response.headers.get('Content-Length'))
+            if content_length is not None:
+                partial = self._httpx_response.num_bytes_downloaded
+                raise IncompleteRead(partial=partial, expected=content_length - partial, cause=e) from e
+            raise TransportError(cause=e) from e
+        except httpx.HTTPError as e:
+            self.fp.close()
+            raise _map_httpx_error(e) from e
+
+
+@register_rh
+class HTTPXRH(RequestHandler, InstanceStoreMixin):
+
+    """HTTPX RequestHandler
+    https://github.com/encode/httpx
+
+    Negotiates HTTP/2 with ALPN on https connections and falls back to HTTP/1.1.
+    Concurrent requests to the same origin, e.g. of concurrent fragment downloads,
+    are multiplexed as streams over a single HTTP/2 connection.
+    """
+    _SUPPORTED_URL_SCHEMES = ('http', 'https')
+    _SUPPORTED_ENCODINGS = tuple(SUPPORTED_ENCODINGS)
+    _SUPPORTED_PROXY_SCHEMES = ('http', 'https')
+    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
+    RH_NAME = 'httpx'
+
+    def close(self):
+        self._clear_instances()
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        extensions.pop('legacy_ssl', None)
+
+    def _create_instance(self, cookiejar, proxy=None, legacy_ssl_support=None):
+        proxy_ssl_context = None
+        if proxy and urllib.parse.urlparse(proxy).scheme.lower() == 'https':
+            proxy_ssl_context = self._make_sslcontext(legacy_ssl_support=legacy_ssl_support)
+        # httpx sets the ALPN protocols of the contexts for each connection, so they must be distinct
+        transport = HTTPXTransport(
+            ssl_context=self._make_sslcontext(legacy_ssl_support=legacy_ssl_support, alpn_protocols=('http/1.1', 'h2')),
+            proxy=proxy,
+            proxy_ssl_context=proxy_ssl_context,
+            local_address=self.source_address,
+        )
+        return httpx.Client(transport=transport, cookies=cookiejar, trust_env=False)
+
+    def _prepare_headers(self, _, headers):
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+        # Connection management is up to httpx, and the header is not allowed with HTTP/2
+        headers.pop('Connection', None)
+
+    def _send(self, request):
+        headers = self._get_headers(request)
+        proxies = self._get_proxies(request)
+        timeout = httpx.Timeout(self._calculate_timeout(request))
+        cookiejar = self._get_cookiejar(request)
+        legacy_ssl_support = request.extensions.get('legacy_ssl')
+        method, url, data = request.method, request.url, request.data
+
+        extensions = {'timeout': timeout.as_dict()}
+        trace = current_trace.get()
+        if trace is not None:
+            extensions['trace'] = _make_trace_extension(trace)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            # Closing a client also closes the connections of responses that are still being read
+            client, release_client = self._get_held_instance(
+                cookiejar=cookiejar, proxy=select_proxy(url, proxies), legacy_ssl_support=legacy_ssl_support)
+            httpx_request = httpx.Request(method, url, headers=headers, content=data, extensions=extensions)
+            client.cookies.set_cookie_header(httpx_request)
+            try:
+                httpx_response = client.send(httpx_request, stream=True, follow_redirects=False)
+            except httpx.HTTPError as e:
+                release_client()
+                raise _map_httpx_error(e) from e
+            except BaseException:
+                release_client()
+                raise
+
+            location = httpx_response.headers.get('Location')
+            if httpx_response.status_code not in (301, 302, 303, 307, 308) or not location:
+                break
+            httpx_response.close()
+            release_client()
+
+            # See RedirectHandler in _urllib.py
+            new_url = normalize_url(urllib.parse.urljoin(url, location))
+            new_method = get_redirect_method(method, httpx_response.status_code)
+            remove_headers = {'cookie'}
+            if new_method != method:
+                data = None
+                remove_headers.update(('content-length', 'content-type'))
+            if urllib.parse.urlparse(new_url).hostname != urllib.parse.urlparse(url).hostname:
+                remove_headers.add('authorization')
+            headers = {k: v for k, v in headers.items() if k.lower() not in remove_headers}
+            method, url = new_method, new_url
+        else:
+            raise HTTPError(HTTPXResponseAdapter(httpx_response, release_client), redirect_loop=True)
+
+        res = HTTPXResponseAdapter(httpx_response, release_client)
+        if not 200 <= res.status < 300:
+            raise HTTPError(res)
+
+        return res
+
+
+@register_preference(HTTPXRH)
+def httpx_preference(rh, request):
+    # Only used when no other handler supports the request, unless preferred with prefer_http2
+    return -50
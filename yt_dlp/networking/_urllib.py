@@ -37,7 +37,7 @@
     SSLError,
     TransportError,
 )
-from ..dependencies import brotli
+from ..dependencies import brotli, zstd
 from ..socks import ProxyError as SocksProxyError
 from ..utils import update_url_query
 from ..utils.networking import normalize_url, select_proxy
@@ -49,12 +49,188 @@
     SUPPORTED_ENCODINGS.append('br')
     CONTENT_DECODE_ERRORS.append(brotli.error)
 
+if zstd:
+    SUPPORTED_ENCODINGS.append('zstd')
+    CONTENT_DECODE_ERRORS.append(zstd.ZstdError)
 
-def _create_http_connection(http_class, source_address, *args, **kwargs):
+
+class _ZlibDecoder:
+    def __init__(self, wbits=zlib.MAX_WBITS):
+        self._obj = zlib.decompressobj(wbits)
+        self._started = False
+
+    @property
+    def eof(self):
+        return self._obj.eof
+
+    def decompress(self, data):
+        self._started = True
+        return self._obj.decompress(data)
+
+    def flush(self):
+        # An empty body is passed through as is
+        if self._started and not self._obj.eof:
+            raise zlib.error('incomplete or truncated stream')
+        return self._obj.flush()
+
+
+class _DeflateDecoder(_ZlibDecoder):
+    # deflate should be zlib-wrapped (RFC 9110, 8.4.1.2), but some servers send raw deflate data.
+    # Raw deflate is tried first, and the data is kept until it has produced output to retry as zlib-wrapped
+    def __init__(self):
+        super().__init__(-zlib.MAX_WBITS)
+        self._pending = b''
+
+    def decompress(self, data):
+        if self._pending is None:
+            return super().decompress(data)
+        self._pending += data
+        try:
+            decoded = super().decompress(data)
+        except zlib.error:
+            self._obj = zlib.decompressobj()
+            decoded = super().decompress(self._pending)
+            self._pending = None
+            return decoded
+        if decoded:
+            self._pending = None
+        return decoded
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+        self._started = False
+
+    @property
+    def eof(self):
+        # Not supported by older versions of brotli
+        is_finished = getattr(self._obj, 'is_finished', None)
+        return bool(is_finished and is_finished())
+
+    def decompress(self, data):
+        self._started = True
+        # brotli has process() and brotlicffi has decompress()
+        return (getattr(self._obj, 'process', None) or self._obj.decompress)(data)
+
+    def flush(self):
+        if self._started and hasattr(self._obj, 'is_finished') and not self._obj.is_finished():
+            raise brotli.error('incomplete or truncated stream')
+        return b''
+
+
+class _ZstdDecoder:
+    # The content may consist of several frames, which are decoded in turn
+    eof = False
+
+    def __init__(self):
+        self._obj = self._make_decompressor()
+        self._started = False
+
+    @staticmethod
+    def _make_decompressor():
+        # zstandard has the decompressobj() interface; compression.zstd is like it
+        decompressor = zstd.ZstdDecompressor()
+        return decompressor.decompressobj() if hasattr(decompressor, 'decompressobj') else decompressor
+
+    def decompress(self, data):
+        self._started = True
+        parts = [self._obj.decompress(data)]
+        while self._obj.eof and self._obj.unused_data:
+            unused_data = self._obj.unused_data
+            self._obj = self._make_decompressor()
+            parts.append(self._obj.decompress(unused_data))
+        return b''.join(parts)
+
+    def flush(self):
+        if self._started and not self._obj.eof:
+            raise zstd.ZstdError('incomplete or truncated stream')
+        return b''
+
+
+_DECODERS = {
+    'gzip': functools.partial(_ZlibDecoder, zlib.MAX_WBITS | 16),
+    'deflate': _DeflateDecoder,
+    **({'br': _BrotliDecoder} if brotli else {}),
+    **({'zstd': _ZstdDecoder} if zstd else {}),
+}
+
+
+class _DecodingReader(io.RawIOBase):
+    """
+    Reads the content of a response through a decoder as it is read, instead of holding the whole response
+    in memory. Closes itself and the response once the content is fully read
+    """
+    _CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fp, decoder):
+        self._fp = fp
+        # read() of a response waits until the given size has been received
+        self._read = getattr(fp, 'read1', fp.read)
+        self._decoder = decoder
+        self._buffer = b''
+        self._offset = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        # A decoder may need more input before it produces any output
+        while self._offset >= len(self._buffer) and not self._eof:
+            data = self._read(self._CHUNK_SIZE)
+            if data:
+                self._buffer = self._decoder.decompress(data)
+                # Anything after the end of the content is ignored, e.g. junk after a gzip payload
+                self._eof = self._decoder.eof
+            else:
+                self._buffer = self._decoder.flush()
+                self._eof = True
+            self._offset = 0
+
+    def read1(self, size=-1):
+        """Read up to `size` bytes of the content, decoding at most one chunk of the response"""
+        if self.closed or size == 0:
+            return b''
+        self._fill()
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        if self._eof and self._offset >= len(self._buffer):
+            self.close()
+        return data
+
+    def read(self, size=-1):
+        remaining = -1 if size is None or size < 0 else size
+        parts = []
+        while remaining:
+            data = self.read1(remaining)
+            if not data:
+                break
+            parts.append(data)
+            if remaining > 0:
+                remaining -= len(data)
+        return b''.join(parts)
+
+    def readinto(self, b):
+        with memoryview(b) as view, view.cast('B') as view:
+            data = self.read(len(view))
+            view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._buffer = b''
+            self._fp.close()
+        super().close()
+
+
+def _create_http_connection(http_class, source_address, resolve, *args, **kwargs):
     hc = http_class(*args, **kwargs)
 
     if hasattr(hc, '_create_connection'):
-        hc._create_connection = create_connection
+        hc._create_connection = functools.partial(create_connection, resolve=resolve)
 
     if source_address is not None:
         hc.source_address = (source_address, 0)
@@ -66,8 +242,8 @@ class HTTPHandler(urllib.request.AbstractHTTPHandler):
     """Handler for HTTP requests and responses.
 
     This class, when installed with an OpenerDirector, automatically adds
-    the standard headers to every HTTP request and handles gzipped, deflated and
-    brotli responses from web servers.
+    the standard headers to every HTTP request and handles gzipped, deflated,
+    brotli and zstd responses from web servers.
 
     Part of this code was copied from:
 
@@ -77,29 +253,29 @@ class HTTPHandler(urllib.request.AbstractHTTPHandler):
     public domain.
     """
 
-    def __init__(self, context=None, source_address=None, *args, **kwargs):
+    def __init__(self, context=None, source_address=None, resolve=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._source_address = source_address
+        self._resolve = resolve
         self._context = context
 
-    @staticmethod
-    def _make_conn_class(base, req):
+    def _make_conn_class(self, base, req):
         conn_class = base
         socks_proxy = req.headers.pop('Ytdl-socks-proxy', None)
         if socks_proxy:
-            conn_class = make_socks_conn_class(conn_class, socks_proxy)
+            conn_class = make_socks_conn_class(conn_class, socks_proxy, self._resolve)
         return conn_class
 
     def http_open(self, req):
         conn_class = self._make_conn_class(http.client.HTTPConnection, req)
         return self.do_open(functools.partial(
-            _create_http_connection, conn_class, self._source_address), req)
+            _create_http_connection, conn_class, self._source_address, self._resolve), req)
 
     def https_open(self, req):
         conn_class = self._make_conn_class(http.client.HTTPSConnection, req)
         return self.do_open(
             functools.partial(
-                _create_http_connection, conn_class, self._source_address),
+                _create_http_connection, conn_class, self._source_address, self._resolve),
             req, context=self._context)
 
     @staticmethod
@@ -147,19 +323,15 @@ def http_response(self, req, resp):
         old_resp = resp
 
         # Content-Encoding header lists the encodings in order that they were applied [1].
-        # To decompress, we simply do the reverse.
+        # To decompress, we simply do the reverse, decoding the content as it is read.
         # [1]: https://datatracker.ietf.org/doc/html/rfc9110#name-content-encoding
         decoded_response = None
         for encoding in (e.strip() for e in reversed(resp.headers.get('Content-encoding', '').split(','))):
-            if encoding == 'gzip':
-                decoded_response = self.gz(decoded_response or resp.read())
-            elif encoding == 'deflate':
-                decoded_response = self.deflate(decoded_response or resp.read())
-            elif encoding == 'br' and brotli:
-                decoded_response = self.brotli(decoded_response or resp.read())
+            if encoding in _DECODERS:
+                decoded_response = _DecodingReader(decoded_response or resp, _DECODERS[encoding]())
 
         if decoded_response is not None:
-            resp = urllib.request.addinfourl(io.BytesIO(decoded_response), old_resp.headers, old_resp.url, old_resp.code)
+            resp = urllib.request.addinfourl(decoded_response, old_resp.headers, old_resp.url, old_resp.code)
             resp.msg = old_resp.msg
         # Percent-encode redirect URL of Location HTTP header to satisfy RFC 3986 (see
         # https://github.com/ytdl-org/youtube-dl/issues/6457).
@@ -178,7 +350,7 @@ def http_response(self, req, resp):
     https_response = http_response
 
 
-def make_socks_conn_class(base_class, socks_proxy):
+def make_socks_conn_class(base_class, socks_proxy, resolve=None):
     assert issubclass(base_class, (
         http.client.HTTPConnection, http.client.HTTPSConnection))
 
@@ -192,6 +364,7 @@ def connect(self):
                 (proxy_args['addr'], proxy_args['port']),
                 timeout=self.timeout,
                 source_address=self.source_address,
+                resolve=resolve,
                 _create_socket_func=functools.partial(
                     create_socks_proxy_socket, (self.host, self.port), proxy_args))
             if isinstance(self, http.client.HTTPSConnection):
@@ -309,28 +482,45 @@ def read(self, amt=None):
             return b''
         try:
             data = self.fp.read(amt)
-            underlying = getattr(self.fp, 'fp', None)
-            if isinstance(self.fp, http.client.HTTPResponse) and underlying is None:
-                # http.client.HTTPResponse automatically closes itself when fully read
-                self.close()
-            elif isinstance(self.fp, urllib.response.addinfourl) and underlying is not None:
-                # urllib's addinfourl does not close the underlying fp automatically when fully read
-                if isinstance(underlying, io.BytesIO):
-                    # data URLs or in-memory responses (e.g. gzip/deflate/brotli decoded)
-                    if underlying.tell() >= len(underlying.getbuffer()):
-                        self.close()
-                elif isinstance(underlying, io.BufferedReader) and amt is None:
-                    # file URLs.
-                    # XXX: this will not mark the response as closed if it was fully read with amt.
-                    self.close()
-            elif underlying is not None and underlying.closed:
-                # Catch-all for any cases where underlying file is closed
-                self.close()
+            self._close_if_exhausted(amt)
             return data
         except Exception as e:
             handle_response_read_exceptions(e)
             raise e
 
+    def readinto(self, b):
+        if self.closed:
+            return 0
+        try:
+            n = self.fp.readinto(b)
+            self._close_if_exhausted(len(b))
+            return n
+        except Exception as e:
+            handle_response_read_exceptions(e)
+            raise e
+
+    def _close_if_exhausted(self, amt):
+        underlying = getattr(self.fp, 'fp', None)
+        if isinstance(self.fp, http.client.HTTPResponse) and underlying is None:
+            # http.client.HTTPResponse automatically closes itself when fully read
+            self.close()
+        elif isinstance(self.fp, urllib.response.addinfourl) and underlying is not None:
+            # urllib's addinfourl does not close the underlying fp automatically when fully read
+            if isinstance(underlying, io.BytesIO):
+                # data URLs or in-memory responses (e.g. gzip/deflate/brotli decoded)
+                if underlying.tell() >= len(underlying.getbuffer()):
+                    self.close()
+            elif isinstance(underlying, io.BufferedReader) and amt is None:
+                # file URLs.
+                # XXX: this will not mark the response as closed if it was fully read with amt.
+                self.close()
+            elif underlying.closed:
+                # e.g. decoded responses, which close themselves when fully read
+                self.close()
+        elif underlying is not None and underlying.closed:
+            # Catch-all for any cases where underlying file is closed
+            self.close()
+
 
 def handle_sslerror(e: ssl.SSLError):
     if not isinstance(e, ssl.SSLError):
@@ -354,7 +544,7 @@ def handle_response_read_exceptions(e):
 class UrllibRH(RequestHandler, InstanceStoreMixin):
     _SUPPORTED_URL_SCHEMES = ('http', 'https', 'data', 'ftp')
     _SUPPORTED_PROXY_SCHEMES = ('http', 'socks4', 'socks4a', 'socks5', 'socks5h')
-    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
+    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY, Features.RESOLVE)
     RH_NAME = 'urllib'
 
     def __init__(self, *, enable_file_urls: bool = False, **kwargs):
@@ -376,7 +566,8 @@ def _create_instance(self, proxies, cookiejar, legacy_ssl_support=None):
             HTTPHandler(
                 debuglevel=int(bool(self.verbose)),
                 context=self._make_sslcontext(legacy_ssl_support=legacy_ssl_support),
-                source_address=self.source_address),
+                source_address=self.source_address,
+                resolve=self.resolve),
             HTTPCookieProcessor(cookiejar),
             DataHandler(),
             UnknownHandler(),
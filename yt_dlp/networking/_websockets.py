@@ -97,7 +97,7 @@ class WebsocketsRH(WebSocketRequestHandler):
     """
     _SUPPORTED_URL_SCHEMES = ('wss', 'ws')
     _SUPPORTED_PROXY_SCHEMES = ('socks4', 'socks4a', 'socks5', 'socks5h')
-    _SUPPORTED_FEATURES = (Features.ALL_PROXY, Features.NO_PROXY)
+    _SUPPORTED_FEATURES = (Features.ALL_PROXY, Features.NO_PROXY, Features.RESOLVE)
     RH_NAME = 'websockets'
 
     def __init__(self, *args, **kwargs):
@@ -139,6 +139,7 @@ def _send(self, request):
         create_conn_kwargs = {
             'source_address': (self.source_address, 0) if self.source_address else None,
             'timeout': timeout,
+            'resolve': self.resolve,
         }
         proxy = select_proxy(request.url, self._get_proxies(request))
         try:
@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+
+from .common import Request, Response
+from .exceptions import HTTPError
+from ..utils import int_or_none, timeconvert
+from ..utils.networking import select_proxy
+
+# Status codes whose responses are stored. See https://www.rfc-editor.org/rfc/rfc9110#section-15.1
+_CACHEABLE_STATUSES = (200, 203)
+_UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+_CACHE_CONTROL_RE = re.compile(r'([\w-]+)(?:\s*=\s*(?:"([^"]*)"|([^\s,]*)))?')
+# Headers of a 304 response that must not replace the stored ones
+# See https://www.rfc-editor.org/rfc/rfc9111#section-3.2
+_NOT_UPDATED_HEADERS = frozenset(('content-length', 'content-encoding', 'transfer-encoding'))
+
+
+def parse_cache_control(value):
+    """Parse a Cache-Control header into a dict of lowercase directives and their values (None if valueless)"""
+    return {
+        mobj.group(1).lower(): mobj.group(2) if mobj.group(2) is not None else (mobj.group(3) or None)
+        for mobj in _CACHE_CONTROL_RE.finditer(value or '')
+    }
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    url: str
+    status: int
+    reason: str | None
+    headers: list[tuple[str, str]]
+    body: bytes
+    # Values of the request headers named by Vary
+    vary: dict[str, str | None]
+    response_time: float
+    # Forced freshness lifetime, in seconds
+    ttl: float | None = None
+    # The response may differ depending on the proxy and impersonate target it was fetched with
+    proxy: str | None = None
+    impersonate: str | None = None
+    # Whether the request had credentials or cookies, or the response set cookies
+    authenticated: bool = False
+    # Digest of the credentials and cookies of the request, if it had any
+    identity: str | None = None
+
+    @property
+    def key(self):
+        return self.url, self.proxy, self.impersonate, self.identity
+
+    def get_header(self, name, default=None):
+        name = name.lower()
+        return next((value for key, value in self.headers if key.lower() == name), default)
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(key) + len(value) for key, value in self.headers)
+
+    @property
+    def age(self):
+        """Current age of the response. See https://www.rfc-editor.org/rfc/rfc9111#section-4.2.3"""
+        return (int_or_none(self.get_header('Age')) or 0) + max(0, time.time() - self.response_time)
+
+    @property
+    def freshness_lifetime(self):
+        """See https://www.rfc-editor.org/rfc/rfc9111#section-4.2.1"""
+        if self.ttl is not None:
+            return self.ttl
+        directives = parse_cache_control(self.get_header('Cache-Control'))
+        if 'no-cache' in directives:
+            return 0
+        max_age = int_or_none(directives.get('max-age'))
+        if max_age is not None:
+            return max_age
+        date = timeconvert(self.get_header('Date')) or self.response_time
+        expires = self.get_header('Expires')
+        if expires is not None:
+            # Invalid dates, e.g. "0", mean that the response has already expired
+            return max(0, (timeconvert(expires) or date) - date)
+        last_modified = timeconvert(self.get_header('Last-Modified'))
+        if last_modified is not None:
+            # Heuristic freshness. See https://www.rfc-editor.org/rfc/rfc9111#section-4.2.2
+            return max(0, (date - last_modified) / 10)
+        return 0
+
+    @property
+    def has_validators(self):
+        return self.get_header('ETag') is not None or self.get_header('Last-Modified') is not None
+
+    def to_response(self):
+        response = Response(io.BytesIO(self.body), self.url, {}, self.status, self.reason, {'cached': True})
+        for name, value in self.headers:
+            if name.lower() != 'age':
+                response.headers.add_header(name, value)
+        response.headers.add_header('Age', str(int(self.age)))
+        return response
+
+
+class _RecordingResponse(Response):
+    """Response that passes reads through to the actual response and stores the body once it is fully read"""
+
+    def __init__(self, response, on_complete, max_size):
+        super().__init__(response, response.url, {}, response.status, response.reason, response.extensions)
+        self.headers = response.headers
+        self._on_complete = on_complete
+        self._max_size = max_size
+        self._buffer = io.BytesIO()
+
+    def read(self, amt=None):
+        data = self.fp.read(amt)
+        if self._buffer is not None:
+            self._buffer.write(data)
+            if self._buffer.tell() > self._max_size:
+                self._buffer = None
+            elif amt is None or amt < 0 or (amt and not data):
+                self._on_complete(self._buffer.getvalue())
+                self._buffer = None
+        if self.fp.closed:
+            self.close()
+        return data
+
+    def close(self):
+        self._buffer = None
+        return super().close()
+
+
+class ResponseCache:
+    """
+    HTTP cache of responses in memory, with an optional disk tier
+
+    Implements the parts of RFC 9111 relevant to a private cache: freshness from
+    Cache-Control/Expires/Last-Modified, Vary and conditional revalidation with ETag/Last-Modified.
+    Only GET requests without a Range header are cached, and only bodies that are fully read.
+
+    Responses are cached separately for each proxy and impersonate target they are fetched with.
+
+    @param cookiejar: Cookiejar used by the request handlers, to detect cookie-bearing requests.
+    @param proxies: Proxies used by the request handlers, for requests without their own.
+    @param impersonate: Impersonate target used by the request handlers, for requests without their own.
+    @param cache_dir: Directory of the disk tier. None to only cache in memory.
+    @param max_size: Maximum total size of the responses kept in memory, in bytes.
+    @param max_disk_size: Maximum total size of the disk tier, in bytes.
+                          The least recently used responses are removed from it past this size.
+    @param max_entry_size: Maximum size of a single response, in bytes.
+    @param cache_authenticated: Whether to also cache responses to requests with credentials or cookies,
+                                and responses that set cookies. They are only kept in memory, unless this is 'disk'.
+    @param logger: Logger instance, for debug messages when verbose.
+    @param verbose: Print debug cache information to stdout.
+    """
+
+    def __init__(self, *, cookiejar=None, proxies=None, impersonate=None, cache_dir=None, max_size=64 * 1024 * 1024,
+                 max_disk_size=256 * 1024 * 1024, max_entry_size=4 * 1024 * 1024, cache_authenticated=False,
+                 logger=None, verbose=False):
+        self.cookiejar = cookiejar
+        self.proxies = proxies or {}
+        self.impersonate = impersonate
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self.max_entry_size = max_entry_size
+        self.cache_authenticated = cache_authenticated
+        self.logger = logger
+        self.verbose = verbose
+        self._entries: collections.OrderedDict[tuple, CacheEntry] = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Total size of the disk tier, if known. Other processes may also write to it, so it is recounted when pruning
+        self._disk_size = None
+        self._disk_lock = threading.Lock()
+
+    def _print_verbose(self, msg):
+        if self.verbose and self.logger:
+            self.logger.stdout(f'cache: {msg}')
+
+    def _get_identity(self, request):
+        """Digest of the credentials and cookies that a request is sent with, or None if it has none"""
+        cookiejar = request.extensions.get('cookiejar')
+        if cookiejar is None:
+            cookiejar = self.cookiejar
+        cookies = sorted(
+            (cookie.domain, cookie.path, cookie.name, cookie.value)
+            for cookie in (cookiejar.get_cookies_for_url(request.url) if cookiejar is not None else ()))
+        credentials = [request.headers.get('Authorization'), request.headers.get('Cookie')]
+        if not cookies and credentials == [None, None]:
+            return None
+        return hashlib.sha256(json.dumps([credentials, cookies]).encode()).hexdigest()
+
+    def _cache_key(self, request):
+        """Key of the responses to a request. Responses to requests with credentials or cookies are only
+        served to requests with the same ones"""
+        impersonate = request.extensions.get('impersonate') or self.impersonate
+        return (
+            request.url, select_proxy(request.url, request.proxies or self.proxies),
+            None if impersonate is None else str(impersonate), self._get_identity(request))
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{hashlib.sha256(json.dumps(key).encode()).hexdigest()}.bin')
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        with contextlib.suppress(OSError, ValueError, TypeError), open(path, 'rb') as f:
+            entry = CacheEntry(**json.loads(f.readline()), body=f.read())
+            entry.headers = list(map(tuple, entry.headers))
+            if entry.key == key:
+                # The modification time orders the disk tier by last use
+                os.utime(path)
+                self._store_in_memory(entry)
+                return entry
+        return None
+
+    def _store_in_memory(self, entry):
+        with self._lock:
+            old = self._entries.pop(entry.key, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[entry.key] = entry
+            self._size += entry.size
+            while self._size > self.max_size:
+                _, old = self._entries.popitem(last=False)
+                self._size -= old.size
+
+    def _store(self, entry):
+        self._store_in_memory(entry)
+        if not self.cache_dir or (entry.authenticated and self.cache_authenticated != 'disk'):
+            return
+        path = self._disk_path(entry.key)
+        metadata = dataclasses.asdict(dataclasses.replace(entry, body=b''))
+        metadata.pop('body')
+        data = json.dumps(metadata).encode() + b'\n' + entry.body
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f'{path}.part', 'wb') as f:
+                f.write(data)
+            os.replace(f'{path}.part', path)
+        except OSError as e:
+            self._print_verbose(f'Unable to write {entry.url} to {path}: {e}')
+            return
+        with self._disk_lock:
+            if self._disk_size is not None:
+                self._disk_size += len(data)
+            if self._disk_size is None or self._disk_size > self.max_disk_size:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove the least recently used responses from the disk tier until it is within max_disk_size"""
+        files = []
+        with contextlib.suppress(OSError), os.scandir(self.cache_dir) as entries:
+            for dir_entry in entries:
+                if dir_entry.name.endswith('.bin'):
+                    with contextlib.suppress(OSError):
+                        stat = dir_entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        self._disk_size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self._disk_size <= self.max_disk_size:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                self._disk_size -= size
+
+    def remove(self, request):
+        """Remove the stored responses for the URL of a request"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == request.url]:
+                self._size -= self._entries.pop(key).size
+        if self.cache_dir:
+            with contextlib.suppress(OSError):
+                os.remove(self._disk_path(self._cache_key(request)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _is_storable(self, request, response, ttl):
+        """See https://www.rfc-editor.org/rfc/rfc9111#section-3"""
+        if response.status not in _CACHEABLE_STATUSES:
+            return False
+        directives = parse_cache_control(response.get_header('Cache-Control'))
+        if 'no-store' in directives or response.get_header('Vary', '').strip() == '*':
+            return False
+        if not self.cache_authenticated and response.get_header('Set-Cookie') is not None:
+            return False
+        if (int_or_none(response.get_header('Content-Length')) or 0) > self.max_entry_size:
+            return False
+        return bool(ttl or directives.keys() & {'max-age', 'no-cache'}
+                    or any(response.get_header(name) is not None for name in ('Expires', 'ETag', 'Last-Modified')))
+
+    def _record(self, request, response, ttl, key):
+        """@param key: Cache key of the request, from before it was sent"""
+        vary = [name.strip() for name in response.get_header('Vary', '').split(',') if name.strip()]
+        _, proxy, impersonate, identity = key
+        authenticated = identity is not None or response.get_header('Set-Cookie') is not None
+
+        def on_complete(body):
+            self._print_verbose(f'Storing {response.url} ({len(body)} bytes)')
+            self._store(CacheEntry(
+                url=request.url, status=response.status, reason=response.reason,
+                headers=list(response.headers.items()), body=body,
+                vary={name: request.headers.get(name) for name in vary},
+                response_time=time.time(), ttl=ttl, proxy=proxy, impersonate=impersonate,
+                authenticated=authenticated, identity=identity))
+
+        return _RecordingResponse(response, on_complete, self.max_entry_size)
+
+    def send(self, request: Request, send, ttl=None) -> Response:
+        """
+        Get the response to a request, from the cache if possible
+
+        @param request: Request to get the response of.
+        @param send: Function that sends a request over the network, e.g. RequestDirector._send.
+        @param ttl: Freshness lifetime of the stored response in seconds, overriding that of the response headers.
+        """
+        if request.method in _UNSAFE_METHODS:
+            # See https://www.rfc-editor.org/rfc/rfc9111#section-4.4
+            self.remove(request)
+        if (request.method != 'GET' or request.data is not None
+                or any(name in request.headers for name in ('Range', 'If-None-Match', 'If-Modified-Since'))):
+            return send(request)
+        key = self._cache_key(request)
+        if not self.cache_authenticated and key[3] is not None:
+            return send(request)
+
+        directives = parse_cache_control(request.headers.get('Cache-Control'))
+        if 'no-store' in directives:
+            return send(request)
+
+        entry = self._load(key)
+        if entry is not None and any(request.headers.get(name) != value for name, value in entry.vary.items()):
+            entry = None
+        if entry is None:
+            response = send(request)
+            return self._record(request, response, ttl, key) if self._is_storable(request, response, ttl) else response
+
+        lifetime = ttl if ttl is not None else entry.freshness_lifetime
+        if 'no-cache' not in directives and lifetime > entry.age:
+            self._print_verbose(f'Serving {request.url} from cache')
+            return entry.to_response()
+        if not entry.has_validators:
+            response = send(request)
+            return self._record(request, response, ttl, key) if self._is_storable(request, response, ttl) else response
+
+        conditional_request = request.copy()
+        etag, last_modified = entry.get_header('ETag'), entry.get_header('Last-Modified')
+        if etag is not None:
+            conditional_request.headers['If-None-Match'] = etag
+        if last_modified is not None:
+            conditional_request.headers['If-Modified-Since'] = last_modified
+        self._print_verbose(f'Revalidating {request.url}')
+        try:
+            response = send(conditional_request)
+        except HTTPError as e:
+            if e.status != 304:
+                raise
+            e.close()
+            # See https://www.rfc-editor.org/rfc/rfc9111#section-4.3.4
+            updated = {name.lower(): (name, value) for name, value in e.response.headers.items()
+                       if name.lower() not in _NOT_UPDATED_HEADERS}
+            entry = dataclasses.replace(
+                entry, response_time=time.time(), ttl=ttl if ttl is not None else entry.ttl,
+                headers=[(name, value) for name, value in entry.headers if name.lower() not in updated]
+                + list(updated.values()))
+            self._store(entry)
+            self._print_verbose(f'Serving revalidated {request.url} from cache')
+            return entry.to_response()
+        if response.status == 304:
+            response.close()
+            return entry.to_response()
+        return self._record(request, response, ttl, key) if self._is_storable(request, response, ttl) else response
@@ -14,7 +14,7 @@
 from http import HTTPStatus
 from types import NoneType
 
-from ._helper import make_ssl_context, wrap_request_errors
+from ._helper import current_proxy, current_trace, get_shared_ssl_context, wrap_request_errors
 from .exceptions import (
     NoSupportingHandlers,
     RequestError,
@@ -29,7 +29,7 @@
     error_to_str,
     update_url_query,
 )
-from ..utils.networking import HTTPHeaderDict, normalize_url
+from ..utils.networking import HTTPHeaderDict, normalize_url, select_proxy
 
 DEFAULT_TIMEOUT = 20
 
@@ -57,35 +57,96 @@ class RequestDirector:
     can be registered into the `preferences` set. These are used to sort handlers
     in order of preference.
 
+    Requests with the `cache` extension may be served from and stored in the response cache, if one is given.
+    The extension is either True, to follow the caching headers of the response, or the number of seconds
+    the response is considered fresh for. False or 0 bypasses the cache.
+    The extension is removed before the request is passed to a handler.
+
+    Requests sent to a handler are traced if a tracer is given. The `trace` extension of a request
+    is a dict of information about it, e.g. the extractor, that is added to its trace.
+    It is also removed before the request is passed to a handler.
+
+    Requests are retried and held for failing hosts according to the retry policy, if one is given.
+
+    The number of requests in flight to a host is limited by the limiter, if one is given.
+    The `priority` extension of a request orders it in the queue of the limiter; see networking.limiter.
+    It is also removed before the request is passed to a handler.
+
+    The handler order and the validation results are memoized per request shape; see _request_shape.
+    Preference functions and RequestHandler._validate must therefore only depend on the parts of the request in it.
+
     @param logger: Logger instance.
     @param verbose: Print debug request information to stdout.
+    @param cache: ResponseCache (from yt_dlp.networking.cache) to use for requests with the `cache` extension.
+    @param tracer: RequestTracer (from yt_dlp.networking.trace) to trace the requests sent to handlers with.
+    @param retry_policy: RetryPolicy (from yt_dlp.networking.retry) to send the requests to handlers with.
+    @param limiter: HostLimiter (from yt_dlp.networking.limiter) to limit the requests in flight to each host with.
     """
 
-    def __init__(self, logger, verbose=False):
+    _MAX_SELECTIONS = 256
+
+    def __init__(self, logger, verbose=False, cache=None, tracer=None, retry_policy=None, limiter=None):
         self.handlers: dict[str, RequestHandler] = {}
         self.preferences: set[Preference] = set()
         self.logger = logger  # TODO(Grub4k): default logger
         self.verbose = verbose
+        self.cache = cache
+        self.tracer = tracer
+        self.retry_policy = retry_policy
+        self.limiter = limiter
+        self._selections = {}
 
     def close(self):
         for handler in self.handlers.values():
             handler.close()
         self.handlers.clear()
+        self._selections.clear()
+        if self.cache is not None:
+            self.cache.clear()
 
     def add_handler(self, handler: RequestHandler):
         """Add a handler. If a handler of the same RH_KEY exists, it will overwrite it"""
         assert isinstance(handler, RequestHandler), 'handler must be a RequestHandler'
         self.handlers[handler.RH_KEY] = handler
 
+    @staticmethod
+    def _request_shape(request: Request):
+        """The parts of a request that the handler selection depends on"""
+        scheme, netloc = urllib.parse.urlsplit(request.url)[:2]
+        return (
+            scheme.lower(), netloc, request.method, frozenset(request.headers),
+            tuple(sorted(request.proxies.items())), tuple(sorted(request.extensions.items())))
+
+    def _get_selection(self, request: Request):
+        """
+        Get the handler preferences for a request, the handlers sorted by them,
+        and a dict of the validation results of the handlers: None if the
+        request is supported, or the UnsupportedRequest that was raised
+        """
+        handlers = tuple(self.handlers.values())
+        try:
+            key = (self._request_shape(request), handlers, frozenset(self.preferences))
+            selection = self._selections.get(key)
+        except TypeError:  # Unhashable extensions
+            key = selection = None
+        if selection is None:
+            preferences = {rh: sum(pref(rh, request) for pref in self.preferences) for rh in handlers}
+            selection = preferences, sorted(handlers, key=preferences.get, reverse=True), {}
+            if key is not None:
+                if len(self._selections) >= self._MAX_SELECTIONS:
+                    self._selections.clear()
+                self._selections[key] = selection
+        return selection
+
     def _get_handlers(self, request: Request) -> list[RequestHandler]:
         """Sorts handlers by preference, given a request"""
-        preferences = {
-            rh: sum(pref(rh, request) for pref in self.preferences)
-            for rh in self.handlers.values()
-        }
+        preferences, handlers, _ = self._get_selection(request)
+        self._print_preferences(preferences)
+        return handlers
+
+    def _print_preferences(self, preferences):
         self._print_verbose('Handler preferences for this request: {}'.format(', '.join(
             f'{rh.RH_NAME}={pref}' for rh, pref in preferences.items())))
-        return sorted(self.handlers.values(), key=preferences.get, reverse=True)
 
     def _print_verbose(self, msg):
         if self.verbose:
@@ -100,19 +161,48 @@ def send(self, request: Request) -> Response:
 
         assert isinstance(request, Request)
 
+        if request.extensions.keys() & {'cache', 'trace', 'priority'}:
+            request = request.copy()
+        cache = request.extensions.pop('cache', None)
+        tags = request.extensions.pop('trace', None)
+        priority = request.extensions.pop('priority', None)
+
+        send = self._send
+        if self.limiter is not None:
+            # The time spent in the queue is traced
+            send = functools.partial(self.limiter.send, send=send, priority=priority)
+        if self.tracer is not None:
+            send = functools.partial(self.tracer.send, send=send, tags=tags)
+        if self.retry_policy is not None:
+            # Each attempt is traced on its own
+            send = functools.partial(self.retry_policy.send, send=send)
+        if self.cache is not None and cache:
+            return self.cache.send(request, send, ttl=None if cache is True else cache)
+        return send(request)
+
+    def _send(self, request: Request) -> Response:
         unexpected_errors = []
         unsupported_errors = []
-        for handler in self._get_handlers(request):
+        preferences, handlers, validations = self._get_selection(request)
+        self._print_preferences(preferences)
+        for handler in handlers:
             self._print_verbose(f'Checking if "{handler.RH_NAME}" supports this request.')
-            try:
-                handler.validate(request)
-            except UnsupportedRequest as e:
+            if handler not in validations:
+                try:
+                    handler.validate(request)
+                    validations[handler] = None
+                except UnsupportedRequest as e:
+                    validations[handler] = e
+            if validations[handler] is not None:
                 self._print_verbose(
-                    f'"{handler.RH_NAME}" cannot handle this request (reason: {error_to_str(e)})')
-                unsupported_errors.append(e)
+                    f'"{handler.RH_NAME}" cannot handle this request (reason: {error_to_str(validations[handler])})')
+                unsupported_errors.append(validations[handler])
                 continue
 
             self._print_verbose(f'Sending request via "{handler.RH_NAME}"')
+            trace = current_trace.get()
+            if trace is not None:
+                trace.handler = handler.RH_NAME
             try:
                 response = handler.send(request)
             except RequestError:
@@ -144,6 +234,7 @@ def register_rh(handler):
 class Features(enum.Enum):
     ALL_PROXY = enum.auto()
     NO_PROXY = enum.auto()
+    RESOLVE = enum.auto()
 
 
 class RequestHandler(abc.ABC):
@@ -191,6 +282,8 @@ class RequestHandler(abc.ABC):
             dict with {client_certificate, client_certificate_key, client_certificate_password}
     @param verify: Verify SSL certificates
     @param legacy_ssl_support: Enable legacy SSL options such as legacy server connect and older cipher support.
+    @param resolve: Dict of lowercase hostnames to lists of IP addresses to connect to instead of resolving them.
+                    Requests to these hosts are only supported by handlers with the RESOLVE feature.
 
     Some configuration options may be available for individual Requests too. In this case,
     either the Request configuration option takes precedence or they are merged.
@@ -233,6 +326,7 @@ def __init__(
         client_cert: dict[str, str | None] | None = None,
         verify: bool = True,
         legacy_ssl_support: bool = False,
+        resolve: dict[str, list[str]] | None = None,
         **_,
     ):
 
@@ -247,13 +341,16 @@ def __init__(
         self._client_cert = client_cert or {}
         self.verify = verify
         self.legacy_ssl_support = legacy_ssl_support
+        self.resolve = resolve or {}
         super().__init__()
 
-    def _make_sslcontext(self, legacy_ssl_support=None):
-        return make_ssl_context(
+    def _make_sslcontext(self, legacy_ssl_support=None, alpn_protocols=('http/1.1',)):
+        return get_shared_ssl_context(
+            self.RH_KEY,
             verify=self.verify,
             legacy_support=legacy_ssl_support if legacy_ssl_support is not None else self.legacy_ssl_support,
             use_certifi=not self.prefer_system_certs,
+            alpn_protocols=alpn_protocols,
             **self._client_cert,
         )
 
@@ -337,9 +434,18 @@ def _check_extensions(self, extensions):
         assert isinstance(extensions.get('legacy_ssl'), (bool, NoneType))
         assert isinstance(extensions.get('keep_header_casing'), (bool, NoneType))
 
+    def _check_resolve(self, request: Request):
+        if (
+            self._SUPPORTED_FEATURES is not None
+            and Features.RESOLVE not in self._SUPPORTED_FEATURES
+            and (urllib.parse.urlparse(request.url).hostname or '').lower() in self.resolve
+        ):
+            raise UnsupportedRequest('Connecting to hosts at fixed addresses (resolve) is not supported')
+
     def _validate(self, request):
         self._check_url_scheme(request)
         self._check_proxies(request.proxies or self.proxies)
+        self._check_resolve(request)
         extensions = request.extensions.copy()
         self._check_extensions(extensions)
         if extensions:
@@ -356,7 +462,15 @@ def validate(self, request: Request):
     def send(self, request: Request) -> Response:
         if not isinstance(request, Request):
             raise TypeError('Expected an instance of Request')
-        return self._send(request)
+        # URLs without a host, e.g. file:// URLs, are not sent through proxies
+        proxy = None
+        if urllib.parse.urlsplit(request.url).hostname:
+            proxy = select_proxy(request.url, self._get_proxies(request))
+        token = current_proxy.set(proxy)
+        try:
+            return self._send(request)
+        finally:
+            current_proxy.reset(token)
 
     @abc.abstractmethod
     def _send(self, request: Request):
@@ -561,6 +675,14 @@ def read(self, amt: int | None = None) -> bytes:
         except Exception as e:
             raise TransportError(cause=e) from e
 
+    def readinto(self, b) -> int:
+        # Generic fallback that goes through read() so that subclass error handling applies.
+        # Subclasses should redefine this method to read directly into the buffer where possible.
+        data = self.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
     def close(self):
         if not self.fp.closed:
             self.fp.close()
@@ -601,6 +723,58 @@ def getheader(self, name, default=None):
         return self.get_header(name, default)
 
 
+class _PassthroughResponse(Response):
+    """
+    Response that passes reads through to the actual response, and calls on_close once it is closed
+
+    It is closed when its end is read, when reading it fails, or when it is garbage collected,
+    since responses that are only used for their URL or headers are often never closed.
+
+    @param response: Actual response.
+    @param on_close: Function that is called with this response once it is closed.
+                     `bytes_read` and `error` (the RequestError that reading failed with, if any) are set by then.
+    """
+
+    def __init__(self, response: Response, on_close):
+        super().__init__(response, response.url, {}, response.status, response.reason, response.extensions)
+        self.headers = response.headers
+        self.bytes_read = 0
+        self.error = None
+        self._on_close = on_close
+
+    def read(self, amt=None):
+        try:
+            data = self.fp.read(amt)
+        except RequestError as e:
+            self.error = e
+            self.close()
+            raise
+        self.bytes_read += len(data)
+        if self.fp.closed:
+            self.close()
+        return data
+
+    def readinto(self, b):
+        try:
+            n = self.fp.readinto(b)
+        except RequestError as e:
+            self.error = e
+            self.close()
+            raise
+        self.bytes_read += n
+        if self.fp.closed:
+            self.close()
+        return n
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._on_close(self)
+
+    def __del__(self):
+        self.close()
+
+
 if typing.TYPE_CHECKING:
     RequestData = bytes | Iterable[bytes] | typing.IO | None
     Preference = typing.Callable[[RequestHandler, Request], int]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import collections
+import functools
+import heapq
+import itertools
+import threading
+import time
+import urllib.parse
+
+from ._helper import trace_phase
+from .common import DEFAULT_TIMEOUT, Request, Response, _PassthroughResponse
+from .trace import QUEUE_PHASE
+
+# Priorities of requests, given by their `priority` extension. Requests with a higher priority are sent first
+PRIORITY_DEFAULT = 0
+# Downloads of media, e.g. of fragments, which should not hold back the requests of extractors
+PRIORITY_BULK = -10
+
+
+class _HostQueue:
+    def __init__(self):
+        self.in_flight = 0
+        # Heap of (-priority, sequence, event) of the waiting requests
+        self.waiting = []
+
+
+class HostLimiter:
+    """
+    Limits the number of requests in flight to each host, and queues the other requests
+
+    A request is in flight from when it is sent until its response is closed (or garbage collected).
+    A request that waits for longer than its timeout is sent regardless, so that a response which is
+    kept open while more requests are made to its host cannot hold them forever.
+    Queued requests are sent in the order they were made ("fifo"), or by their priority
+    and then in that order ("priority"). The time spent in the queue is recorded in the trace
+    of the request (see networking.trace) as the "queue" phase, and summed up in `stats`.
+
+    @param max_per_host: Maximum number of requests in flight to a host.
+    @param order: "fifo" or "priority".
+    """
+
+    def __init__(self, max_per_host, order='fifo'):
+        assert order in ('fifo', 'priority'), f'Invalid order={order}'
+        self.max_per_host = max_per_host
+        self.order = order
+        self._hosts: dict[str, _HostQueue] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._stats = collections.Counter(requests=0, queued=0, queue_time=0)
+        self._max_queue_time = 0
+
+    @property
+    def stats(self):
+        """Dict of the number of requests, those that were queued, and their total and maximum queue time"""
+        with self._lock:
+            return {
+                **self._stats,
+                'max_queue_time': self._max_queue_time,
+                'in_flight': sum(queue.in_flight for queue in self._hosts.values()),
+                'waiting': sum(len(queue.waiting) for queue in self._hosts.values()),
+            }
+
+    def _acquire(self, host, priority, timeout):
+        with self._lock:
+            queue = self._hosts.setdefault(host, _HostQueue())
+            self._stats['requests'] += 1
+            if queue.in_flight < self.max_per_host and not queue.waiting:
+                queue.in_flight += 1
+                return
+            self._stats['queued'] += 1
+            event = threading.Event()
+            entry = (-priority if self.order == 'priority' else 0, next(self._sequence), event)
+            heapq.heappush(queue.waiting, entry)
+
+        start = time.perf_counter()
+        try:
+            with trace_phase(QUEUE_PHASE):
+                acquired = event.wait(timeout)
+        except BaseException:
+            with self._lock:
+                acquired = event.is_set()
+                if not acquired:
+                    queue.waiting.remove(entry)
+                    heapq.heapify(queue.waiting)
+            if acquired:
+                self._release(host)
+            raise
+        queue_time = time.perf_counter() - start
+        with self._lock:
+            if not acquired and not event.is_set():
+                # Take a slot over the limit
+                queue.waiting.remove(entry)
+                heapq.heapify(queue.waiting)
+                queue.in_flight += 1
+            self._stats['queue_time'] += queue_time
+            self._max_queue_time = max(self._max_queue_time, queue_time)
+
+    def _release(self, host):
+        with self._lock:
+            queue = self._hosts[host]
+            if queue.waiting:
+                # The slot passes on to the next request
+                heapq.heappop(queue.waiting)[2].set()
+                return
+            queue.in_flight -= 1
+            if not queue.in_flight:
+                del self._hosts[host]
+
+    def send(self, request: Request, send, priority=None) -> Response:
+        """
+        Send a request once a slot for its host is free
+
+        @param request: Request to send.
+        @param send: Function that sends a request, e.g. RequestDirector._send.
+        @param priority: Priority of the request. See PRIORITY_DEFAULT.
+        """
+        host = (urllib.parse.urlsplit(request.url).hostname or '').lower()
+        self._acquire(
+            host, PRIORITY_DEFAULT if priority is None else priority,
+            request.extensions.get('timeout') or DEFAULT_TIMEOUT)
+        try:
+            response = send(request)
+        except BaseException:
+            # Including HTTPError, whose response is not counted
+            self._release(host)
+            raise
+        if urllib.parse.urlsplit(request.url).scheme.lower() in ('ws', 'wss'):
+            # WebSocket connections are not counted once they are established
+            self._release(host)
+            return response
+        return _PassthroughResponse(response, lambda _: self._release(host))
+
+
+@functools.cache
+def get_shared_host_limiter(max_per_host, order='fifo'):
+    """Get a HostLimiter that is shared within the process, so that the limits hold across YoutubeDL instances"""
+    return HostLimiter(max_per_host, order)
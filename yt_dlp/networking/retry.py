@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import collections
+import itertools
+import random
+import threading
+import time
+import urllib.parse
+
+from .common import Request, Response
+from .exceptions import CertificateVerifyError, HTTPError, ProxyError, RequestError, TransportError
+from ..utils import error_to_str, int_or_none, timeconvert
+from ..utils.networking import select_proxy
+
+# See https://www.rfc-editor.org/rfc/rfc9110#section-15.5.9 and following
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# See https://www.rfc-editor.org/rfc/rfc9110#section-9.2.2
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE')
+# Longest Retry-After that is honored, in seconds
+MAX_RETRY_AFTER = 300
+
+
+def parse_retry_after(value):
+    """Get the seconds to wait from a Retry-After header. See https://www.rfc-editor.org/rfc/rfc9110#section-10.2.3"""
+    if not value:
+        return None
+    seconds = int_or_none(value.strip())
+    if seconds is None:
+        timestamp = timeconvert(value)
+        if timestamp is None:
+            return None
+        seconds = timestamp - time.time()
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a host, shared by all requests to it through the same proxy
+
+    After a number of consecutive failed requests, the breaker opens and holds all requests to the host
+    for a cooldown. Then a single request is let through to probe the host: the breaker closes if it
+    succeeds, and opens again with twice the cooldown if it fails.
+    A Retry-After of a response also holds the requests to the host, whether the breaker is open or not.
+    """
+    _COOLDOWN = 5
+    _MAX_COOLDOWN = 300
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._open = False
+        self._probing = False
+        self._cooldown = self._COOLDOWN
+        self._held_until = 0
+
+    @property
+    def is_open(self):
+        return self._open
+
+    @property
+    def held_for(self):
+        """Number of seconds the requests to the host are still held for"""
+        return max(self._held_until - time.monotonic(), 0)
+
+    def acquire(self):
+        """Wait until a request may be sent to the host. Returns the number of seconds waited"""
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                delay = self._held_until - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                elif not self._open:
+                    break
+                elif not self._probing:
+                    self._probing = True
+                    break
+                else:
+                    # Another request is probing the host
+                    self._condition.wait(self._cooldown)
+        return time.monotonic() - start
+
+    def release(self, success=None, retry_after=None, threshold=5):
+        """
+        Report the outcome of a request that was let through by acquire()
+
+        @param success: Whether the host handled the request, None if the outcome says nothing about the host.
+        @param retry_after: Number of seconds to hold the requests to the host for.
+        @param threshold: Number of consecutive failures that open the breaker. 0 to never open it.
+        @returns The cooldown in seconds if the breaker was opened by this failure, otherwise None.
+        """
+        opened = None
+        with self._condition:
+            self._probing = False
+            now = time.monotonic()
+            if retry_after:
+                self._held_until = max(self._held_until, now + retry_after)
+            if success:
+                self._failures = 0
+                self._open = False
+                self._cooldown = self._COOLDOWN
+            elif success is not None:
+                self._failures += 1
+                if threshold and self._failures >= threshold:
+                    opened = self._cooldown
+                    self._open = True
+                    self._held_until = max(self._held_until, now + self._cooldown)
+                    self._cooldown = min(self._cooldown * 2, self._MAX_COOLDOWN)
+            self._condition.notify_all()
+        return opened
+
+
+class CircuitBreakers:
+    """
+    Circuit breakers of hosts, created on demand. Only the most recently used `max_hosts` are kept
+
+    Breakers are keyed by the host and the proxy it is connected through (None if direct),
+    since a failing proxy says nothing about the host when connected to otherwise.
+    """
+
+    def __init__(self, max_hosts=1024):
+        self.max_hosts = max_hosts
+        self._breakers: collections.OrderedDict[tuple[str, str | None], CircuitBreaker] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host, proxy=None):
+        key = host, proxy
+        with self._lock:
+            breaker = self._breakers.pop(key, None) or CircuitBreaker()
+            self._breakers[key] = breaker
+            while len(self._breakers) > self.max_hosts:
+                self._breakers.popitem(last=False)
+            return breaker
+
+    def clear(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+class RetryBudget:
+    """
+    Budget of retries, so that retries only add a fraction to the requests when many of them fail,
+    instead of multiplying the load on servers that are already failing
+
+    Each request deposits `ratio` tokens, up to `max_tokens`, and each retry withdraws one.
+    The budget starts with `min_tokens`, which allows a few retries when there have been few requests.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Take a token for a retry. Returns False if the budget is exhausted"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+# Shared by all RetryPolicy instances of the process that opt into it
+circuit_breakers = CircuitBreakers()
+# Shared by all RetryPolicy instances of the process by default
+retry_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    Retries requests that fail with transient errors, and backs off from failing hosts
+
+    Requests that fail with a connection error or an HTTP status of RETRY_STATUSES are retried after
+    a delay that grows exponentially with full jitter, or the Retry-After of the response if it is longer.
+    Only requests with an idempotent method and a replayable body are retried.
+
+    The retry budget is shared by the whole process by default. Each policy has its own circuit breakers
+    by default; pass the module-level `circuit_breakers` to back off from a host together with the rest
+    of the process. The breakers apply to all requests, including those that are not retried.
+
+    @param retries: Number of times to retry a request.
+    @param backoff: Base of the exponential backoff, in seconds.
+    @param max_backoff: Maximum backoff between retries, in seconds, before jitter.
+    @param breaker_threshold: Number of consecutive failed requests to a host that open its circuit breaker.
+                              0 to never open the breakers.
+    @param breakers: CircuitBreakers of the hosts.
+    @param budget: RetryBudget to take the retries from.
+    @param proxies: Proxies used by the request handlers, for requests without their own.
+    @param logger: Logger instance, for retry and circuit breaker messages.
+    """
+
+    def __init__(self, *, retries=0, backoff=1, max_backoff=60, breaker_threshold=5,
+                 breakers=None, budget=None, proxies=None, logger=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breakers = breakers if breakers is not None else CircuitBreakers()
+        self.budget = budget if budget is not None else retry_budget
+        self.proxies = proxies or {}
+        self.logger = logger
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, HTTPError):
+            return error.status in RETRY_STATUSES
+        # Certificate and proxy errors are not resolved by retrying
+        return isinstance(error, TransportError) and not isinstance(error, (CertificateVerifyError, ProxyError))
+
+    @staticmethod
+    def _is_replayable(request):
+        return request.method in IDEMPOTENT_METHODS and (request.data is None or isinstance(request.data, bytes))
+
+    def get_backoff(self, attempt):
+        """Delay before the given retry (starting from 0), with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def send(self, request: Request, send) -> Response:
+        """
+        Send a request, retrying it and backing off from its host as needed
+
+        @param request: Request to send.
+        @param send: Function that sends a request, e.g. RequestDirector._send.
+        """
+        host = (urllib.parse.urlsplit(request.url).hostname or '').lower()
+        # Handlers of URLs without a host, e.g. file:// URLs, do not use proxies
+        proxy = select_proxy(request.url, request.proxies or self.proxies) if host else None
+        breaker = self.breakers.get(host, proxy)
+        self.budget.deposit()
+
+        for attempt in itertools.count():
+            waited = breaker.acquire()
+            if waited >= 1 and self.logger:
+                self.logger.debug(f'Held request to {host} for {waited:.1f} seconds')
+            try:
+                response = send(request)
+            except RequestError as e:
+                retryable = self._is_retryable(e)
+                retry_after = None
+                if isinstance(e, HTTPError) and e.status in (429, 503):
+                    retry_after = parse_retry_after(e.response.get_header('Retry-After'))
+                # Other errors, e.g. of certificates or proxies, say nothing about the host
+                success = not retryable if isinstance(e, HTTPError) else False if retryable else None
+                held_for = breaker.held_for
+                cooldown = breaker.release(success, retry_after, self.breaker_threshold)
+                if cooldown and self.logger:
+                    self.logger.warning(
+                        f'{host} is failing requests; holding all requests to it for {cooldown} seconds')
+                elif retry_after and retry_after >= held_for + 1 and self.logger:
+                    # The hold applies to all requests to the host, including those that are not retried
+                    self.logger.warning(
+                        f'{host} asked to retry after {retry_after:.0f} seconds; holding all requests to it until then')
+                if (not retryable or attempt >= self.retries
+                        or not self._is_replayable(request) or not self.budget.withdraw()):
+                    raise
+                if isinstance(e, HTTPError):
+                    e.close()
+                delay = max(self.get_backoff(attempt), retry_after or 0)
+                if self.logger:
+                    self.logger.warning(
+                        f'{error_to_str(e)}. Retrying request to {host} in {delay:.1f} seconds '
+                        f'({attempt + 1}/{self.retries}) ...')
+                time.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.release(success=True)
+            return response
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from ._helper import current_trace
+from .common import Request, Response, _PassthroughResponse
+from .exceptions import HTTPError, RequestError
+
+# Phases of establishing a connection, in the order they happen. See _helper.trace_phase
+CONNECTION_PHASES = ('dns', 'connect', 'tls')
+# Phase of waiting for a slot of a HostLimiter (see networking.limiter)
+QUEUE_PHASE = 'queue'
+
+
+class RequestTrace:
+    """
+    Timings of a request, from when it is passed to a request handler until its response is closed
+
+    Times are in seconds, as returned by time.perf_counter().
+    The connection phases are only recorded when the request handler opens a new connection for the request.
+
+    @param request: Request that is traced.
+    @param tags: Dict of information about the request, e.g. the extractor and note of an extractor request.
+    """
+
+    def __init__(self, request: Request, tags=None):
+        self.url = request.url
+        self.method = request.method
+        self.tags = dict(tags or {})
+        self.handler = None
+        self.thread_id = threading.get_ident()
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.response_start = None
+        self.end = None
+        self.status = None
+        self.error = None
+        self.bytes_read = 0
+        # List of (phase, start, end)
+        self.spans = []
+
+    def add_span(self, name, start, end):
+        self.spans.append((name, start, end))
+
+    def to_dict(self):
+        """
+        Get the timings in the form passed to trace hooks, with the entries
+        * url, method: Of the request
+        * status: HTTP status code of the response, None if there is none
+        * error: Error message if the request or the reading of its response failed
+        * handler: RH_NAME of the request handler that sent the request
+        * timestamp: Unix time at which the request was sent
+        * thread_id: Identifier of the thread that sent the request
+        * bytes_read: Number of bytes read from the response
+        * timings: Dict of durations in seconds of "queue" (None if the request was not queued),
+                   "dns", "connect", "tls" (None if no new connection was opened),
+                   "ttfb" (until the response headers are received), "transfer" (from then until the response
+                   is closed), and "total". Durations of phases that did not happen are None
+        * spans: List of dicts of the queue and connection phases, with "name", and "start" and "end" in seconds
+                 from the start
+        Also includes the tags of the request, e.g. extractor, note and video_id for requests of extractors.
+        """
+        end = self.end if self.end is not None else time.perf_counter()
+        timings = dict.fromkeys((QUEUE_PHASE, *CONNECTION_PHASES))
+        for name, start, span_end in self.spans:
+            timings[name] = (timings.get(name) or 0) + span_end - start
+        timings.update({
+            'ttfb': self.response_start - self.start if self.response_start is not None else None,
+            'transfer': end - self.response_start if self.response_start is not None else None,
+            'total': end - self.start,
+        })
+        return {
+            **self.tags,
+            'url': self.url,
+            'method': self.method,
+            'status': self.status,
+            'error': self.error,
+            'handler': self.handler,
+            'timestamp': self.timestamp,
+            'thread_id': self.thread_id,
+            'bytes_read': self.bytes_read,
+            'timings': timings,
+            'spans': [{'name': name, 'start': start - self.start, 'end': end - self.start}
+                      for name, start, end in self.spans],
+        }
+
+
+class RequestTracer:
+    """
+    Traces the requests sent through a RequestDirector, and passes their timings to hooks
+
+    @param hooks: List of functions that are called with the timings of each request (see RequestTrace.to_dict)
+                  once its response is closed, or when the request fails.
+                  The list may be modified afterwards; requests are only traced while it is not empty.
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = hooks if hooks is not None else []
+
+    def _finish(self, trace):
+        trace.end = time.perf_counter()
+        info = trace.to_dict()
+        for hook in self.hooks:
+            hook(info)
+
+    def send(self, request: Request, send, tags=None) -> Response:
+        """
+        Send a request and trace it
+
+        @param request: Request to send.
+        @param send: Function that sends a request over the network, e.g. RequestDirector._send.
+        @param tags: Dict of information about the request to pass to the hooks, e.g. the extractor.
+        """
+        if not self.hooks:
+            return send(request)
+
+        trace = RequestTrace(request, tags)
+        token = current_trace.set(trace)
+        try:
+            response = send(request)
+        except RequestError as e:
+            trace.response_start = time.perf_counter()
+            trace.error = str(e)
+            if isinstance(e, HTTPError):
+                trace.status = e.status
+            self._finish(trace)
+            raise
+        finally:
+            current_trace.reset(token)
+
+        trace.response_start = time.perf_counter()
+        trace.status = response.status
+        if urllib.parse.urlparse(request.url).scheme.lower() in ('ws', 'wss'):
+            # The rest of the connection is not a transfer of the response
+            self._finish(trace)
+            return response
+
+        def on_close(response):
+            trace.bytes_read = response.bytes_read
+            if response.error is not None:
+                trace.error = str(response.error)
+            self._finish(trace)
+
+        return _PassthroughResponse(response, on_close)
+
+
+class ChromeTraceExporter:
+    """
+    Trace hook that collects the timings of requests as Chrome trace events,
+    which can be viewed in https://ui.perfetto.dev or chrome://tracing
+
+    Each request is an event on the track of the thread that sent it, named after
+    its note if it has one, with nested events for the phases of the request.
+
+    @param path: File to write the trace events to as JSON when write() is called.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        pid = os.getpid()
+        start = info['timestamp'] * 1_000_000
+        timings = info['timings']
+
+        def event(name, ts, dur, **kwargs):
+            return {'name': name, 'ph': 'X', 'ts': ts, 'dur': dur, 'pid': pid, 'tid': info['thread_id'], **kwargs}
+
+        events = [event(
+            info.get('note') or f'{info["method"]} {info["url"]}', start, timings['total'] * 1_000_000,
+            cat=','.join(filter(None, ('request', info.get('extractor')))),
+            args={key: value for key, value in info.items() if key not in ('timings', 'spans') and value is not None})]
+        for span in info['spans']:
+            events.append(event(
+                span['name'], start + span['start'] * 1_000_000, (span['end'] - span['start']) * 1_000_000,
+                cat='queue' if span['name'] == QUEUE_PHASE else 'connection'))
+        if timings['ttfb'] is not None:
+            waiting_start = max((span['end'] for span in info['spans']), default=0)
+            events.append(event(
+                'waiting', start + waiting_start * 1_000_000, (timings['ttfb'] - waiting_start) * 1_000_000,
+                cat='response'))
+            events.append(event(
+                'transfer', start + timings['ttfb'] * 1_000_000, timings['transfer'] * 1_000_000, cat='response'))
+        with self._lock:
+            self._events.extend(events)
+
+    def write(self):
+        with self._lock:
+            events = list(self._events)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -619,6 +619,19 @@ def _preset_alias_callback(option, opt_str, value, parser):
         metavar='IP', dest='source_address', default=None,
         help='Client-side IP address to bind to',
     )
+    network.add_option(
+        '--resolve',
+        metavar='HOST:IP[,IP]', dest='resolve', default={}, type='str',
+        action='callback', callback=_dict_from_options_callback,
+        callback_kwargs={
+            'allowed_keys': r'[\w.-]+',
+            'multiple_keys': False,
+            'process': lambda val: [ip.strip() for ip in val.split(',')],
+        }, help=(
+            'Connect to HOST at the given IP addresses instead of resolving it, e.g. example.com:127.0.0.1. '
+            'You can use this option multiple times. Requests to HOST are always sent with the urllib or '
+            'websockets request handlers, which support this. Note that the addresses of other hosts are '
+            'cached for 5 minutes, regardless of the TTL of their DNS records'))
     network.add_option(
         '--impersonate',
         metavar='CLIENT[:OS]', dest='impersonate', default=None,
@@ -632,6 +645,12 @@ def _preset_alias_callback(option, opt_str, value, parser):
         dest='list_impersonate_targets', default=False, action='store_true',
         help='List available clients to impersonate.',
     )
+    network.add_option(
+        '--prefer-http2',
+        action='store_true', dest='prefer_http2', default=False,
+        help=(
+            'Send HTTPS requests with the httpx request handler, which negotiates HTTP/2 with hosts that support it. '
+            'Requires httpx and h2'))
     network.add_option(
         '-4', '--force-ipv4',
         action='store_const', const='0.0.0.0', dest='source_address',
@@ -642,6 +661,56 @@ def _preset_alias_callback(option, opt_str, value, parser):
         action='store_const', const='::', dest='source_address',
         help='Make all connections via IPv6',
     )
+    network.add_option(
+        '--http-cache',
+        metavar='TYPE', dest='http_cache', default=None, choices=('memory', 'disk'),
+        help=(
+            'Cache the responses to the requests of extractors as allowed by their caching headers. '
+            'Responses are kept in "memory", or also in the "disk" cache directory (see --cache-dir). '
+            'Responses to requests with cookies or credentials are not cached'))
+    network.add_option(
+        '--no-http-cache',
+        action='store_const', const=None, dest='http_cache',
+        help='Do not cache the responses of requests (default)')
+    network.add_option(
+        '--http-cache-authenticated',
+        action='store_const', const=True, dest='http_cache_authenticated', default=False,
+        help=(
+            'Also cache the responses to requests with cookies or credentials, and responses that set cookies. '
+            'They are only kept in memory'))
+    network.add_option(
+        '--http-cache-authenticated-on-disk',
+        action='store_const', const='disk', dest='http_cache_authenticated',
+        help=(
+            'Same as --http-cache-authenticated, but also keep them in the disk cache. '
+            'Their content is stored unencrypted'))
+    network.add_option(
+        '--request-retries',
+        dest='request_retries', metavar='RETRIES', default=0,
+        help=(
+            'Number of times to retry HTTP requests that fail with a connection error or an HTTP status '
+            'of 408, 429 or 5xx, with jittered exponential backoff (default is %default), or "infinite". '
+            'Retries of all requests are limited to a fraction of the requests'))
+    network.add_option(
+        '--max-requests-per-host',
+        dest='max_requests_per_host', metavar='NUMBER', default=None, type='int',
+        help=(
+            'Maximum number of HTTP requests in flight to a host at a time, across all downloads. '
+            'Further requests wait in a queue (default is no limit)'))
+    network.add_option(
+        '--request-queue-order',
+        dest='request_queue_order', metavar='ORDER', default='priority', choices=('fifo', 'priority'),
+        help=(
+            'Order in which requests that wait for --max-requests-per-host are sent. '
+            '"priority" (default) sends the requests of extractors before those of media downloads, '
+            'and "fifo" sends them in the order they were made'))
+    network.add_option(
+        '--circuit-breaker-threshold',
+        dest='circuit_breaker_threshold', metavar='FAILURES', default=5, type='int',
+        help=(
+            'Number of consecutive failed requests to a host after which all requests to it are held '
+            'for an increasing cooldown. This is enabled by default (threshold of %default). '
+            '0 to never hold requests, other than for the Retry-After of responses'))
     network.add_option(
         '--enable-file-urls', action='store_true',
         dest='enable_file_urls', default=False,
@@ -779,11 +848,20 @@ def _preset_alias_callback(option, opt_str, value, parser):
     selection.add_option(
         '--download-archive', metavar='FILE',
         dest='download_archive',
-        help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it')
+        help=(
+            'Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it. '
+            'A FILE with a .db, .sqlite or .sqlite3 extension is used as an SQLite database, '
+            'which does not need to be loaded into memory and can be shared by concurrent processes'))
     selection.add_option(
         '--no-download-archive',
         dest='download_archive', action='store_const', const=None,
         help='Do not use archive file (default)')
+    selection.add_option(
+        '--import-download-archive', metavar='FILE',
+        dest='import_download_archive',
+        help=(
+            'Add the IDs listed in the text archive FILE to the --download-archive before downloading. '
+            'Can be used to convert an archive to SQLite'))
     selection.add_option(
         '--max-downloads',
         dest='max_downloads', metavar='NUMBER', type=int, default=None,
@@ -1015,6 +1093,16 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
         help='Maximum download rate in bytes per second, e.g. 50K or 4.2M')
+    downloader.add_option(
+        '--global-limit-rate',
+        dest='global_ratelimit', metavar='RATE',
+        help=(
+            'Maximum download rate in bytes per second shared by all concurrent downloads, '
+            'including concurrent fragments, e.g. 50K or 4.2M'))
+    downloader.add_option(
+        '--host-limit-rate',
+        dest='host_ratelimit', metavar='RATE',
+        help='Maximum download rate in bytes per second shared by all concurrent downloads from the same host')
     downloader.add_option(
         '--throttled-rate',
         dest='throttledratelimit', metavar='RATE',
@@ -1102,6 +1190,27 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '--no-lazy-playlist',
         action='store_false', dest='lazy_playlist',
         help='Process videos in the playlist only after the entire playlist is parsed (default)')
+    downloader.add_option(
+        '--playlist-workers',
+        dest='playlist_workers', metavar='N', default=1, type=int,
+        help=(
+            'Number of playlist entries to extract concurrently (default is %default). '
+            'Entries are still processed and downloaded one at a time and in order'))
+    downloader.add_option(
+        '--batch-workers',
+        dest='batch_workers', metavar='N', default=1, type=int,
+        help=(
+            'Number of input URLs to extract concurrently (default is %default). '
+            'The URLs are still processed and downloaded one at a time. '
+            'If greater than 1, the batch file is read as the URLs are processed'))
+    downloader.add_option(
+        '--no-batch-order',
+        dest='batch_unordered', action='store_true', default=False,
+        help='Process the URLs of --batch-workers as soon as their extraction completes, instead of in input order')
+    downloader.add_option(
+        '--batch-order',
+        dest='batch_unordered', action='store_false',
+        help='Process the URLs of --batch-workers in input order (default)')
     downloader.add_option(
         '--hls-prefer-native',
         dest='hls_prefer_native', action='store_true', default=None,
@@ -1377,6 +1486,12 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '--print-traffic',
         dest='debug_printtraffic', action='store_true', default=False,
         help='Display sent and read HTTP traffic')
+    verbosity.add_option(
+        '--write-request-trace',
+        metavar='FILE', dest='request_trace_file', default=None,
+        help=(
+            'Write the timings of all HTTP requests to FILE as Chrome trace events, '
+            'which can be viewed with https://ui.perfetto.dev'))
 
     filesystem = optparse.OptionGroup(parser, 'Filesystem Options')
     filesystem.add_option(
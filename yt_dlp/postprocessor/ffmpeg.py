@@ -795,7 +795,9 @@ def _get_infojson_opts(self, info, infofn):
             if not self._downloader._ensure_dir_exists(infofn):
                 return
             self.write_debug(f'Writing info-json to: {infofn}')
-            write_json_file(self._downloader.sanitize_info(info, self.get_param('clean_infojson', True)), infofn)
+            write_json_file(info, infofn, encode=functools.partial(
+                self._downloader.dumps_info, remove_private_keys=self.get_param('clean_infojson', True),
+                ensure_ascii=False))
             info['infojson_filename'] = infofn
 
         old_stream, new_stream = self.get_stream_number(info['filepath'], ('tags', 'mimetype'), 'application/json')
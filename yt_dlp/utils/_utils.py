@@ -188,8 +188,12 @@ def preferredencoding():
     return pref
 
 
-def write_json_file(obj, fn):
-    """ Encode obj as JSON and write it to fn, atomically if possible """
+def write_json_file(obj, fn, *, encode=None):
+    """
+    Encode obj as JSON and write it to fn, atomically if possible
+
+    @param encode   Function that returns the JSON string of obj; json.dump is used by default
+    """
 
     tf = tempfile.NamedTemporaryFile(
         prefix=f'{os.path.basename(fn)}.', dir=os.path.dirname(fn),
@@ -197,7 +201,10 @@ def write_json_file(obj, fn):
 
     try:
         with tf:
-            json.dump(obj, tf, ensure_ascii=False)
+            if encode:
+                tf.write(encode(obj))
+            else:
+                json.dump(obj, tf, ensure_ascii=False)
         if sys.platform == 'win32':
             # Need to remove existing file on Windows, else os.rename raises
             # WindowsError or FileExistsError.
@@ -2563,7 +2570,12 @@ def parse_qs(url, **kwargs):
     return urllib.parse.parse_qs(urllib.parse.urlparse(url).query, **kwargs)
 
 
-def read_batch_urls(batch_fd):
+def read_batch_urls(batch_fd, lazy=False):
+    """
+    Read the URLs from a batch file object, which is closed afterwards
+
+    @param lazy     Return an iterator that reads the file as the URLs are consumed
+    """
     def fixup(url):
         if not isinstance(url, str):
             url = url.decode('utf-8', 'replace')
@@ -2578,8 +2590,11 @@ def fixup(url):
         # However, it can be safely stripped out if following a whitespace
         return re.split(r'\s#', url, maxsplit=1)[0].rstrip()
 
-    with contextlib.closing(batch_fd) as fd:
-        return [url for url in map(fixup, fd) if url]
+    def read_urls():
+        with contextlib.closing(batch_fd) as fd:
+            yield from filter(None, map(fixup, fd))
+
+    return read_urls() if lazy else list(read_urls())
 
 
 def urlencode_postdata(*args, **kargs):
@@ -5490,6 +5505,7 @@ def _resolve_field_value(self, field, value, convert_none=False):
                 return value
 
     def evaluate_params(self, params, sort_extractor):
+        self._compiled_preferences = None
         self._use_free_order = params.get('prefer_free_formats', False)
         self._sort_user = params.get('format_sort', [])
         self._sort_extractor = sort_extractor
@@ -5635,9 +5651,76 @@ def _fill_sorting_fields(format):
         if not format.get('tbr'):
             format['tbr'] = try_call(lambda: format['vbr'] + format['abr']) or None
 
+    def _compile_field_preference(self, field):
+        """Returns a function equivalent to `lambda format_: self._calculate_field_preference(format_, field)`"""
+        type_ = self._get_field_setting(field, 'type')
+        reverse = self._get_field_setting(field, 'reverse')
+        closest = self._get_field_setting(field, 'closest')
+        limit = self._get_field_setting(field, 'limit')
+        default = self._get_field_setting(field, 'default')
+        is_string = self._get_field_setting(field, 'convert') == 'string'
+
+        if type_ == 'multiple':
+            type_ = 'field'
+            names = [self._get_field_setting(f, 'field') for f in self._get_field_setting(field, 'field')]
+            function = self._get_field_setting(field, 'function')
+            get_value = lambda format_: function(format_.get(name) for name in names)
+        else:
+            name = self._get_field_setting(field, 'field')
+            get_value = lambda format_: format_.get(name)
+
+        convert = None
+        if type_ == 'extractor':
+            maximum = self._get_field_setting(field, 'max')
+            convert = lambda value: -1 if value is None or (maximum is not None and value >= maximum) else value
+        elif type_ == 'boolean':
+            in_list = self._get_field_setting(field, 'in_list')
+            not_in_list = self._get_field_setting(field, 'not_in_list')
+            convert = lambda value: 0 if (
+                (in_list is None or value in in_list) and (not_in_list is None or value not in not_in_list)) else -1
+        elif type_ == 'ordered':
+            # Only a few distinct values occur, so memoize their position in the order
+            positions = {}
+
+            def convert(value):
+                try:
+                    return positions[value]
+                except KeyError:
+                    position = positions[value] = self._resolve_field_value(field, value, True)
+                    return position
+
+        def field_preference(format_):
+            value = get_value(format_)
+            if convert is not None:
+                value = convert(value)
+            # Same as float_or_none, which is too slow to call here
+            try:
+                val_num = default if value is None else float(value)
+            except (TypeError, ValueError):
+                val_num = default
+            if not is_string and val_num is not None:
+                value = val_num
+            elif value is None:
+                return (-10, 0)
+            else:
+                # if a field has mixed strings and numbers, strings are sorted higher
+                return (1, value, 0)
+
+            if closest:
+                return (0, -abs(value - limit), value - limit if reverse else limit - value)
+            elif not reverse and (limit is None or value <= limit):
+                return (0, value, 0)
+            elif limit is None or (reverse and value == limit) or value > limit:
+                return (0, -value, 0)
+            return (-1, value, 0)
+
+        return field_preference
+
     def calculate_preference(self, format):
         self._fill_sorting_fields(format)
-        return tuple(self._calculate_field_preference(format, field) for field in self._order)
+        if self._compiled_preferences is None:
+            self._compiled_preferences = tuple(map(self._compile_field_preference, self._order))
+        return tuple(field_preference(format) for field_preference in self._compiled_preferences)
 
 
 def filesize_from_tbr(tbr, duration):
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import bisect
+import collections
 import threading
 import time
 
@@ -107,3 +108,88 @@ def set(self, value: float):
 
     def reset(self):
         self.value = self.smooth = self._initial
+
+
+class _RateLimitConsumer:
+    def __init__(self, weight, now):
+        self.weight = weight
+        # Starting empty, so that consumers that replace each other (e.g. fragment downloads) are not each given a burst
+        self.tokens = 0
+        self.last_update = now
+        self.active_until = now
+
+
+class RateLimiter:
+    """
+    Rate limit that can be shared between concurrent downloads
+
+    The rate is split between the active consumers in proportion to their weights,
+    and each consumer is paced by a token bucket of its share, going into debt and sleeping it off.
+    A consumer is active until it has not consumed anything for IDLE_TIME after its debt was paid off.
+    The share of a consumer that cannot keep up with it is not passed on to the others.
+    Instances obtained through `get` are shared by the whole process.
+    """
+    # Maximum burst size (seconds worth of the rate)
+    BURST = 1
+    # Time after which a consumer no longer takes a share of the rate (seconds)
+    IDLE_TIME = 1
+    # Number of instances obtained through `get` above which idle ones are dropped
+    MAX_INSTANCES = 256
+
+    _instances: collections.OrderedDict[tuple, RateLimiter] = collections.OrderedDict()
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._consumers: dict[object, _RateLimitConsumer] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, key: tuple, rate: float) -> RateLimiter:
+        """Get the limiter of key with the given rate, shared with the other users of the same key and rate.
+        The least recently obtained limiters without active consumers are dropped beyond MAX_INSTANCES"""
+        key = (*key, rate)
+        with cls._instances_lock:
+            limiter = cls._instances.pop(key, None) or cls(rate)
+            cls._instances[key] = limiter
+            if len(cls._instances) > cls.MAX_INSTANCES:
+                current_time = time.monotonic()
+                idle = [
+                    k for k, instance in cls._instances.items()
+                    if instance is not limiter and not instance._is_active(current_time)]
+                for k in idle[:len(cls._instances) - cls.MAX_INSTANCES]:
+                    del cls._instances[k]
+            return limiter
+
+    def _is_active(self, current_time):
+        with self._lock:
+            return any(consumer.active_until > current_time for consumer in self._consumers.values())
+
+    def reserve(self, size: int, weight: float = 1, key=None) -> float:
+        """Take size bytes from the share of the consumer identified by key (default: the current thread).
+        Returns the number of seconds to wait before consuming them"""
+        if key is None:
+            key = threading.get_ident()
+        with self._lock:
+            current_time = time.monotonic()
+            consumer = self._consumers.get(key)
+            if consumer is None:
+                consumer = self._consumers[key] = _RateLimitConsumer(weight, current_time)
+            consumer.weight = weight
+            self._consumers = {
+                k: c for k, c in self._consumers.items() if c is consumer or c.active_until > current_time}
+
+            rate = self.rate * weight / sum(c.weight for c in self._consumers.values())
+            consumer.tokens = min(consumer.tokens + (current_time - consumer.last_update) * rate, rate * self.BURST)
+            consumer.last_update = current_time
+            consumer.tokens -= size
+            delay = max(-consumer.tokens / rate, 0)
+            consumer.active_until = current_time + delay + self.IDLE_TIME
+        return delay
+
+    def consume(self, size: int, weight: float = 1, key=None):
+        """Take size bytes from the share of the consumer, sleeping until they are available.
+        Consumers get shares of the rate in proportion to their weights"""
+        delay = self.reserve(size, weight, key)
+        if delay:
+            time.sleep(delay)